@@ -0,0 +1,143 @@
+from array import array
+
+
+from . import lca
+from . import rmq
+
+
+class HeavyLightIndex:
+    """ Concrete class implementing path-minimum queries using heavy-light decomposition.
+    For every node the child with the largest subtree is called *heavy*, and the edge
+    to it is a heavy edge. The heavy edges decompose the tree into heavy paths. Any path
+    from a node to the root crosses at most O(logn) light edges, and thus intersects at
+    most O(logn) heavy paths.
+
+    The nodes are laid out in a flat array such that every heavy path occupies a
+    contiguous range, starting with the top node of the path. An RMQ structure is built
+    over the elements of the nodes in that order.
+
+    To answer a query (u, v) we find the least common ancestor w using the LCA index.
+    The paths u-w and v-w are split into O(logn) contiguous ranges of the flat array,
+    and the index of the minimal element is found with one RMQ query per range.
+    """
+    def __init__(self, tree, RMQ=rmq.RMQ_sparse):
+        """ Initialize a HeavyLightIndex for the tree object.
+        @param tree (Tree): A tree object. The elements stored at the nodes must be comparable.
+        @param RMQ (type): An RMQ strategy used to query the ranges of the heavy paths.
+        """
+        self._tree = tree
+        self._size = len(tree)
+
+        # Build the LCA index. This also computes the indices of all nodes.
+        self._lca = lca.LCA_Index(tree)
+
+        self._decompose()
+        self._rmq = RMQ(self._values)
+
+    def path_min(self, p, q):
+        """ Given the positions of two nodes in the tree, find the node with the minimal
+        element on the path between them.
+        @param p (Position): Position representing a node in the tree.
+        @param q (Position): Position representing a node in the tree.
+        @return m (Position): Position of the node with the minimal element on the path.
+        """
+        w = self._lca(p, q).index()
+        best = self._climb(p.index(), w, -1)
+        best = self._climb(q.index(), w, best)
+        return self._positions[self._order[best]]
+
+    def path_min_many(self, us, vs):
+        """ Batch version of path_min working on node indices.
+        @param us (List[int]): A list of node indices.
+        @param vs (List[int]): A list of node indices.
+        @return ms (List[int]): ms[i] is the index of the node with the minimal element
+                                on the path between us[i] and vs[i].
+        """
+        positions, order, climb = self._positions, self._order, self._climb
+        result = []
+        for u, v in zip(us, vs):
+            w = self._lca(positions[u], positions[v]).index()
+            best = climb(v, w, climb(u, w, -1))
+            result.append(order[best])
+        return result
+
+    #---- private methods - should not be invoked by the user ----#
+    def _climb(self, u, w, best):
+        """ Walk from node u up to its ancestor w one heavy path at a time. Query the RMQ
+        structure for every range of the flat array that is covered by the walk.
+        @param u (int): Index of a node.
+        @param w (int): Index of an ancestor of u.
+        @param best (int): Position in the flat array of the best element so far, or -1.
+        @return best (int): Position in the flat array of the minimal element.
+        """
+        head, pos, parent, values = self._head, self._pos, self._parent, self._values
+        while True:
+            h = head[u]
+            if head[w] == h:
+                i = self._rmq(pos[w], pos[u])
+            else:
+                i = self._rmq(pos[h], pos[u])
+            if best == -1 or values[i] < values[best]:
+                best = i
+            if head[w] == h:
+                return best
+            u = parent[h]
+
+    def _decompose(self):
+        """ Compute the subtree sizes and the heavy child of every node. Lay out the nodes
+        in heavy-path order: every heavy path is a contiguous range starting at its top node.
+        """
+        n = self._size
+        self._positions = [None] * n
+        self._parent = array("l", [-1]) * n
+        first_child = array("l", [-1]) * n
+        next_sibling = array("l", [-1]) * n
+
+        order = []
+        stack = [self._tree.root()]
+        while stack:
+            p = stack.pop()
+            u = p.index()
+            self._positions[u] = p
+            order.append(u)
+            for ch in self._tree.children(p):
+                self._parent[ch.index()] = u
+                stack.append(ch)
+
+        # Compute the subtree sizes and the heavy children bottom-up.
+        size = array("l", [1]) * n
+        heavy = array("l", [-1]) * n
+        for u in reversed(order):
+            w = self._parent[u]
+            if w != -1:
+                next_sibling[u] = first_child[w]
+                first_child[w] = u
+                size[w] += size[u]
+                if heavy[w] == -1 or size[u] > size[heavy[w]]:
+                    heavy[w] = u
+
+        # Assign consecutive positions along every heavy path.
+        self._head = array("l", [0]) * n
+        self._pos = array("l", [0]) * n
+        self._order = array("l", [0]) * n
+        curr = 0
+        stack = [order[0]]
+        while stack:
+            h = stack.pop()
+            u = h
+            while u != -1:
+                self._head[u] = h
+                self._pos[u] = curr
+                self._order[curr] = u
+                curr += 1
+
+                ch = first_child[u]
+                while ch != -1:
+                    if ch != heavy[u]:
+                        stack.append(ch)
+                    ch = next_sibling[ch]
+                u = heavy[u]
+
+        self._values = [self._positions[u].elem() for u in self._order]
+
+#
\ No newline at end of file
@@ -1,3 +1,8 @@
+from array import array
+
+
+from utils import forest
+from utils.compact_tree import CompactTree
 from . import rmq
 
 
@@ -14,27 +19,85 @@ class LCA_Index:
         # Compute the depths and the heights of all nodes.
         self._tree.reindex()
 
-        self._time = 0
-        self._reduce(tree.root())
-        self._rmq = rmq.RMQ_1(self._levels)
+        self._compact = isinstance(tree, CompactTree)
+        if self._compact:
+            self._reduce_compact()
+        else:
+            # Cache one Position per node for the duration of the build.
+            cached = tree.cache_positions(True)
+            try:
+                self._reduce(tree.root())
+            finally:
+                tree.cache_positions(cached)
+        self._rmq = self._build_rmq(self._levels)
+
+    @staticmethod
+    def _build_rmq(levels):
+        """ Build the RMQ structure over the levels of the Euler tour. The blocks of RMQ_1
+        have size 1/2 log n, so arrays with fewer than 4 elements, e.g. the tour of a single
+        node, are handled by the sparse table instead.
+        """
+        if len(levels) < 4:
+            return rmq.RMQ_sparse(levels)
+        return rmq.RMQ_1(levels)
 
     def _reduce(self, p):
-        """ Reduce the LCA problem to RMQ problem using recursive depth-first traversal.
-        This function recursively builds the arrays needed for the RMQ problem. It should
-        not be invoked by the user.
-        @param p (Position): Position representing the node in the tree.
+        """ Reduce the LCA problem to RMQ problem using iterative depth-first traversal.
+        This function builds the arrays needed for the RMQ problem. Every stack entry
+        is a node together with the iterator over its remaining children, so deep trees
+        do not hit the recursion limit. It should not be invoked by the user.
+        @param p (Position): Position representing the root of the tree.
         """
+        tree = self._tree
+        self._start[p.index()] = 0
         self._visits.append(p)
-        self._levels.append(self._tree.depth(p))
-        self._start[p.index()] = self._time
+        self._levels.append(tree.depth(p))
+        stack = [(p, tree.children(p))]
+        while stack:
+            p, children = stack[-1]
+            q = next(children, None)
+            if q is not None:                       # down-traversal
+                self._start[q.index()] = len(self._visits)
+                self._visits.append(q)
+                self._levels.append(tree.depth(q))
+                stack.append((q, tree.children(q)))
+            else:                                   # up-traversal
+                stack.pop()
+                if stack:
+                    u = stack[-1][0]
+                    self._visits.append(u)
+                    self._levels.append(tree.depth(u))
 
-        for q in self._tree.children(p):
-            self._time += 1
-            self._reduce(q)
-            self._visits.append(p)
-            self._levels.append(self._tree.depth(p))
+    def _reduce_compact(self):
+        """ Reduce the LCA problem to RMQ problem for a compact tree. The Euler tour is
+        built directly from the child and depth arrays of the tree using an explicit stack.
+        The visits store node indices and positions are created only for the answers.
+        It should not be invoked by the user.
+        """
+        first_child, next_sibling = self._tree.child_arrays()
+        depth = self._tree.depth_array()
+        self._visits = array("l")
+        self._levels = array("l")
+        self._start = array("l", [0]) * len(self._tree)
 
-        self._time += 1
+        # Every stack entry is a node together with the next child to visit.
+        stack = [(0, first_child[0])]
+        self._start[0] = 0
+        self._visits.append(0)
+        self._levels.append(0)
+        while stack:
+            v, ch = stack.pop()
+            if ch == -1:
+                if stack:
+                    u = stack[-1][0]
+                    self._visits.append(u)
+                    self._levels.append(depth[u])
+                continue
+            stack.append((v, next_sibling[ch]))
+            stack.append((ch, first_child[ch]))
+            self._start[ch] = len(self._visits)
+            self._visits.append(ch)
+            self._levels.append(depth[ch])
 
     def __call__(self, p, q):
         """ Given the positions of two nodes in the tree, finds the
@@ -45,6 +108,96 @@ class LCA_Index:
                               at positions p and q.
         """
         idx = self._rmq(self._start[p.index()], self._start[q.index()])
+        if self._compact:
+            return self._tree.position(self._visits[idx])
         return self._visits[idx]
 
+
+class LCA_forest(LCA_Index):
+    """ LCA index over a forest of trees sharing a single flat structure.
+    The nodes of all trees are numbered consecutively, tree by tree. The Euler tours of
+    the trees are concatenated and a virtual root at level -1 is visited before, between
+    and after the tours. Thus consecutive levels still differ by +/- 1 and the reduction
+    to RMQ_1 applies. Between two nodes of different trees the minimal level is a visit
+    of the virtual root, and the query returns None.
+    Queries accept positions of the nodes of the trees, or node numbers.
+    """
+    def __init__(self, trees):
+        """ Initialize an LCA index for a list of tree objects.
+        @param trees (List[Tree]): A list of non-empty tree objects.
+        """
+        parents, positions, bases = forest.flatten_trees(trees)
+        self._build(parents, positions, bases)
+
+    @classmethod
+    def from_parent_array(cls, parents):
+        """ Build an LCA index for the forest described by a parent array.
+        Raise ValueError if the parent array does not describe a forest.
+        @param parents (List[int]): parents[v] is the parent of node v, or -1 if v is a root.
+        @return lca_index (LCA_forest): Index answering queries on node numbers.
+        """
+        lca_index = cls.__new__(cls)
+        lca_index._build(parents, [None] * len(parents), {})
+        return lca_index
+
+    def _build(self, parents, positions, bases):
+        """ Build the concatenated Euler tours using an explicit stack. The visits store
+        node numbers and the virtual root is represented by -1.
+        """
+        self._positions = positions
+        self._bases = bases
+        order = forest.preorder(parents)
+        start, kids = forest.children(parents)
+
+        self._visits = [-1]
+        self._levels = [-1]
+        self._start = [0] * len(parents)
+        for root in order:
+            if parents[root] != -1:
+                continue
+            self._start[root] = len(self._visits)
+            self._visits.append(root)
+            self._levels.append(0)
+            stack = [[root, start[root]]]
+            while stack:
+                top = stack[-1]
+                v, i = top
+                if i < start[v + 1]:                # down-traversal
+                    top[1] += 1
+                    ch = kids[i]
+                    self._start[ch] = len(self._visits)
+                    self._visits.append(ch)
+                    self._levels.append(len(stack))
+                    stack.append([ch, start[ch]])
+                else:                               # up-traversal
+                    stack.pop()
+                    if stack:
+                        self._visits.append(stack[-1][0])
+                        self._levels.append(len(stack) - 1)
+            self._visits.append(-1)
+            self._levels.append(-1)
+
+        self._rmq = self._build_rmq(self._levels)
+
+    def __call__(self, p, q):
+        """ Given two nodes of the forest find their least common ancestor. Return None
+        if the nodes belong to different trees.
+        @param p (Position or int): A position of a node, or a node number.
+        @param q (Position or int): A position of a node, or a node number.
+        @return w (Position or int): The least common ancestor in the same form as p.
+        """
+        i, j = self._start[self._id(p)], self._start[self._id(q)]
+        if i > j:
+            i, j = j, i
+        w = self._visits[self._rmq(i, j)]
+        if w == -1:
+            return None
+        return w if isinstance(p, int) else self._positions[w]
+
+    def _id(self, p):
+        """ Return the number of the node in the forest. """
+        if isinstance(p, int):
+            return p
+        return self._bases[id(p._container)] + p.index()
+
 #
\ No newline at end of file
@@ -0,0 +1,219 @@
+class LinkCutTree:
+    """ Concrete class implementing a link-cut tree over a dynamic forest.
+    The nodes of the forest are identified by the integers 0, 1, ..., n-1. Every tree
+    of the forest is decomposed into vertex-disjoint *preferred paths*. Each preferred
+    path is stored in an auxiliary splay tree keyed by depth, and the root of every
+    splay tree keeps a *path-parent* pointer to the parent of the top node of its path.
+    The splay trees are stored in flat arrays: for every node we keep the index of its
+    left child, right child and parent (either the splay parent or the path-parent).
+    A value of -1 stands for a missing node.
+
+    The main operation is access(v), which makes the path from the root to v preferred
+    and splays v to the root of its auxiliary tree. All other operations are built on
+    top of access and run in amortized O(logn) time.
+
+    Every splay node also stores the index of the node with the minimal value in its
+    splay subtree. This allows path-aggregate queries in amortized O(logn) time.
+    """
+    def __init__(self, size, values=None):
+        """ Initialize a forest of *size* single-node trees.
+        @param size (int): The number of nodes in the forest.
+        @param values (List[int]): Optional list of values stored at the nodes.
+                                   values[i] is the value of node i.
+        """
+        self._size = size
+        self._left = [-1] * size
+        self._right = [-1] * size
+        self._parent = [-1] * size
+        self._val = list(values) if values is not None else [0] * size
+        self._arg = list(range(size))
+
+    @classmethod
+    def from_tree(cls, tree):
+        """ Bulk-initialize a link-cut tree from a Tree object in O(n) time.
+        The nodes of the link-cut tree are identified by the indices of the nodes of
+        the tree and the values are the elements stored at the nodes. Every node starts
+        as a single-node preferred path whose path-parent is the parent of the node.
+        @param tree (Tree): A tree object.
+        @return lct (LinkCutTree): A link-cut tree representing the tree.
+        """
+        tree.reindex()
+        values = [None] * len(tree)
+        parents = [-1] * len(tree)
+        for p in tree.positions():
+            values[p.index()] = p.elem()
+            q = tree.parent(p)
+            if q is not None:
+                parents[p.index()] = q.index()
+
+        lct = cls(len(tree), values)
+        lct._parent = parents
+        return lct
+
+    #---------------- public accessors ----------------#
+    def find_root(self, u):
+        """ Return the root of the tree containing node u.
+        @param u (int): Index of a node.
+        @return r (int): Index of the root of the tree containing u.
+        """
+        self._access(u)
+        r = u
+        while self._left[r] != -1:
+            r = self._left[r]
+        self._splay(r)
+        return r
+
+    def connected(self, u, v):
+        """ Return True if nodes u and v belong to the same tree. """
+        return self.find_root(u) == self.find_root(v)
+
+    def lca(self, u, v):
+        """ Given two nodes return their least common ancestor. Return None if the
+        nodes belong to different trees.
+        After accessing u, the root path of u is preferred. Accessing v walks up
+        the root path of v and the last node at which the walk joins the preferred
+        path of u is the least common ancestor.
+        @param u (int): Index of a node.
+        @param v (int): Index of a node.
+        @return w (int): Index of the least common ancestor of u and v.
+        """
+        if not self.connected(u, v):
+            return None
+        self._access(u)
+        return self._access(v)
+
+    def value(self, u):
+        """ Return the value stored at node u. """
+        return self._val[u]
+
+    def path_min(self, u, v):
+        """ Return the node with the minimal value on the path between u and v.
+        Return None if the nodes belong to different trees.
+        The path is split at the least common ancestor w into two vertical paths. After
+        accessing u, splaying w leaves in its right subtree exactly the nodes of the path
+        below w. Thus the aggregate stored at the right child of w together with the value
+        of w gives the minimum of the vertical path.
+        @param u (int): Index of a node.
+        @param v (int): Index of a node.
+        @return k (int): Index of a node on the path such that value[k] is minimal.
+        """
+        w = self.lca(u, v)
+        if w is None:
+            return None
+
+        best = w
+        for x in (u, v):
+            self._access(x)
+            self._splay(w)
+            r = self._right[w]
+            if r != -1 and self._val[self._arg[r]] < self._val[best]:
+                best = self._arg[r]
+        return best
+
+    #---------------- public mutators ----------------#
+    def link(self, u, v):
+        """ Make the root node u a child of node v.
+        Raise ValueError if u is not a root or if u and v belong to the same tree.
+        @param u (int): Index of the root of a tree.
+        @param v (int): Index of a node in a different tree.
+        """
+        if self.find_root(u) != u:
+            raise ValueError("u must be the root of its tree")
+        if self.find_root(v) == u:
+            raise ValueError("u and v belong to the same tree")
+        self._access(u)
+        self._parent[u] = v
+
+    def cut(self, u):
+        """ Detach the subtree rooted at node u from its parent.
+        Raise ValueError if u is the root of its tree.
+        @param u (int): Index of a node.
+        """
+        self._access(u)
+        l = self._left[u]
+        if l == -1:
+            raise ValueError("u is the root of its tree")
+        self._parent[l] = -1
+        self._left[u] = -1
+        self._update(u)
+
+    def set_value(self, u, val):
+        """ Replace the value stored at node u. """
+        self._access(u)
+        self._val[u] = val
+        self._update(u)
+
+    #---- private methods - should not be invoked by the user ----#
+    def _is_splay_root(self, x):
+        """ Return True if x is the root of its auxiliary splay tree. """
+        p = self._parent[x]
+        return p == -1 or (self._left[p] != x and self._right[p] != x)
+
+    def _update(self, x):
+        """ Recompute the aggregate of node x from the aggregates of its children. """
+        best = x
+        l, r = self._left[x], self._right[x]
+        if l != -1 and self._val[self._arg[l]] < self._val[best]:
+            best = self._arg[l]
+        if r != -1 and self._val[self._arg[r]] < self._val[best]:
+            best = self._arg[r]
+        self._arg[x] = best
+
+    def _rotate(self, x):
+        """ Rotate node x above its splay parent. The path-parent pointer of the
+        splay root is handed over to x.
+        """
+        p = self._parent[x]
+        g = self._parent[p]
+        if not self._is_splay_root(p):
+            if self._left[g] == p:
+                self._left[g] = x
+            else:
+                self._right[g] = x
+        self._parent[x] = g
+
+        if self._left[p] == x:
+            b = self._right[x]
+            self._left[p] = b
+            self._right[x] = p
+        else:
+            b = self._left[x]
+            self._right[p] = b
+            self._left[x] = p
+        if b != -1:
+            self._parent[b] = p
+        self._parent[p] = x
+
+        self._update(p)
+        self._update(x)
+
+    def _splay(self, x):
+        """ Splay node x to the root of its auxiliary tree. """
+        while not self._is_splay_root(x):
+            p = self._parent[x]
+            if not self._is_splay_root(p):
+                g = self._parent[p]
+                if (self._left[g] == p) == (self._left[p] == x):    # zig-zig
+                    self._rotate(p)
+                else:                                               # zig-zag
+                    self._rotate(x)
+            self._rotate(x)
+
+    def _access(self, x):
+        """ Make the path from the root to node x preferred and splay x to the root
+        of its auxiliary tree. Nodes deeper than x are cut off the preferred path.
+        @param x (int): Index of a node.
+        @return last (int): The last node at which the access joined a new preferred path.
+        """
+        last = -1
+        y = x
+        while y != -1:
+            self._splay(y)
+            self._right[y] = last
+            self._update(y)
+            last = y
+            y = self._parent[y]
+        self._splay(x)
+        return last
+
+#
\ No newline at end of file
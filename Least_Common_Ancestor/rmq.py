@@ -310,7 +310,7 @@ class RMQ_Fischer_Heun(RMQ_block):
         """
         binary_code = [0] * (2* len(block))
         idx = 0
-        S = Stack()
+        S = Stack(capacity=len(block))
 
         for i in range(len(block)):
             while (not S.is_empty()) and (S.top() > block[i]):
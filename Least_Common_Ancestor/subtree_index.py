@@ -0,0 +1,137 @@
+from array import array
+from bisect import bisect_left
+
+
+from . import rmq
+
+
+class SubtreeIndex:
+    """ Concrete class implementing subtree queries using Euler-tour intervals.
+    The nodes are numbered in preorder. Every node u is assigned the interval
+    [tin(u), tout(u)) of the preorder numbers of the nodes in its subtree. Thus the
+    subtree of u occupies a contiguous range of the array of elements laid out in
+    preorder, and the subtree queries reduce to range queries:
+        1. An RMQ structure over the elements answers subtree minimum queries in O(1).
+        2. The node u is an ancestor of v if and only if tin(u) <= tin(v) < tout(u).
+        3. The size of the subtree of u is tout(u) - tin(u).
+    Counting the elements smaller than x in a subtree is answered by a merge-sort
+    tree over the same array. It is built on the first counting query using O(nlogn)
+    memory, and answers queries in O(log^2 n) time.
+    """
+    def __init__(self, tree, RMQ=rmq.RMQ_sparse):
+        """ Initialize a SubtreeIndex for the tree object.
+        @param tree (Tree): A tree object. The elements stored at the nodes must be comparable.
+        @param RMQ (type): An RMQ strategy used to query the ranges of the subtrees.
+        """
+        self._tree = tree
+        self._size = len(tree)
+
+        # Compute the indices of all nodes.
+        self._tree.reindex()
+
+        self._build_intervals()
+        self._rmq = RMQ(self._values)
+        self._sorted_levels = None
+
+    #---------------- public accessors ----------------#
+    def subtree_min(self, p):
+        """ Return the Position of the node with the minimal element in the subtree of p. """
+        u = p.index()
+        i = self._rmq(self._tin[u], self._tout[u] - 1)
+        return self._positions[i]
+
+    def subtree_size(self, p):
+        """ Return the number of nodes in the subtree of p. """
+        u = p.index()
+        return self._tout[u] - self._tin[u]
+
+    def is_ancestor(self, p, q):
+        """ Return True if the node p is an ancestor of the node q. Every node is an
+        ancestor of itself.
+        """
+        u, v = p.index(), q.index()
+        return self._tin[u] <= self._tin[v] < self._tout[u]
+
+    def count_less(self, p, x):
+        """ Return the number of nodes in the subtree of p storing an element smaller than x.
+        The subtree range is split into O(logn) aligned blocks of the merge-sort tree and
+        the elements smaller than x are counted in every block using binary search.
+        @param p (Position): Position representing a node in the tree.
+        @param x: A value comparable with the elements of the tree.
+        @return count (int): The number of elements smaller than x in the subtree.
+        """
+        if self._sorted_levels is None:
+            self._build_sorted_levels()
+
+        u = p.index()
+        lo, hi = self._tin[u], self._tout[u]
+        count = 0
+        l = 0
+        while lo < hi:
+            size = 1 << l
+            level = self._sorted_levels[l]
+            if lo & size:
+                count += bisect_left(level, x, lo, lo + size) - lo
+                lo += size
+            if hi & size and hi - size >= lo:
+                count += bisect_left(level, x, hi - size, hi) - (hi - size)
+                hi -= size
+            l += 1
+        return count
+
+    def subtree_min_many(self, us):
+        """ Batch version of subtree_min working on node indices.
+        @param us (List[int]): A list of node indices.
+        @return ms (List[int]): ms[i] is the index of the node with the minimal element
+                                in the subtree of us[i].
+        """
+        tin, tout, order = self._tin, self._tout, self._order
+        return [order[self._rmq(tin[u], tout[u] - 1)] for u in us]
+
+    #---- private methods - should not be invoked by the user ----#
+    def _build_intervals(self):
+        """ Traverse the tree in preorder using an explicit stack. The preorder numbers
+        give tin, the subtree sizes computed in reverse preorder give tout.
+        """
+        n = self._size
+        self._positions = []
+        parent = array("l", [-1]) * n
+
+        stack = [self._tree.root()]
+        while stack:
+            p = stack.pop()
+            self._positions.append(p)
+            children = list(self._tree.children(p))
+            for ch in children:
+                parent[ch.index()] = p.index()
+            stack.extend(reversed(children))
+
+        self._order = array("l", [p.index() for p in self._positions])
+        self._tin = array("l", [0]) * n
+        for i, u in enumerate(self._order):
+            self._tin[u] = i
+
+        size = array("l", [1]) * n
+        for u in reversed(self._order):
+            if parent[u] != -1:
+                size[parent[u]] += size[u]
+        self._tout = array("l", [self._tin[u] + size[u] for u in range(n)])
+
+        self._values = [p.elem() for p in self._positions]
+
+    def _build_sorted_levels(self):
+        """ Build a merge-sort tree over the elements in preorder. Level l consists of the
+        aligned blocks of size 2^l, each of them sorted.
+        """
+        levels = [list(self._values)]
+        size = 1
+        while size < self._size:
+            prev = levels[-1]
+            curr = []
+            for start in range(0, self._size, 2 * size):
+                curr.extend(sorted(prev[start:start + 2 * size]))
+            levels.append(curr)
+            size *= 2
+        self._sorted_levels = levels
+
+#
\ No newline at end of file
@@ -1,9 +1,14 @@
 import math
+from array import array
+from bisect import bisect_right
 
 
-from utils.tree import Tree
-from utils.queue import Queue
-from utils.traversal_algorithms import breadth_first_traversal, depth_first_traversal
+from utils import forest
+from utils.compact_tree import CompactTree, PositionTable
+from utils.positional_container import NodeTable
+from utils.traversal_algorithms import level_order, preorder, preorder_indices
+from . import parallel
+from .micro_trees import MicroTreeCatalogue
 
 
 class LA_base:
@@ -18,7 +23,13 @@ class LA_base:
         self._size = len(tree)
 
         self._tree.reindex()
-        self._preprocess()
+
+        # Cache one Position per node for the duration of the build.
+        cached = tree.cache_positions(True)
+        try:
+            self._preprocess()
+        finally:
+            tree.cache_positions(cached)
 
     def _preprocess(self):
         """ Preprocess the tree. """
@@ -49,16 +60,14 @@ class LA_table(LA_base):
         # A 2D table storing all possible queries.
         self._table = {}
 
-        # Build the table using bottom-up dynamic programming.
-        for p in breadth_first_traversal(self._tree):
-            self._table[p.index()] = [p]
-
-            l = 0
-            while (l < self._tree.depth(p)):
-                u = self._table[p.index()][l]
-                w = self._tree.parent(u)
-                self._table[p.index()].append(w)
-                l += 1
+        # Build the table using dynamic programming. The nodes are visited level by level,
+        # so the ancestors of a node are obtained by extending the row of its parent.
+        for p in level_order(self._tree):
+            row = [p]
+            q = self._tree.parent(p)
+            if q is not None:
+                row.extend(self._table[q.index()])
+            self._table[p.index()] = row
 
     def _query(self, p, k):
         """ Perform simple table look-up. """
@@ -86,143 +95,668 @@ class LA_sparse(LA_base):
     Querying is performed by looking up in the table and retrieving the ancestor
     of level 2^l-th power. The answer to the query is the level d-th ancestor of
     the retrieved element. Querying is done in O(1) time.
+
+    All structures are stored in contiguous integer arrays indexed by the node
+    indices. The ladders are concatenated in a single buffer, and the table of
+    ancestors is a 2D array stored row by row in a flat buffer. The index keeps only a
+    reference to every node and creates the positions of the answers on demand.
+
+    After a subtree of the tree is modified the structure can be updated with
+    update_subtree(). Only the paths, ladders and table rows in the affected region
+    are rebuilt and appended to the buffers, the old ones are left as garbage.
+
+    With workers=N the ladders and the rows of the sparse table are built by a pool of
+    N forked worker processes writing into shared flat arrays. The traversal of the tree
+    stays sequential and takes 30 to 50 percent of the build, so the build is at most two
+    to three times faster. Trees with fewer than parallel.MIN_SIZE nodes are always built sequentially.
+    The finished structure keeps the shared arrays and copies them into regular arrays
+    only when it is updated for the first time.
     """
+    def __init__(self, tree, workers=1):
+        """ Initialize an instance of the LA_sparse class.
+        @param tree (Tree): A tree object.
+        @param workers (int): The number of processes used to build the structure.
+                              Default value is 1.
+        """
+        self._workers = workers
+        super().__init__(tree)
+
     def _preprocess(self):
         """ Decompose the tree into paths with maximal lengths. Extend the paths
         into ladders by doubling their length. Precompute a sparse table storing
         ancestors of levels 1, 2, 4, 8, ...., 2^k.
         """
         # Precompute a logarithm table. log[n] = k => 2^k <= n < 2^(k+1)
-        self._log = [0] * (self._size + 1)
-        temp = 1
-        for i in range(1, self._size + 1):
-            self._log[i] = self._log[i - 1]
-            if temp * 2 <= i:
-                self._log[i] += 1
-                temp *= 2
+        self._log = array("l", [0, 0])
+
+        # Index arrays storing the nodes, the parents, the depths and the heights of the nodes.
+        # Only the nodes are stored and their positions are created on demand.
+        self._positions = NodeTable(self._tree)
+        self._parent = array("l")
+        self._depth = array("l")
+        self._height = array("l")
+
+        # Buffer storing the concatenated ladders. Each ladder is stored top-to-bottom.
+        self._ladders = array("l")
+
+        # Array storing the start of every ladder in the buffer.
+        self._offsets = array("l", [0])
+
+        # Index array storing the position of the node in the ladder of the path which contains it.
+        self._rung = array("l")
+
+        # Index array storing the row of the jump-node descendant of the node.
+        self._jump = array("l")
+
+        # Array storing the jump node of every row of the sparse table.
+        self._jump_nodes = array("l")
+
+        # Sparse table of ancestors of levels 1, 2, 4, 8, ...., 2^k only for the jump nodes.
+        self._table = array("l")
+
+        # Number of entries in the buffers that belong to discarded ladders or micro trees.
+        self._garbage = 0
+
+        # Sparse tables of path minima and maxima. They are built on the first search query.
+        self._path_tables = {}
+
+        # True if the buffers are views of the shared arrays written by the workers.
+        self._shared = False
+
+        # Store the parents, the depths and the heights of the nodes in arrays.
+        order = self._flatten_all()
 
         # Compute the log of the size of the tree.
         self._logsize = self._log[self._size] + 1
 
-        # Precompute a power table. pow[k] = n => 2^k = n
-        self._pow = [1] * (self._logsize + 1)
-        for i in range(1, self._logsize):
-            self._pow[i] = 2 * self._pow[i - 1]
+        # Build the ladders and the sparse table for the entire tree.
+        if self._workers > 1 and self._size >= parallel.MIN_SIZE and parallel.fork_available():
+            self._build_parallel(order)
+        else:
+            self._build_region(order)
+
+    def update_subtree(self, p, threshold=None):
+        """ Update the structure after the subtree rooted at p was modified. New nodes may be
+        added anywhere inside the subtree, and the new nodes must have the consecutive indices
+        assigned by the tree. The nodes outside of the subtree must not be modified.
+        The subtree of p is traversed again and the heights of the ancestors of p are recomputed
+        bottom-up until the first ancestor whose height did not change. Only the paths passing
+        through the affected nodes are rebuilt, the remaining paths stay valid since the heights
+        of their nodes did not change. The structure is rebuilt from scratch if the heights of
+        more than *threshold* ancestors change, if the subtree contains more than half of the
+        tree, or if too much garbage is accumulated in the buffers. The tree is not reindexed
+        by either path, so node indices held by the caller stay valid.
+        @param p (Position): Position representing the root of the modified subtree.
+        @param threshold (int): The maximal number of ancestors of p whose heights can change
+                                before falling back to a full rebuild. Default value is logn.
+        """
+        size = len(self._tree)
+        if size.bit_length() != self._logsize:      # the rows of the sparse table must grow
+            return self._rebuild()
+        if isinstance(self._tree, CompactTree):     # a loaded tree copies its arrays when modified
+            self._parent = self._tree.parent_array()
+            self._depth = self._tree.depth_array()
+        if self._shared:
+            self._unshare()
+        self._grow(size)
+        if threshold is None:
+            threshold = self._logsize
+
+        # The elements of the ancestors of the new nodes are not part of the path tables.
+        self._path_tables = {}
+
+        # Recompute the subtree of p.
+        r = p.index()
+        region = self._flatten(p)
+        if 2 * len(region) > self._size:
+            return self._rebuild()
+
+        # Walk up until the height of the ancestor does not change.
+        chain = []
+        u = self._parent[r]
+        while u != -1:
+            h = 1 + max(self._height[ch.index()] for ch in self._tree.children(self._positions[u]))
+            if h == self._height[u]:
+                break
+            self._height[u] = h
+            chain.append(u)
+            if len(chain) > threshold:
+                return self._rebuild()
+            u = self._parent[u]
+
+        nodes = self._affected_nodes(r, region, chain)
+        bottoms = self._discard(nodes)
+        if self._garbage > self._size:
+            return self._rebuild()
+        self._build_region(nodes, bottoms)
+
+    def _query(self, p, k):
+        """ Query the structure using the index of the node and convert the result
+        back to a position.
+        """
+        w = self._query_index(self._id(p), k)
+        return self._node(w, p)
+
+    def query_many(self, nodes, ks):
+        """ Batch version of the level ancestor query working on node indices.
+        Every stage of the query is a gather from the flat arrays, and the whole
+        batch is answered without creating any positions.
+        @param nodes (List[int]): A list of node indices.
+        @param ks (List[int]): A list of levels. ks[i] is the level for nodes[i].
+        @return ancestors (List[int]): ancestors[i] is the index of the level ks[i] ancestor
+                                       of nodes[i], or -1 if ks[i] exceeds its depth.
+        """
+        depth, jump, jump_nodes = self._depth, self._jump, self._jump_nodes
+        log, table, logsize = self._log, self._table, self._logsize
+        ladders, rung = self._ladders, self._rung
+
+        result = [-1] * len(nodes)
+        for i, (v, k) in enumerate(zip(nodes, ks)):
+            if k > depth[v]:
+                continue
+            if k == 0:
+                result[i] = v
+                continue
+            row = jump[v]
+            k += depth[jump_nodes[row]] - depth[v]
+            l = log[k]
+            result[i] = ladders[rung[table[row * logsize + l]] - k + (1 << l)]
+        return result
+
+    def ancestor_at_depth(self, p, d):
+        """ Given a position to node u and an integer d return the ancestor of u at depth d.
+        Return None if d is negative or exceeds the depth of u.
+        """
+        v = self._id(p)
+        if d < 0 or d > self._depth[v]:
+            return None
+        w = self._query_index(v, self._depth[v] - d)
+        return self._node(w, p)
+
+    def ancestor_at_depth_many(self, nodes, ds):
+        """ Batch version of ancestor_at_depth working on node indices.
+        @param nodes (List[int]): A list of node indices.
+        @param ds (List[int]): A list of depths. ds[i] is the depth for nodes[i].
+        @return ancestors (List[int]): ancestors[i] is the index of the ancestor of nodes[i]
+                                       at depth ds[i], or -1 if it does not exist.
+        """
+        depth = self._depth
+        ks = [depth[v] - d if 0 <= d <= depth[v] else depth[v] + 1 for v, d in zip(nodes, ds)]
+        return self.query_many(nodes, ks)
+
+    def highest_ancestor(self, p, predicate):
+        """ Given a position to node u return the highest ancestor of u whose element satisfies
+        the predicate. The predicate must be monotone along the path to the root: if it holds
+        for an ancestor w, then it holds for all nodes on the path from u to w. Return None if
+        the predicate does not hold for u. The ancestor is found by climbing 2^l levels for l
+        from the highest level of the sparse table down to 0, using O(logn) jumps.
+        @param p (Position): Position representing a node in the tree.
+        @param predicate (callable): A function mapping an element to a boolean.
+        @return ancestor (Position): Position of the highest ancestor satisfying the predicate.
+        """
+        w = self._highest_ancestor_index(self._id(p), predicate)
+        return self._node(w, p)
+
+    def highest_ancestor_many(self, nodes, predicate):
+        """ Batch version of highest_ancestor working on node indices.
+        @param nodes (List[int]): A list of node indices.
+        @param predicate (callable): A function mapping an element to a boolean.
+        @return ancestors (List[int]): ancestors[i] is the index of the highest ancestor of
+                                       nodes[i] satisfying the predicate, or -1.
+        """
+        return [self._highest_ancestor_index(v, predicate) for v in nodes]
 
-        # Build a list of the jump nodes sorted by depth.
-        self._build_jump_nodes()
+    def first_ancestor_at_most(self, p, x):
+        """ Given a position to node u return the first node on the path from u to the root
+        whose element is at most x. Return None if there is no such node.
+        """
+        w = self._first_ancestor_index(self._id(p), x, min)
+        return self._node(w, p)
 
-        # Build a list of ladders.
-        self._build_ladders()
+    def first_ancestor_at_least(self, p, x):
+        """ Given a position to node u return the first node on the path from u to the root
+        whose element is at least x. Return None if there is no such node.
+        """
+        w = self._first_ancestor_index(self._id(p), x, max)
+        return self._node(w, p)
+
+    def first_ancestor_at_most_many(self, nodes, xs):
+        """ Batch version of first_ancestor_at_most working on node indices.
+        @param nodes (List[int]): A list of node indices.
+        @param xs (List): A list of thresholds. xs[i] is the threshold for nodes[i].
+        @return ancestors (List[int]): ancestors[i] is the index of the first node on the path
+                                       from nodes[i] to the root whose element is at most xs[i],
+                                       or -1 if there is no such node.
+        """
+        return [self._first_ancestor_index(v, x, min) for v, x in zip(nodes, xs)]
 
-        # Build a sparse table of ancestors of levels 1, 2, 4, 8, ...., 2^k only for the leaves.
-        self._build_sparse_table()
+    def first_ancestor_at_least_many(self, nodes, xs):
+        """ Batch version of first_ancestor_at_least working on node indices. """
+        return [self._first_ancestor_index(v, x, max) for v, x in zip(nodes, xs)]
 
-    def _query(self, p, k):
-        """ Answering lavel ancestor queries for a node p is performed at three steps. First we find
-        the jump-node descendant of p and we precompute the level k. Then we jump to the ancestor
-        of level 2^l using the jump pointer. Finally we look inside the ladder of the ancestor of 
+    def _highest_ancestor_index(self, v, predicate):
+        """ Climb from node v trying the levels 2^l from the highest one down. The jump is
+        taken if the predicate holds for the ancestor it reaches. The predicate is monotone,
+        so after trying all levels v is the highest ancestor satisfying it. The search takes
+        O(logn) jumps and predicate evaluations.
+        """
+        positions, depth = self._positions, self._depth
+        if not predicate(positions[v].elem()):
+            return -1
+        for l in range(self._logsize - 1, -1, -1):
+            if (1 << l) > depth[v]:
+                continue
+            w = self._climb(v, 1 << l)
+            if predicate(positions[w].elem()):
+                v = w
+        return v
+
+    def _first_ancestor_index(self, v, x, select):
+        """ Climb from node v using the sparse table of path extrema. The entry of level l for
+        a node covers the 2^l nodes on the path starting at that node. If the extremum of the
+        covered nodes does not reach x, none of them is the answer and we jump above them.
+        Trying the levels from the highest one down, the search stops below the answer after
+        O(logn) steps.
+        @param v (int): Index of a node in the tree.
+        @param x: A value comparable with the elements of the tree.
+        @param select (callable): Either min or max.
+        @return w (int): Index of the first node on the path whose element reaches x, or -1.
+        """
+        table = self._path_tables.get(select)
+        if table is None:
+            table = self._build_path_table(select)
+        n = self._size
+        for l in range(self._logsize - 1, -1, -1):
+            if v == -1:
+                break
+            value = table[l * n + v]
+            if (value > x) if select is min else (value < x):
+                v = self._climb(v, 1 << l)
+        if v != -1:
+            value = table[v]
+            if (value > x) if select is min else (value < x):
+                return -1
+        return v
+
+    def _climb(self, v, k):
+        """ Return the level k ancestor of node v, or -1 if k exceeds the depth of v. If the
+        ladder containing v extends k levels above it, the ancestor is read directly from the
+        ladder. Otherwise the jump goes through the sparse table. Nodes of micro trees are not
+        on any ladder and are always answered by _query_index.
+        """
+        row = self._jump[v]
+        if row != -1 and self._rung[v] - k >= self._offsets[row]:
+            return self._ladders[self._rung[v] - k]
+        return self._query_index(v, k)
+
+    def _build_path_table(self, select):
+        """ Build a sparse table of path extrema. The table is stored level by level in a
+        flat list. The entry of level l for the node v is the extremum of the elements of the
+        2^l nodes on the path starting at v, or of all nodes on the path to the root if the
+        path is shorter. Building the table takes O(nlogn) time.
+        @param select (callable): Either min or max.
+        @return table (List): The sparse table of path extrema.
+        """
+        n = self._size
+        table = [p.elem() for p in self._positions]
+        nodes = range(n)
+        for l in range(1, self._logsize):
+            base = (l - 1) * n
+            ancestors = self.query_many(nodes, [1 << (l - 1)] * n)
+            for v, w in zip(nodes, ancestors):
+                if w == -1:
+                    table.append(table[base + v])
+                else:
+                    table.append(select(table[base + v], table[base + w]))
+        self._path_tables[select] = table
+        return table
+
+    def _query_index(self, v, k):
+        """ Answering lavel ancestor queries for a node v is performed at three steps. First we find
+        the jump-node descendant of v and we precompute the level k. Then we jump to the ancestor
+        of level 2^l using the jump pointer. Finally we look inside the ladder of the ancestor of
         level 2^l.
+        @param v (int): Index of a node in the tree.
+        @param k (int): An integer giving the level of the ancestor.
+        @return w (int): Index of the level k ancestor of v, or -1 if k exceeds the depth of v.
         """
-        if k > self._tree.depth(p):
-            return None
+        if k > self._depth[v]:
+            return -1
 
         if k == 0:
-            return p
+            return v
 
         # Find the jump-node descendant of the node and recompute the query level.
-        jump = self._jump[p.index()]
-        k = k + self._tree.depth(jump) - self._tree.depth(p)
+        row = self._jump[v]
+        k = k + self._depth[self._jump_nodes[row]] - self._depth[v]
 
         l = self._log[k]        # k = 2^l + d
-        d = k - self._pow[l]
-
-        u = self._table[jump.index()][l]
-        w = self._ladders[self._path[u.index()]][self._ind[u.index()] - d]
+        d = k - (1 << l)
 
-        return w
+        u = self._table[row * self._logsize + l]
+        return self._ladders[self._rung[u] - d]
 
-    def _build_jump_nodes(self):
-        """ Build a list of jump nodes for the tree. Designate the leaves of the tree as
-        jump nodes. Sort the list in linear time.
-        """
-        self._jump_nodes = [p for p in self._tree.positions() if self._tree.is_leaf(p)]
-        self._jump_nodes.sort(key=lambda p: self._tree.depth(p), reverse=True)     # Bucket sort should be used !
+    def _id(self, p):
+        """ Return the index of the node. """
+        return p if isinstance(p, int) else p.index()
 
-    def _build_ladders(self):
-        """ Build a list of ladders. """
-        # List of ladders. Each ladder is a list of nodes.
-        self._ladders = [None] * len(self._jump_nodes)
+    def _node(self, w, p):
+        """ Convert the index w to the same form as the query argument p. """
+        if w == -1:
+            return None
+        return w if isinstance(p, int) else self._positions[w]
 
-        # Array storing the index of the unique path containing the node.
-        self._path = [None] * self._size
+    def _rebuild(self):
+        """ Rebuild the structure from scratch. The tree is not reindexed: the new nodes
+        already have consecutive indices, so the indices held by the callers stay valid.
+        """
+        self._size = len(self._tree)
+        self._preprocess()
 
-        # Index array storing the index of the node in the path which contains it.
-        self._ind = [None] * self._size
+    def _grow(self, size):
+        """ Extend the index arrays and the logarithm table to accommodate *size* nodes.
+        Arrays shared with a compact tree are extended by the tree itself.
+        """
+        if len(self._positions) < size:
+            self._positions.extend([None] * (size - len(self._positions)))
+        for arr, fill in ((self._parent, -1), (self._depth, 0), (self._height, 0),
+                          (self._rung, -1), (self._jump, -1)):
+            if len(arr) < size:
+                arr.extend(array("l", [fill]) * (size - len(arr)))
+        for i in range(len(self._log), size + 1):
+            self._log.append(self._log[i >> 1] + 1)
+        self._size = size
+
+    def _flatten_all(self):
+        """ Store the parents, the depths and the heights of all nodes in the tree.
+        @return order (List[int]): The indices of all nodes. Every node is listed before its children.
+        """
+        if isinstance(self._tree, CompactTree):
+            return self._flatten_compact()
+        self._grow(self._size)
+        return self._flatten(self._tree.root())
+
+    def _flatten_compact(self):
+        """ A compact tree already stores the parents and the depths in arrays indexed by
+        the node indices, so they are shared without copying. Only the heights are copied,
+        because they change when the tree grows. Positions are created on demand. Every
+        node has a larger index than its parent, so the indices are in a valid order.
+        """
+        self._parent = self._tree.parent_array()
+        self._depth = self._tree.depth_array()
+        self._height = array("l", self._tree.height_array())
+        self._positions = PositionTable(self._tree)
+        self._grow(self._size)
+        return range(self._size)
+
+    def _flatten(self, p):
+        """ Traverse the subtree rooted at p using an explicit stack. Store a mapping from
+        node indices to positions. Store the parent and the depth of every node in the
+        subtree, and compute the heights bottom-up. The parents and the depths of a compact
+        tree are read from the arrays of the tree, which must not be modified.
+        @param p (Position): Position representing the root of the subtree.
+        @return order (List[int]): The indices of the nodes of the subtree. Every node
+                                   is listed before its children.
+        """
+        parent, depth, height = self._parent, self._depth, self._height
+        compact = isinstance(self._tree, CompactTree)
+        if not compact:
+            r = p.index()
+            q = self._tree.parent(p)
+            parent[r] = q.index() if q is not None else -1
+            depth[r] = depth[parent[r]] + 1 if q is not None else 0
+
+        order = []
+        stack = [p]
+        while stack:
+            p = stack.pop()
+            v = p.index()
+            self._positions[v] = p
+            order.append(v)
+            height[v] = 0
+            for ch in self._tree.children(p):
+                if not compact:
+                    c = ch.index()
+                    parent[c] = v
+                    depth[c] = depth[v] + 1
+                stack.append(ch)
+
+        # Children are listed after their parents, compute the heights in reverse order.
+        for i in range(len(order) - 1, 0, -1):
+            v = order[i]
+            u = parent[v]
+            if height[u] <= height[v]:
+                height[u] = height[v] + 1
+        return order
+
+    def _affected_nodes(self, r, region, chain):
+        """ Return the nodes whose paths must be rebuilt.
+        @param r (int): Index of the root of the modified subtree.
+        @param region (List[int]): The indices of the nodes of the subtree, root first.
+        @param chain (List[int]): The indices of the ancestors of r with changed heights.
+        @return nodes (List[int]): The affected nodes. Every node is listed before its children.
+        """
+        return region + chain
 
-        # Index array storing a pointer to the jump-node descendant of the node.
-        self._jump = [None] * self._size
+    def _discard(self, nodes):
+        """ Mark the paths passing through the given nodes as unvisited. The ladders of the
+        discarded paths are left in the buffer as garbage.
+        @param nodes (List[int]): A list of node indices.
+        @return bottoms (List[int]): The jump nodes at the bottom of the discarded paths.
+        """
+        jump, rung, parent, offsets = self._jump, self._rung, self._parent, self._offsets
+
+        rows = {jump[v] for v in nodes if jump[v] != -1}
+        bottoms = []
+        for row in rows:
+            u = self._jump_nodes[row]
+            bottoms.append(u)
+            while u != -1 and jump[u] == row:
+                jump[u] = rung[u] = -1
+                u = parent[u]
+            self._garbage += offsets[row + 1] - offsets[row]
+        return bottoms
+
+    def _build_region(self, nodes, bottoms=()):
+        """ Build the ladders and the sparse table rows for the nodes that are not assigned
+        to a path. The rows of the new jump nodes are appended to the sparse table.
+        @param nodes (List[int]): The indices of the nodes of the region.
+        @param bottoms (List[int]): Additional jump nodes at the bottom of discarded paths.
+        """
+        first = len(self._jump_nodes)
+        self._build_ladders(self._build_jump_nodes(nodes, bottoms))
+        self._build_sparse_table(first)
+
+    def _sort_jump_nodes(self, jump_nodes):
+        """ Bucket sort the jump nodes by depth in descending order. """
+        if not jump_nodes:
+            return []
+        depths = [self._depth[v] for v in jump_nodes]
+        base = min(depths)
+        buckets = [[] for _ in range(max(depths) - base + 1)]
+        for v, d in zip(jump_nodes, depths):
+            buckets[d - base].append(v)
+        return [v for bucket in reversed(buckets) for v in bucket]
+
+    def _build_jump_nodes(self, nodes, bottoms=()):
+        """ Build a list of jump nodes for the region. Designate the leaves of the tree that
+        are not assigned to a path as jump nodes. Sort the list in linear time.
+        @param nodes (List[int]): The indices of the nodes of the region.
+        @param bottoms (List[int]): Additional jump nodes at the bottom of discarded paths.
+        @return jump_nodes (List[int]): The jump nodes sorted by depth in descending order.
+        """
+        height, jump = self._height, self._jump
+        leaves = [v for v in nodes if height[v] == 0 and jump[v] == -1]
+        if bottoms:
+            known = set(leaves)
+            leaves.extend(v for v in bottoms if v not in known)
+        return self._sort_jump_nodes(leaves)
+
+    def _build_ladders(self, jump_nodes):
+        """ Build the ladders for the given jump nodes and append them to the buffer.
+        Paths stop at the nodes already assigned to a path.
+        """
+        parent, jump = self._parent, self._jump
 
         # Decompose the tree into paths with maximal lengths.
-        marked = {p.index() : False for p in self._tree.positions()}
-        for idx, jump in enumerate(self._jump_nodes):
+        for jump_node in jump_nodes:
+            row = len(self._jump_nodes)
+            self._jump_nodes.append(jump_node)
+
             # Greedy build of a path.
             ladder = []
-            curr = jump
-            while (curr is not None) and not (marked[curr.index()]):
+            curr = jump_node
+            while (curr != -1) and jump[curr] == -1:
                 ladder.append(curr)
-                marked[curr.index()] = True
-                self._path[curr.index()] = idx
-                self._ind[curr.index()] = len(ladder) - 1
-                self._jump[curr.index()] = jump
-                curr = self._tree.parent(curr)
+                jump[curr] = row
+                curr = parent[curr]
 
             # Double path to build a ladder.
             path_size = len(ladder)
-            while (curr is not None) and len(ladder) < 2 * path_size:
+            while (curr != -1) and len(ladder) < 2 * path_size:
                 ladder.append(curr)
-                curr = self._tree.parent(curr)
+                curr = parent[curr]
 
-            # Reverse the ladder.
+            # Reverse the ladder and add it to the buffer.
+            start = len(self._ladders)
             ladder_size = len(ladder)
             for i in range(path_size):
-                node = ladder[i]
-                self._ind[node.index()] = ladder_size - self._ind[node.index()] - 1
+                self._rung[ladder[i]] = start + ladder_size - i - 1
             ladder.reverse()
+            self._ladders.extend(ladder)
+            self._offsets.append(len(self._ladders))
 
-            # Add ladder to the list of ladders.
-            self._ladders[idx] = ladder
-
-    def _build_sparse_table(self):
-        """ Build a sparse table of ancestors of levels 1, 2, 4, 8, ...., 2^k only for the leaves. """
-        self._table = {}
+    def _build_sparse_table(self, first):
+        """ Build the rows of the sparse table of ancestors of levels 1, 2, 4, 8, ...., 2^k
+        for the jump nodes starting from row *first*.
+        """
+        self._table.extend(array("l", [-1]) * ((len(self._jump_nodes) - first) * self._logsize))
+        self._fill_sparse_table(first, len(self._jump_nodes))
 
-        for p in self._jump_nodes:
-            self._table[p.index()] = [self._tree.parent(p)]       # table[p][0] = parent(p)
+    def _fill_sparse_table(self, first, last):
+        """ Fill the rows of the sparse table in the range [first, last). """
+        for row in range(first, last):
+            p = self._jump_nodes[row]
+            base = row * self._logsize
+            u = self._parent[p]
+            self._table[base] = u                           # table[p][0] = parent(p)
 
             l = 0
-            while l < self._logsize:
-                u = self._table[p.index()][l]
-
-                if u is None:
+            while l + 1 < self._logsize:
+                if u == -1:
                     break
 
-                if self._ind[u.index()] < self._pow[l]:     # incomplete ladder
+                rung = self._rung[u]                        # u is stored at ladders[rung]
+                if rung - self._offsets[self._jump[u]] < (1 << l):  # incomplete ladder
                     break
 
-                i = self._path[u.index()]                   # u belongs to path_i
-                j = self._ind[u.index()]                    # path_i[j] = u
-                w = self._ladders[i][j - self._pow[l]]
-                self._table[p.index()].append(w)
+                u = self._ladders[rung - (1 << l)]
+                self._table[base + l + 1] = u
                 l += 1
 
 
+    def _bottom_height(self):
+        """ Return the height of the nodes at the bottom of the paths. """
+        return 0
+
+    def _build_parallel(self, order, tasks=()):
+        """ Build the ladders and the sparse table using a pool of worker processes.
+        Instead of the greedy decomposition every node continues the path of its tallest
+        child, which gives paths with maximal lengths as well. The paths are identified by
+        their top nodes and the length of every ladder is known in advance. Thus the ladders
+        can be written independently into a shared buffer. Once all ladders are built, the
+        rows of the sparse table are filled in parallel.
+        @param order (List[int]): The indices of all nodes. Every node is listed before its children.
+        @param tasks (List[Tuple[str, Tuple]]): Additional tasks executed together with the ladders.
+        @return results (List): The results of the additional tasks.
+        """
+        parent, depth, height = self._parent, self._depth, self._height
+        bottom = self._bottom_height()
+
+        # Index array storing the tallest child of every node on a path.
+        self._long = array("l", [-1]) * self._size
+        for v in order:
+            u = parent[v]
+            if u != -1 and height[v] >= bottom:
+                w = self._long[u]
+                if w == -1 or height[v] > height[w]:
+                    self._long[u] = v
+
+        # Find the top nodes of the paths and compute the start of every ladder.
+        self._tops = array("l")
+        for v in order:
+            if height[v] >= bottom and (parent[v] == -1 or self._long[parent[v]] != v):
+                length = height[v] - bottom + 1
+                self._offsets.append(self._offsets[-1] + length + min(length, depth[v]))
+                self._tops.append(v)
+        rows = len(self._tops)
+
+        # Allocate the arrays written by the workers in shared memory.
+        self._ladders = parallel.shared_array(self._offsets[-1])
+        self._rung = parallel.shared_array(self._size, fill=-1)
+        self._jump = parallel.shared_array(self._size, fill=-1)
+        self._jump_nodes = parallel.shared_array(rows)
+        self._table = parallel.shared_array(rows * self._logsize, fill=-1)
+
+        chunks = parallel.chunks(rows, self._workers)
+        ladder_tasks = [("_build_ladders_range", chunk) for chunk in chunks]
+        table_tasks = [("_fill_sparse_table", chunk) for chunk in chunks]
+        results, _ = parallel.run(self, [ladder_tasks + list(tasks), table_tasks], self._workers)
+
+        # Keep using the shared arrays through views, without copying them.
+        self._ladders = parallel.view(self._ladders, self._offsets[-1])
+        self._rung = parallel.view(self._rung, self._size)
+        self._jump = parallel.view(self._jump, self._size)
+        self._jump_nodes = parallel.view(self._jump_nodes, rows)
+        self._table = parallel.view(self._table, rows * self._logsize)
+        self._shared = True
+        del self._long, self._tops
+        return results[len(ladder_tasks):]
+
+    def _unshare(self):
+        """ Copy the views of the shared arrays into regular arrays, so that the buffers can grow. """
+        self._ladders = array("l", self._ladders)
+        self._rung = array("l", self._rung)
+        self._jump = array("l", self._jump)
+        self._jump_nodes = array("l", self._jump_nodes)
+        self._table = array("l", self._table)
+        self._shared = False
+
+    def _build_ladders_range(self, first, last):
+        """ Build the ladders of the paths with rows in the range [first, last). Every path
+        is followed down from its top node along the tallest children. Executed by a worker.
+        """
+        parent, height, long = self._parent, self._height, self._long
+        ladders, rung, jump = self._ladders, self._rung, self._jump
+        bottom = self._bottom_height()
+
+        for row in range(first, last):
+            # Follow the path down from its top node.
+            path = [self._tops[row]]
+            while height[path[-1]] != bottom:
+                path.append(long[path[-1]])
+
+            # The ladder stores the ancestors of the top node followed by the path.
+            start = self._offsets[row]
+            above = self._offsets[row + 1] - start - len(path)
+            u = path[0]
+            for i in range(above - 1, -1, -1):
+                u = parent[u]
+                ladders[start + i] = u
+            for i, v in enumerate(path, start + above):
+                ladders[i] = v
+                rung[v] = i
+                jump[v] = row
+            self._jump_nodes[row] = path[-1]
+
+
 class LA_macro_micro(LA_sparse):
     """ Concrete class implementing the macro-micro tree strategy.
     We divide the tree into a macro tree and disjoint micro trees. We perform
     ladder decomposition of the tree and designate the macro leaves as jump nodes.
     We enumerate all possible shapes of the micro trees and precompute a simple
-    table for every shape.
+    table for every shape. The tables are kept in a process-wide catalogue keyed by
+    the block size, so every shape is processed once and shared by all instances.
 
     To answer level ancestor queries we check wheter the node belongs to the
     macro tree or to one of the micro trees. Querying the macro tree is done
@@ -237,151 +771,511 @@ class LA_macro_micro(LA_sparse):
         """
         # Size of each micro tree: B = 1/4 logn.
         self._block_size = int(1/4 * math.log2(self._size))
+        self._catalogue = MicroTreeCatalogue.get(self._block_size)
 
-        # Build a list of ladders and a sparse table for the jump nodes.
-        super()._preprocess()
+        # Store the roots of all micro trees.
+        self._micro_roots = []
 
-        # Decompose the tree into macro tree and micro trees.
-        self._micro_macro_decomposition()
+        # Index array storing for every micro node the number of its micro tree.
+        self._micro = array("l")
 
-        # Build simple tables for the micro trees.
-        self._build_micro_tree_tables()
+        # Buffer storing the nodes of every micro tree in preorder.
+        self._micro_nodes = array("l")
 
-    def _query(self, p, k):
+        # Array storing the start of every micro tree in the buffer.
+        self._micro_start = array("l")
+
+        # Array storing the shape id of every micro tree.
+        self._micro_shape = array("l")
+
+        # Index array storing for every micro node its preorder number inside its micro tree.
+        self._local = array("l")
+
+        # Bitmap marking the jump nodes of the region being built. It is cleared after every
+        # build, so an update does not allocate a bitmap over the whole tree.
+        self._marked = bytearray()
+
+        # Build a list of ladders and a sparse table for the jump nodes. Decompose the tree
+        # into macro tree and micro trees and build simple tables for the micro trees.
+        super()._preprocess()
+
+    def _query_index(self, v, k):
         """ To answer level ancestor queries we first check whether the node is a macro node or
         a micro node. For macro nodes we query the macro structure using ladders and jump ponters.
         For micro nodes we check wheter the level ancestor is a macro node or a micro node. If the
         level ancestor is a macro node we again query the macro structure. If the level ancestor is
         a micro node we query the simple table for the micro tree.
         """
-        if self._tree.height(p) > self._block_size:     # macro node
-            return super()._query(p, k)                 # query the macro tree
+        if self._height[v] > self._block_size:          # macro node
+            return super()._query_index(v, k)           # query the macro tree
         else:                                           # micro node
-            root = self._root[p.index()]
-            if k > (self._tree.depth(p) - self._tree.depth(root)):  # ancestor is a macro node
-                parent = self._tree.parent(root)
-                k = k - (self._tree.depth(p) - self._tree.depth(root)) - 1
-                return super()._query(parent, k)                    # query the macro tree
+            t = self._micro[v]
+            root = self._micro_nodes[self._micro_start[t]]
+            if k > self._depth[v]:
+                return -1
+            if k > (self._depth[v] - self._depth[root]):            # ancestor is a macro node
+                parent = self._parent[root]
+                k = k - (self._depth[v] - self._depth[root]) - 1
+                return super()._query_index(parent, k)              # query the macro tree
             else:                                                   # ancestor is a micro node
-                code, f, f_inv = self._codes[root.index()]
-                table = self._micro_tables[code]
-                ancestor = table(f[p.index()], k)                   # query the micro tree
-                result = f_inv[ancestor.elem()]
-                return result
-
-    def _build_jump_nodes(self):
-        """ Build a list of jump nodes for the tree.
-        Designate the macro leaves (the leaves of the macro tree) as jump nodes.
-        Sort the list in linear time.
-        """
-        self._jump_nodes = []
-        Q = Queue()
-        Q.enqueue(self._tree.root())
-
-        while not Q.is_empty():
-            p = Q.dequeue()
-
-            if self._tree.height(p) > self._block_size:
-                for ch in self._tree.children(p):
-                    if self._tree.height(ch) <= self._block_size:
-                        if p not in self._jump_nodes:
-                            self._jump_nodes.append(p)
-                    else:
-                        Q.enqueue(ch)
-
-        # Bucket sort should be used for sorting!
-        self._jump_nodes.sort(key=lambda p: self._tree.depth(p), reverse=True)
-
-    def _micro_macro_decomposition(self):
-        """ Build a list of the micro roots of the tree. Store a mapping that associates
-        every micro node with the root of its micro tree.
+                answers = self._catalogue.answers(self._micro_shape[t])
+                i = self._local[v] * self._catalogue.stride() + k
+                return self._micro_nodes[self._micro_start[t] + answers[i]]  # query the micro tree
+
+    def query_many(self, nodes, ks):
+        """ Batch version of the level ancestor query working on node indices.
+        Queries whose answer lies inside a micro tree are answered with table lookups.
+        All remaining queries are gathered, translated to queries on macro nodes and
+        answered by a single batch query on the macro structure.
         """
-        # Store the roots of all micro trees.
-        self._micro_roots = []
-
-        # A mapping that associates every micro node with the root of its micro tree.
-        self._root = {}
-
-        # Index array storing for every micro node a pointer to the root of its micro tree.
-        self._root = [None] * self._size
-        for p in depth_first_traversal(self._tree):
-            if self._tree.height(p) <= self._block_size:            # micro node
-                parent = self._tree.parent(p)
-                if self._tree.height(parent) > self._block_size:    # root of a micro tree
-                    self._micro_roots.append(p)
-                    self._root[p.index()] = p
+        height, depth, parent, micro = self._height, self._depth, self._parent, self._micro
+        micro_nodes, micro_start, micro_shape = self._micro_nodes, self._micro_start, self._micro_shape
+        local, stride, answers = self._local, self._catalogue.stride(), self._catalogue.answers
+        block_size = self._block_size
+
+        result = [-1] * len(nodes)
+        macro_idx, macro_nodes, macro_ks = [], [], []
+        for i, (v, k) in enumerate(zip(nodes, ks)):
+            if height[v] > block_size:                              # macro node
+                macro_idx.append(i)
+                macro_nodes.append(v)
+                macro_ks.append(k)
+                continue
+            if k > depth[v]:
+                continue
+            t = micro[v]
+            start = micro_start[t]
+            root = micro_nodes[start]
+            if k > depth[v] - depth[root]:                          # ancestor is a macro node
+                macro_idx.append(i)
+                macro_nodes.append(parent[root])
+                macro_ks.append(k - (depth[v] - depth[root]) - 1)
+            else:                                                   # ancestor is a micro node
+                result[i] = micro_nodes[start + answers(micro_shape[t])[local[v] * stride + k]]
+
+        # Scatter the answers of the macro structure back.
+        for i, w in zip(macro_idx, super().query_many(macro_nodes, macro_ks)):
+            result[i] = w
+        return result
+
+    def _grow(self, size):
+        """ Extend the index arrays of the micro trees to accommodate *size* nodes. """
+        extra = size - len(self._micro)
+        if extra > 0:
+            self._micro.extend(array("l", [-1]) * extra)
+            self._local.extend(array("l", [0]) * extra)
+        if len(self._marked) < size:
+            self._marked.extend(bytes(size - len(self._marked)))
+        super()._grow(size)
+
+    def _affected_nodes(self, r, region, chain):
+        """ The micro trees containing the affected nodes must be rebuilt. Find the highest
+        affected node that was a micro node before the update and extend the region to the
+        subtree of its micro root.
+        """
+        x = r
+        for u in chain:
+            if self._micro[u] != -1:
+                x = u
+        if self._micro[x] != -1:
+            m = self._micro_nodes[self._micro_start[self._micro[x]]]
+            if m != r:
+                region = self._flatten(self._positions[m])
+            return region + [u for u in chain if self._depth[u] < self._depth[m]]
+        return region + chain
+
+    def _discard(self, nodes):
+        """ Discard the paths and the micro trees containing the given nodes. """
+        bottoms = super()._discard(nodes)
+        for v in nodes:
+            if self._micro[v] != -1:
+                self._micro[v] = -1
+                self._garbage += 1
+        return bottoms
+
+    def _build_region(self, nodes, bottoms=()):
+        """ Build the ladders and the sparse table rows for the macro nodes of the region.
+        Decompose the region into macro nodes and micro trees and encode the new micro trees.
+        """
+        super()._build_region(nodes, bottoms)
+        first = len(self._micro_roots)
+        self._micro_macro_decomposition(nodes)
+        self._build_micro_tree_tables(first)
+
+    def _bottom_height(self):
+        """ The paths of the macro tree end at the macro nodes with height B+1. """
+        return self._block_size + 1
+
+    def _build_parallel(self, order, tasks=()):
+        """ Build the ladders, the sparse table and the micro trees using a pool of worker
+        processes. The micro trees are encoded by the workers together with the ladders.
+        The shape codes are sent back and looked up in the catalogue.
+        """
+        self._micro_macro_decomposition(order)
+        self._local = parallel.shared_array(self._size)
+
+        chunks = parallel.chunks(len(self._micro_roots), self._workers)
+        encode_tasks = [("_encode_range", chunk) for chunk in chunks]
+        results = super()._build_parallel(order, encode_tasks + list(tasks))
+        self._local = parallel.view(self._local, self._size)
+
+        for codes, starts, nodes in results[:len(encode_tasks)]:
+            base = len(self._micro_nodes)
+            self._micro_start.extend(start + base for start in starts)
+            self._micro_shape.extend(self._catalogue.shape_id(code) for code in codes)
+            self._micro_nodes.extend(nodes)
+        return results[len(encode_tasks):]
+
+    def _unshare(self):
+        """ Copy the views of the shared arrays into regular arrays, including the local indices. """
+        super()._unshare()
+        self._local = array("l", self._local)
+
+    def _encode_range(self, first, last):
+        """ Encode the micro trees with numbers in the range [first, last). Executed by a worker.
+        @return codes (List[int]): The shape codes of the micro trees.
+        @return starts (array): The start of every micro tree in the returned buffer.
+        @return nodes (array): The nodes of the micro trees in preorder.
+        """
+        self._micro_nodes = array("l")
+        codes, starts = [], array("l")
+        for t in range(first, last):
+            starts.append(len(self._micro_nodes))
+            codes.append(self._encode(self._micro_roots[t]))
+        return codes, starts, self._micro_nodes
+
+    def _build_jump_nodes(self, nodes, bottoms=()):
+        """ Build a list of jump nodes for the region.
+        Designate the macro leaves (the macro nodes with a micro child) that are not assigned
+        to a path as jump nodes. Sort the list in linear time. The bitmap of the marked nodes
+        is reset afterwards, so the work is proportional to the size of the region.
+        """
+        height, jump, parent, block_size = self._height, self._jump, self._parent, self._block_size
+
+        # Bitmap marking the nodes that are already designated as jump nodes.
+        marked = self._marked
+        jump_nodes = []
+        for v in nodes:
+            u = parent[v]
+            if height[v] <= block_size and u != -1 and height[u] > block_size and jump[u] == -1:
+                if not marked[u]:
+                    marked[u] = 1
+                    jump_nodes.append(u)
+        for v in bottoms:
+            if not marked[v] and height[v] > block_size:
+                marked[v] = 1
+                jump_nodes.append(v)
+        for v in jump_nodes:
+            marked[v] = 0
+        return self._sort_jump_nodes(jump_nodes)
+
+    def _micro_macro_decomposition(self, nodes):
+        """ Append the micro roots of the region to the list of micro roots. Store a mapping
+        that associates every micro node of the region with its micro tree.
+        @param nodes (List[int]): The indices of the nodes of the region. Every node is
+                                  listed before its children.
+        """
+        for v in nodes:
+            if self._height[v] <= self._block_size:                 # micro node
+                parent = self._parent[v]
+                if parent == -1 or self._height[parent] > self._block_size:
+                    # root of a micro tree
+                    self._micro[v] = len(self._micro_roots)
+                    self._micro_roots.append(self._positions[v])
                 else:
-                    self._root[p.index()] = self._root[parent.index()]
+                    self._micro[v] = self._micro[parent]
 
-    def _build_micro_tree_tables(self):
-        """ Encode every micro tree. Build a simple table for the micro trees with
-        different shapes (different codes).
+    def _build_micro_tree_tables(self, first):
+        """ Encode every micro tree starting from micro tree *first*. Look up the simple table
+        for the shape of every micro tree in the catalogue. Tables are built only for shapes
+        not seen before.
         """
-        # A mapping that associates micro tree encoding with its corresponding table.
-        self._micro_tables = {}
-
-        # A mapping that stores the encoding of each micro tree.
-        self._codes = {}
-
-        # For every micro tree compute a simle table to answer LA queries.
-        for p in self._micro_roots:
-            code, f, f_inv = self._encode(p)            # encode the micro tree
-            self._codes[p.index()] = code, f, f_inv
-            if code not in self._micro_tables:          # build a simple table if needed
-                repr_tree = self._decode(code)
-                self._micro_tables[code] = LA_table(repr_tree)
+        for t in range(first, len(self._micro_roots)):
+            self._micro_start.append(len(self._micro_nodes))
+            code = self._encode(self._micro_roots[t])   # encode the micro tree
+            self._micro_shape.append(self._catalogue.shape_id(code))
 
     def _encode(self, p):
-        """ Given a position encode the subtree rooted at that node.
+        """ Given a position encode the subtree rooted at that node. Append the nodes of
+        the subtree in preorder to the buffer of micro nodes and store their preorder numbers.
+        Between two consecutive nodes u, v in preorder the traversal goes up from u to the
+        parent of v and then down to v, i.e. depth(u) - depth(v) + 1 up-traversals followed
+        by a single down-traversal.
         @param p (Position): Position representing the micro root of the micro tree.
         @return code (int): A 2b-bit integer giving the id of the subtree,
                             where b is the size of the subtree.
-        @return f (Dict): A mapping that associates every node of the micro tree with a node
-                          of the representative tree.
-        @return f_inv (Dict): An inverse mapping.
-        """
-        binary_code = [1]
-        f = {}
-        f_inv = {}
-        idx = 0
-
-        def dfs(q):
-            nonlocal idx
-            f[q.index()] = idx
-            f_inv[idx] = q
-            idx += 1
-
-            for ch in self._tree.children(q):
-                binary_code.append(0)
-                dfs(ch)
-                binary_code.append(1)
-        dfs(p)
-        code = "".join(str(bit) for bit in binary_code)
-        return int(code, 2), f, f_inv
-
-    def _decode(self, code):
-        """ Given a binary code build a tree corresponding to that code.
-        @param code (int):  A 2b-bit number encoding a tree of size b.
-        @return tree (Tree): A Tree object corresponding to the binary encoding.
-        """
-        binary_code = [int(bit) for bit in "{0:b}".format(code)]
-        binary_code = binary_code[1:]
-
-        # Assert the binary code is a valid encoding of a tree.
-        zeros = len([x for x in binary_code if x == 0])
-        ones = len([x for x in binary_code if x == 1])
-        assert(zeros == ones)
-
-        tree = Tree()
-        elem = 0
-        cursor = tree.add_root(elem)
-        for bit in binary_code:
-            if bit == 0:
-                elem += 1
-                cursor = tree.add_child(cursor, elem)
-            elif bit == 1:
-                cursor = tree.parent(cursor)
-
-        return tree
+        """
+        depth, local = self._depth, self._local
+        order = preorder_indices(self._tree, p)
+        self._micro_nodes.extend(order)
+
+        code = 1
+        prev = order[0]
+        local[prev] = 0
+        for i in range(1, len(order)):
+            v = order[i]
+            local[v] = i
+            up = depth[prev] - depth[v] + 1
+            code = (code << up | ((1 << up) - 1)) << 1
+            prev = v
+        up = depth[prev] - depth[order[0]]
+        return code << up | ((1 << up) - 1)
+
+class LA_forest(LA_sparse):
+    """ Concrete class implementing sparse table indexing strategy over a forest.
+    The nodes of all trees are numbered consecutively, tree by tree, and a single set of
+    flat arrays is built for the entire forest. Every root has no parent, so no path or
+    ladder crosses from one tree to another, and queries stop at the root of every tree.
+    Querying is done in O(1) time.
+
+    The forest is given either as a list of trees, or as a parent array with multiple
+    roots using LA_forest.from_parent_array(). Queries accept positions of the nodes of
+    the trees, or node numbers. Positions are converted to node numbers by shifting their
+    indices by the number of nodes in the preceding trees. Searches by the elements of
+    the nodes are available only for forests of trees.
+
+    The index is static. New nodes of a tree would need numbers inside the range of the
+    following tree, so update_subtree() cannot be used, and the index must be built again
+    after the trees are modified.
+    """
+    def __init__(self, trees, workers=1):
+        """ Initialize an instance of the LA_forest class.
+        @param trees (List[Tree]): A list of non-empty tree objects.
+        @param workers (int): The number of processes used to build the structure.
+        """
+        parents, positions, bases = forest.flatten_trees(trees)
+        self._init_forest(parents, positions, bases, workers)
+
+    @classmethod
+    def from_parent_array(cls, parents, workers=1):
+        """ Build an index for the forest described by a parent array.
+        Raise ValueError if the parent array does not describe a forest.
+        @param parents (List[int]): parents[v] is the parent of node v, or -1 if v is a root.
+        @param workers (int): The number of processes used to build the structure.
+        @return la_index (LA_forest): Index answering queries on node numbers.
+        """
+        la_index = cls.__new__(cls)
+        la_index._init_forest(array("l", parents), [None] * len(parents), {}, workers)
+        return la_index
+
+    def _init_forest(self, parents, positions, bases, workers):
+        """ Store the forest and build the structure. """
+        self._tree = None
+        self._parents = parents
+        self._bases = bases
+        self._size = len(parents)
+        self._workers = workers
+        self._preprocess()
+        self._positions = positions
+
+    def _id(self, p):
+        """ Return the number of the node in the forest. """
+        if isinstance(p, int):
+            return p
+        return self._bases[id(p._container)] + p.index()
+
+    def _flatten_all(self):
+        """ Copy the parent array and compute the depths and the heights of all nodes. """
+        self._grow(self._size)
+        order = forest.preorder(self._parents)
+        parent, depth, height = self._parent, self._depth, self._height
+        parent[:] = self._parents
+        for v in order:
+            u = parent[v]
+            depth[v] = depth[u] + 1 if u != -1 else 0
+
+        # Children are listed after their parents, compute the heights in reverse order.
+        for v in reversed(order):
+            u = parent[v]
+            if u != -1 and height[u] <= height[v]:
+                height[u] = height[v] + 1
+        return order
+
+
+class LA_euler(LA_base):
+    """ Concrete class implementing depth-bucket binary search strategy.
+    The nodes are numbered in preorder and grouped by depth. Within every depth the
+    nodes are sorted by their preorder numbers. The level k ancestor of node v is the
+    node at depth d = depth(v) - k with the largest preorder number not exceeding the
+    preorder number of v. This is because the subtree of the ancestor is a contiguous
+    range of preorder numbers containing v, and no other node at depth d lies between
+    the ancestor and v.
+
+    The indices assigned by Tree.reindex are the preorder numbers of the nodes, so the
+    structure consists of exactly two integer arrays and the offsets of the depths:
+        depth[v] = the depth of node v
+        levels = the nodes sorted by depth, and by index within every depth
+    The nodes of depth d are levels[offsets[d]:offsets[d+1]]. The structure uses O(n)
+    memory and is built in O(n) time. Querying is done with a single binary search over
+    one bucket in O(logn) time. Positions of the answers are created on demand.
+    Raise ValueError if the nodes of the tree are not indexed in preorder.
+    """
+    def _preprocess(self):
+        """ Traverse the tree in preorder to store the depths of the nodes, and bucket sort
+        the nodes by depth.
+        """
+        n = self._size
+        tree = self._tree
+        if isinstance(tree, CompactTree):
+            self._positions = PositionTable(tree)
+        else:
+            self._positions = NodeTable(tree, n)
+        self._depth = array("l", [0]) * n
+
+        counts = [0]
+        for i, p in enumerate(preorder(tree)):
+            v = p.index()
+            if v != i:
+                raise ValueError("LA_euler requires the nodes to be indexed in preorder")
+            self._positions[v] = p
+            d = tree.depth(p)
+            self._depth[v] = d
+            if d == len(counts):
+                counts.append(0)
+            counts[d] += 1
+
+        # Bucket sort the nodes by depth. The nodes are placed in preorder within every bucket.
+        self._offsets = array("l", [0]) * (len(counts) + 1)
+        for d in range(len(counts)):
+            self._offsets[d + 1] = self._offsets[d] + counts[d]
+        self._levels = array("l", [0]) * n
+        cursor = array("l", self._offsets)
+        for v in range(n):
+            d = self._depth[v]
+            self._levels[cursor[d]] = v
+            cursor[d] += 1
+
+    def _query(self, p, k):
+        """ Query the structure using the index of the node and convert the result
+        back to the same form as the query argument.
+        """
+        w = self._query_index(p if isinstance(p, int) else p.index(), k)
+        if w == -1:
+            return None
+        return w if isinstance(p, int) else self._positions[w]
+
+    def _query_index(self, v, k):
+        """ Binary search the bucket of depth(v) - k for the last node with index not
+        exceeding v.
+        @param v (int): Index of a node in the tree.
+        @param k (int): An integer giving the level of the ancestor.
+        @return w (int): Index of the level k ancestor of v, or -1 if k exceeds the depth of v.
+        """
+        d = self._depth[v] - k
+        if d < 0:
+            return -1
+        i = bisect_right(self._levels, v, self._offsets[d], self._offsets[d + 1])
+        return self._levels[i - 1]
+
+    def query_many(self, nodes, ks):
+        """ Batch version of the level ancestor query working on node indices.
+        @param nodes (List[int]): A list of node indices.
+        @param ks (List[int]): A list of levels. ks[i] is the level for nodes[i].
+        @return ancestors (List[int]): ancestors[i] is the index of the level ks[i] ancestor
+                                       of nodes[i], or -1 if ks[i] exceeds its depth.
+        """
+        query = self._query_index
+        return [query(v, k) for v, k in zip(nodes, ks)]
+
+class LA_online(LA_base):
+    """ Concrete class implementing an online level ancestor index.
+    The tree can grow by adding leaves after the index is built. Every node v stores
+    a pointer to its parent and a *jump pointer* to one of its ancestors. The jump
+    pointers follow the skew-binary decomposition of the depth of the node:
+    if the jumps from the parent p and from jump(p) have the same length, then
+    jump(v) = jump(jump(p)), otherwise jump(v) = p.
+    Adding a leaf computes its jump pointer in O(1) time from the pointers of its parent.
+
+    To answer the query LA(v, k) we climb towards the target depth d = depth(v) - k.
+    At every node we follow the jump pointer if it does not overshoot d, otherwise
+    we follow the parent pointer. With skew-binary jumps this takes O(logn) steps.
+    """
+    def _preprocess(self):
+        """ Traverse the tree and link every node after its parent. """
+        self._positions = [None] * self._size
+        self._parent = array("l", [-1]) * self._size
+        self._jump = array("l", [0]) * self._size
+        self._depth = array("l", [0]) * self._size
+
+        stack = [(self._tree.root(), -1)]
+        while stack:
+            p, parent = stack.pop()
+            self._positions[p.index()] = p
+            self._link(p.index(), parent)
+            stack.extend((ch, p.index()) for ch in self._tree.children(p))
+
+    def add_leaf(self, p, elem):
+        """ Create a new child with the given element for the node at Position p and
+        add it to the index in O(1) time. The tree raises the heights of the ancestors
+        of the new leaf, which takes O(depth) time only if all of them change.
+        @param p (Position): Position representing a node in the tree.
+        @param elem: Element to be stored at the new leaf.
+        @return leaf (Position): Position representing the new leaf.
+        """
+        leaf = self._tree.add_child(p, elem)
+        if leaf.index() != self._size:
+            raise ValueError("The tree was modified without updating the index")
+
+        self._positions.append(leaf)
+        self._parent.append(-1)
+        self._jump.append(0)
+        self._depth.append(0)
+        self._link(leaf.index(), p.index())
+        self._size += 1
+        return leaf
+
+    def _query(self, p, k):
+        """ Query the structure using the index of the node and convert the result
+        back to the same form as the query argument.
+        """
+        w = self._query_index(p if isinstance(p, int) else p.index(), k)
+        if w == -1:
+            return None
+        return w if isinstance(p, int) else self._positions[w]
+
+    def _query_index(self, v, k):
+        """ Climb to the target depth using jump pointers whenever they do not overshoot.
+        @param v (int): Index of a node in the tree.
+        @param k (int): An integer giving the level of the ancestor.
+        @return w (int): Index of the level k ancestor of v, or -1 if k exceeds the depth of v.
+        """
+        depth, jump, parent = self._depth, self._jump, self._parent
+        d = depth[v] - k
+        if d < 0:
+            return -1
+        while depth[v] > d:
+            if depth[jump[v]] >= d:
+                v = jump[v]
+            else:
+                v = parent[v]
+        return v
+
+    def query_many(self, nodes, ks):
+        """ Batch version of the level ancestor query working on node indices.
+        @param nodes (List[int]): A list of node indices.
+        @param ks (List[int]): A list of levels. ks[i] is the level for nodes[i].
+        @return ancestors (List[int]): ancestors[i] is the index of the level ks[i] ancestor
+                                       of nodes[i], or -1 if ks[i] exceeds its depth.
+        """
+        query = self._query_index
+        return [query(v, k) for v, k in zip(nodes, ks)]
+
+    def _link(self, v, parent):
+        """ Set the parent, the depth and the jump pointer of node v. The parent must
+        already be linked.
+        @param v (int): Index of a node in the tree.
+        @param parent (int): Index of the parent of the node, or -1 for the root.
+        """
+        if parent == -1:
+            self._jump[v] = v
+            return
+
+        self._parent[v] = parent
+        self._depth[v] = self._depth[parent] + 1
+        j = self._jump[parent]
+        if self._depth[parent] - self._depth[j] == self._depth[j] - self._depth[self._jump[j]]:
+            self._jump[v] = self._jump[j]
+        else:
+            self._jump[v] = parent
 
 #
\ No newline at end of file
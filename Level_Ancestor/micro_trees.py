@@ -0,0 +1,189 @@
+""" A catalogue of micro-tree shapes shared by all level ancestor indexes in the process.
+Every shape of a micro tree is identified by its *shape code*. The code is built by a
+depth-first traversal of the micro tree: starting from a leading 1 bit, every
+down-traversal (from parent to child) appends a 0 bit and every up-traversal (from
+child to parent) appends a 1 bit.
+
+For every shape the catalogue stores a packed table with the answers to all level
+ancestor queries inside the micro tree. The nodes of the micro tree are numbered in
+preorder, and the answer to the query (i, k) is stored at position i * (B + 1) + k,
+where B is the block size. Since every micro node has height at most B, all queries
+inside a micro tree have k <= B.
+
+The set of shapes of trees of size at most B is fixed, so the catalogue for a given
+block size can be generated eagerly and saved to disk. Shapes of larger micro trees
+are added to the catalogue on demand.
+
+The catalogue is saved as flat arrays of 64-bit integers in native byte order, so
+loading a file only reads integers and never executes code from it:
+    header: The magic bytes, followed by the version, the block size B and the
+            number of shapes s.
+    code_sizes[s], table_sizes[s]: The number of bytes of every shape code and the
+            number of entries of every table of answers.
+    codes: The shape codes as unsigned little-endian integers, one after another.
+    tables: The tables of answers, one after another.
+"""
+
+from array import array
+
+
+MAGIC = b"MICROCAT"
+VERSION = 1
+
+
+# Process-wide catalogues keyed by block size.
+_catalogues = {}
+
+
+class MicroTreeCatalogue:
+    #------------- catalogue initializer --------------#
+    def __init__(self, block_size):
+        """ Initialize an empty catalogue. Use the classmethod get() to obtain the
+        process-wide catalogue for the given block size.
+        @param block_size (int): The maximal height of a micro tree.
+        """
+        self._block_size = block_size
+        self._stride = block_size + 1
+        self._ids = {}          # shape code -> shape id
+        self._answers = []      # shape id -> packed table of answers
+
+    @classmethod
+    def get(cls, block_size):
+        """ Return the process-wide catalogue for the given block size. """
+        if block_size not in _catalogues:
+            _catalogues[block_size] = cls(block_size)
+        return _catalogues[block_size]
+
+    @classmethod
+    def load(cls, path):
+        """ Load a catalogue from disk and register it as the process-wide catalogue
+        for its block size. Shapes already present in the process are kept.
+        Raise ValueError if the file is not a catalogue file of a supported version.
+        @param path (str): Path to a file written by save().
+        @return catalogue (MicroTreeCatalogue): The process-wide catalogue.
+        """
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("not a micro-tree catalogue file")
+            try:
+                version, block_size, num_shapes = cls._read_array(f, 3)
+                if version != VERSION:
+                    raise ValueError("unsupported catalogue file version {}".format(version))
+                if block_size < 1 or num_shapes < 0:
+                    raise ValueError("invalid catalogue file header")
+                code_sizes = cls._read_array(f, num_shapes)
+                table_sizes = cls._read_array(f, num_shapes)
+                codes = f.read(sum(code_sizes))
+                tables = cls._read_array(f, sum(table_sizes))
+            except (EOFError, OverflowError, MemoryError):
+                raise ValueError("truncated catalogue file")
+            if len(codes) != sum(code_sizes) or f.read(1):
+                raise ValueError("truncated catalogue file")
+
+        catalogue = cls.get(block_size)
+        stride = catalogue._stride
+        start, offset = 0, 0
+        for code_size, table_size in zip(code_sizes, table_sizes):
+            code = int.from_bytes(codes[start:start + code_size], "little")
+            if table_size % stride != 0:
+                raise ValueError("invalid table of answers")
+            if code not in catalogue._ids:
+                catalogue._ids[code] = len(catalogue._answers)
+                catalogue._answers.append(array("l", tables[offset:offset + table_size]))
+            start += code_size
+            offset += table_size
+        return catalogue
+
+    #---------------- public accessors ----------------#
+    def stride(self):
+        """ Return the length of the row of answers of a single node. """
+        return self._stride
+
+    def answers(self, shape_id):
+        """ Return the packed table of answers for the shape with the given id. """
+        return self._answers[shape_id]
+
+    def save(self, path):
+        """ Write the catalogue to disk, see the module docstring for the file format.
+        @param path (str): Path to the output file.
+        """
+        codes = [code.to_bytes((code.bit_length() + 7) // 8, "little") for code in self._ids]
+        tables = [self._answers[sid] for sid in self._ids.values()]
+        with open(path, "wb") as f:
+            f.write(MAGIC)
+            array("q", [VERSION, self._block_size, len(codes)]).tofile(f)
+            array("q", map(len, codes)).tofile(f)
+            array("q", map(len, tables)).tofile(f)
+            f.write(b"".join(codes))
+            for answers in tables:
+                array("q", answers).tofile(f)
+
+    def __len__(self):
+        """ Return the number of shapes in the catalogue. """
+        return len(self._answers)
+
+    #---------------- public mutators -----------------#
+    def shape_id(self, code):
+        """ Return the id of the shape with the given code. Build the table of answers
+        if the shape is not in the catalogue.
+        @param code (int): Shape code of a micro tree.
+        @return shape_id (int): Index of the table of answers for that shape.
+        """
+        sid = self._ids.get(code)
+        if sid is None:
+            sid = len(self._answers)
+            self._answers.append(self._build_answers(code))
+            self._ids[code] = sid
+        return sid
+
+    def generate_all(self):
+        """ Eagerly build the tables for all shapes of trees with at most B nodes.
+        The tree of size m is encoded by 2(m-1) bits. A sequence of bits is a valid
+        encoding if and only if it has as many 0s as 1s and no prefix has more 1s than 0s.
+        """
+        codes = [(1, 0, 0)]     # partial code, number of 0s, number of 1s
+        while codes:
+            code, zeros, ones = codes.pop()
+            if zeros == ones:
+                self.shape_id(code)
+            if zeros + 1 < self._block_size:
+                codes.append((code << 1, zeros + 1, ones))
+            if ones < zeros:
+                codes.append((code << 1 | 1, zeros, ones + 1))
+
+    #---- private methods - should not be invoked by the user ----#
+    @staticmethod
+    def _read_array(f, n):
+        """ Read n 64-bit integers from the file. Raise EOFError if the file is too short. """
+        arr = array("q")
+        arr.fromfile(f, n)
+        return arr
+
+    def _build_answers(self, code):
+        """ Decode the shape into a parent array of the nodes in preorder and build the
+        packed table of answers.
+        @param code (int): Shape code of a micro tree.
+        @return answers (array): answers[i * stride + k] is the preorder number of the
+                                 level k ancestor of node i, or -1 if it does not exist.
+        """
+        # Decode the bits after the leading 1 from the most significant one.
+        parent = [-1]
+        cursor = 0
+        for shift in range(code.bit_length() - 2, -1, -1):
+            if (code >> shift) & 1:             # up-traversal
+                cursor = parent[cursor]
+            else:                               # down-traversal
+                parent.append(cursor)
+                cursor = len(parent) - 1
+
+        stride = self._stride
+        answers = array("l", [-1]) * (len(parent) * stride)
+        for i in range(len(parent)):
+            u, k = i, 0
+            while u != -1 and k < stride:
+                answers[i * stride + k] = u
+                u = parent[u]
+                k += 1
+        return answers
+
+#
\ No newline at end of file
@@ -0,0 +1,243 @@
+from array import array
+
+
+from Least_Common_Ancestor import lca
+from utils import forest
+from . import la
+
+
+class TreePathIndex(la.LA_sparse):
+    """ Concrete class implementing distance and path queries over a static tree.
+    The index extends the sparse table level ancestor structure, which flattens the tree
+    into integer arrays indexed by the node indices (the parent, the depth and the height
+    of every node) and answers level ancestor queries in O(1) time using ladders and a
+    table of jump pointers. On top of these arrays we build an Euler tour of the tree
+    together with the depths of the visited nodes, stored as flat integer arrays. The
+    depths of consecutive visits differ by +/- 1, so the block RMQ structure used by the
+    LCA index answers LCA queries in O(1) time using O(n) space. The first and the last
+    visit of every node answer ancestor queries in O(1).
+
+    If edge weights are given, the weighted depths (the total weight of the path from
+    the root) are computed during the Euler tour and stored as a float64 array. The
+    weighted distance between two nodes is computed in O(1) time using the LCA. The
+    deepest ancestor within a weight budget is found in O(logn) time by a binary search
+    over the level ancestors, since weighted depths do not increase towards the root.
+
+    Queries accept either Positions or node indices. Nodes are returned in the same
+    form as the input. The batch variants work on node indices only and return -1
+    where the single-query variant returns None.
+    """
+    def __init__(self, tree, weight=None):
+        """ Initialize a TreePathIndex for the tree object.
+        @param tree (Tree): A tree object.
+        @param weight (Callable): Optional function that, given the Position of a non-root
+                                  node, returns the non-negative weight of the edge between
+                                  the node and its parent.
+        """
+        self._weight = weight
+        super().__init__(tree)
+
+    def _preprocess(self):
+        """ Build the level ancestor structure and the Euler tour of the tree. """
+        super()._preprocess()
+        self._build_euler_tour()
+
+    def update_subtree(self, p, threshold=None):
+        """ The Euler tour spans the whole tree, so the index is rebuilt from scratch. """
+        self._rebuild()
+
+    #---------------- public accessors ----------------#
+    def depth(self, p):
+        """ Return the depth of the node. """
+        return self._depth[self._id(p)]
+
+    def lca(self, p, q):
+        """ Return the least common ancestor of the two nodes. """
+        w = self._lca(self._id(p), self._id(q))
+        return self._node(w, p)
+
+    def is_ancestor(self, p, q):
+        """ Return True if the node p is an ancestor of the node q. Every node is an
+        ancestor of itself.
+        """
+        u, v = self._id(p), self._id(q)
+        return self._first[u] <= self._first[v] and self._last[v] <= self._last[u]
+
+    def level_ancestor(self, p, k):
+        """ Return the level k ancestor of the node, or None if k exceeds its depth. """
+        w = self._level_ancestor(self._id(p), k)
+        return self._node(w, p)
+
+    def distance(self, p, q):
+        """ Return the number of edges on the path between the two nodes. """
+        u, v = self._id(p), self._id(q)
+        return self._depth[u] + self._depth[v] - 2 * self._depth[self._lca(u, v)]
+
+    def path_length(self, p, q):
+        """ Return the number of nodes on the path between the two nodes. """
+        return self.distance(p, q) + 1
+
+    def kth_on_path(self, p, q, k):
+        """ Return the k-th node on the path from p to q. The 0-th node is p and the
+        last node is q. Return None if k exceeds the length of the path.
+        @param p (Position): Position representing a node in the tree.
+        @param q (Position): Position representing a node in the tree.
+        @param k (int): Number of edges between p and the answer.
+        @return w (Position): Position of the k-th node on the path.
+        """
+        w = self._kth_on_path(self._id(p), self._id(q), k)
+        return self._node(w, p)
+
+    def weighted_depth(self, p):
+        """ Return the total weight of the path from the root to the node.
+        Raise ValueError if the index was built without edge weights.
+        """
+        self._check_weighted()
+        return self._wdepth[self._id(p)]
+
+    def weighted_distance(self, p, q):
+        """ Return the total weight of the path between the two nodes.
+        Raise ValueError if the index was built without edge weights.
+        """
+        self._check_weighted()
+        u, v = self._id(p), self._id(q)
+        return self._wdepth[u] + self._wdepth[v] - 2 * self._wdepth[self._lca(u, v)]
+
+    def weighted_ancestor(self, p, d):
+        """ Return the deepest ancestor of the node with weighted depth at most d.
+        Return None if d is negative. Raise ValueError if the index was built without
+        edge weights.
+        @param p (Position): Position representing a node in the tree.
+        @param d (float): Budget for the weighted depth of the ancestor.
+        @return w (Position): Position of the deepest ancestor within the budget.
+        """
+        self._check_weighted()
+        w = self._weighted_ancestor(self._id(p), d)
+        return self._node(w, p)
+
+    #---------------- batch queries -------------------#
+    def lca_many(self, us, vs):
+        """ Return a list with the least common ancestors of the pairs (us[i], vs[i]). """
+        lca = self._lca
+        return [lca(u, v) for u, v in zip(us, vs)]
+
+    def is_ancestor_many(self, us, vs):
+        """ Return a list of booleans telling whether us[i] is an ancestor of vs[i]. """
+        first, last = self._first, self._last
+        return [first[u] <= first[v] and last[v] <= last[u] for u, v in zip(us, vs)]
+
+    def distance_many(self, us, vs):
+        """ Return a list with the distances between the pairs (us[i], vs[i]). """
+        depth, lca = self._depth, self._lca
+        return [depth[u] + depth[v] - 2 * depth[lca(u, v)] for u, v in zip(us, vs)]
+
+    def path_length_many(self, us, vs):
+        """ Return a list with the number of nodes on the paths between (us[i], vs[i]). """
+        return [d + 1 for d in self.distance_many(us, vs)]
+
+    def kth_on_path_many(self, us, vs, ks):
+        """ Return a list with the ks[i]-th nodes on the paths from us[i] to vs[i]. """
+        kth = self._kth_on_path
+        return [kth(u, v, k) for u, v, k in zip(us, vs, ks)]
+
+    def weighted_distance_many(self, us, vs):
+        """ Return a list with the weighted distances between the pairs (us[i], vs[i]). """
+        self._check_weighted()
+        wdepth, lca = self._wdepth, self._lca
+        return [wdepth[u] + wdepth[v] - 2 * wdepth[lca(u, v)] for u, v in zip(us, vs)]
+
+    def weighted_ancestor_many(self, us, ds):
+        """ Return a list with the deepest ancestors of us[i] with weighted depth at most ds[i]. """
+        self._check_weighted()
+        ancestor = self._weighted_ancestor
+        return [ancestor(u, d) for u, d in zip(us, ds)]
+
+    #---- private methods - should not be invoked by the user ----#
+    def _check_weighted(self):
+        """ Raise ValueError if the index was built without edge weights. """
+        if self._wdepth is None:
+            raise ValueError("The index was built without edge weights")
+
+    def _lca(self, u, v):
+        """ Find the least common ancestor using the RMQ over the Euler tour. """
+        idx = self._rmq(self._first[u], self._first[v])
+        return self._euler[idx]
+
+    def _level_ancestor(self, v, k):
+        """ Find the level k ancestor of node v using the ladders and the sparse table. """
+        if k < 0:
+            return -1
+        return self._query_index(v, k)
+
+    def _kth_on_path(self, u, v, k):
+        """ Split the path at the least common ancestor w and take the level ancestor
+        of either u or v.
+        """
+        w = self._lca(u, v)
+        up = self._depth[u] - self._depth[w]
+        down = self._depth[v] - self._depth[w]
+        if k < 0 or k > up + down:
+            return -1
+        if k <= up:
+            return self._level_ancestor(u, k)
+        return self._level_ancestor(v, up + down - k)
+
+    def _weighted_ancestor(self, v, d):
+        """ Binary search for the smallest level k such that the level k ancestor of v has
+        weighted depth at most d. Every probe is an O(1) level ancestor query.
+        """
+        if self._wdepth[v] <= d:
+            return v
+        if d < 0:
+            return -1
+
+        lo, hi = 1, self._depth[v]      # the root has weighted depth 0 <= d
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._wdepth[self._level_ancestor(v, mid)] <= d:
+                hi = mid
+            else:
+                lo = mid + 1
+        return self._level_ancestor(v, lo)
+
+    def _build_euler_tour(self):
+        """ Build the Euler tour of the tree using an explicit stack over the compact lists
+        of children. Store the first and the last visit of every node. Build the +/- 1 RMQ
+        over the depths of the tour. If edge weights are given, compute the weighted depths
+        when the tour descends into a node.
+        """
+        n = self._size
+        start, kids = forest.children(self._parent)
+        self._euler = array("l")
+        self._first = array("l", [0]) * n
+        self._last = array("l", [0]) * n
+        self._wdepth = array("d", [0.0]) * n if self._weight is not None else None
+        cursor = array("l", start)
+
+        root = self._tree.root().index()
+        stack = [root]
+        self._euler.append(root)
+        while stack:
+            u = stack[-1]
+            i = cursor[u]
+            if i < start[u + 1]:                        # descend into the next child
+                cursor[u] = i + 1
+                v = kids[i]
+                if self._weight is not None:
+                    w = self._weight(self._positions[v])
+                    if w < 0:
+                        raise ValueError("Edge weights must be non-negative")
+                    self._wdepth[v] = self._wdepth[u] + w
+                self._first[v] = len(self._euler)
+                self._euler.append(v)
+                stack.append(v)
+            else:                                       # return to the parent
+                stack.pop()
+                self._last[u] = len(self._euler) - 1
+                if stack:
+                    self._euler.append(stack[-1])
+
+        depth = self._depth
+        self._rmq = lca.LCA_Index._build_rmq(array("l", (depth[u] for u in self._euler)))
+
+#
\ No newline at end of file
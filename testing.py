@@ -1,16 +1,29 @@
+import os
+import tempfile
 import time
+import tracemalloc
 import random
 random.seed(0)
+from array import array
 from collections import deque
 
 import Least_Common_Ancestor.rmq as rmq
 import Least_Common_Ancestor.lca as lca
+import Least_Common_Ancestor.link_cut_tree as lct
+import Least_Common_Ancestor.heavy_light as hld
+import Least_Common_Ancestor.subtree_index as subtree_index
 import Level_Ancestor.la as la
+import Level_Ancestor.path_index as path_index
+import Level_Ancestor.micro_trees as micro_trees
 from utils.tree import Tree
+from utils.compact_tree import CompactTree
 from utils.binary_tree import BinaryTree
 from utils.linked_list import DoublyLinkedList
+from utils.tree_dag import TreeDAG
 from utils.queue import Queue
-from utils.traversal_algorithms import breadth_first_traversal
+from utils.stack import Stack
+from utils.traversal_algorithms import breadth_first_traversal, build_cartesian_tree
+import utils.traversal_algorithms as traversal
 
 
 def generate_random_array(size):
@@ -21,20 +34,21 @@ def generate_random_array(size):
     return arr
 
 
-def generate_random_tree(size):
-    T = Tree()
-    T.add_root(random.randint(0, MAX_VAL))
+def generate_random_tree(size, max_children=4):
+    parents = [-1]
+    elems = [random.randint(0, MAX_VAL)]
     frontier = deque()
-    frontier.append(T.root())
+    frontier.append(0)
 
-    while len(T) < size:
-        p = frontier.popleft()
-        num_children = random.randint(1, min(4, size - len(T)))
+    while len(parents) < size:
+        u = frontier.popleft()
+        num_children = random.randint(1, min(max_children, size - len(parents)))
         for _ in range(num_children):
-            T.add_child(p, random.randint(0, MAX_VAL))
-        frontier.extend(T.children(p))
+            frontier.append(len(parents))
+            parents.append(u)
+            elems.append(random.randint(0, MAX_VAL))
 
-    return T
+    return Tree.from_parent_array(parents, elems)
 
 
 class random_position_generator:
@@ -159,6 +173,201 @@ def check_lca_complexity(LCA):
 
 
 
+def check_link_cut_correctness():
+    sizes = [10, 100, 1000, 10000]
+    trials = 200
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        link_cut = lct.LinkCutTree.from_tree(T)
+
+        # Naive representation of the forest as a parent array.
+        parent = [-1] * size
+        value = [None] * size
+        for p in T.positions():
+            value[p.index()] = p.elem()
+            if not T.is_root(p):
+                parent[p.index()] = T.parent(p).index()
+
+        def root_path(u):
+            path = [u]
+            while parent[path[-1]] != -1:
+                path.append(parent[path[-1]])
+            return path
+
+        for trial in range(trials):
+            u = random.randint(0, size - 1)
+            v = random.randint(0, size - 1)
+
+            path_u, path_v = root_path(u), root_path(v)
+            if path_u[-1] != path_v[-1]:
+                _ancestor, _min_node = None, None
+            else:
+                common = set(path_u)
+                _ancestor = next(x for x in path_v if x in common)
+                path = path_u[:path_u.index(_ancestor) + 1] + path_v[:path_v.index(_ancestor)]
+                _min_node = min(path, key=lambda x: value[x])
+
+            if link_cut.find_root(u) != path_u[-1]:
+                raise Exception("LinkCutTree not correctly implemented")
+            if link_cut.lca(u, v) != _ancestor:
+                raise Exception("LinkCutTree not correctly implemented")
+            min_node = link_cut.path_min(u, v)
+            if (min_node is None) != (_min_node is None):
+                raise Exception("LinkCutTree not correctly implemented")
+            if min_node is not None and value[min_node] != value[_min_node]:
+                raise Exception("LinkCutTree not correctly implemented")
+
+            # Re-parent a random subtree.
+            if parent[u] != -1:
+                link_cut.cut(u)
+                parent[u] = -1
+            if root_path(v)[-1] != u:
+                link_cut.link(u, v)
+                parent[u] = v
+
+    print("LinkCutTree implemented correctly!")
+
+
+def check_link_cut_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+    trials = 10000
+
+    print("\nLinkCutTree")
+    print("{:10}   {:10}   {:10}".format("size", "build", "queries"))
+    for size in sizes:
+        T = generate_random_tree(size)
+
+        tic = time.time()
+        link_cut = lct.LinkCutTree.from_tree(T)
+        toc = time.time()
+        build = toc - tic
+
+        tic = time.time()
+        for trial in range(trials):
+            u = random.randint(0, size - 1)
+            v = random.randint(0, size - 1)
+            w = link_cut.lca(u, v)
+            if u != w and link_cut.find_root(u) != u:
+                link_cut.cut(u)
+                link_cut.link(u, w if w is not None else v)
+        toc = time.time()
+        print("{:<10}   {:<10.6}   {:<10.6}".format(size, build, toc-tic))
+
+
+
+def check_heavy_light_correctness():
+    sizes = [10, 100, 1000, 10000]
+    trials = 200
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        hld_index = hld.HeavyLightIndex(T)
+        R = random_position_generator(T)
+
+        for trial in range(trials):
+            u = R.generate_random_position()
+            v = R.generate_random_position()
+            m = hld_index.path_min(u, v)
+
+            path = [u, v]
+            p_u, p_v = u, v
+            while p_u != p_v:
+                if T.depth(p_u) < T.depth(p_v):
+                    p_v = T.parent(p_v)
+                else:
+                    p_u = T.parent(p_u)
+                path.extend([p_u, p_v])
+            _min = min(p.elem() for p in path)
+
+            if m.elem() != _min or m not in path:
+                raise Exception("HeavyLightIndex not correctly implemented")
+            if hld_index.path_min_many([u.index()], [v.index()]) != [m.index()]:
+                raise Exception("HeavyLightIndex not correctly implemented")
+
+    # A long chain must not hit the recursion limit.
+    size = 5000
+    elems = generate_random_array(size)
+    T = Tree.from_parent_array(list(range(-1, size - 1)), elems)
+    hld_index = hld.HeavyLightIndex(T)
+    positions = list(T.positions())
+    for trial in range(trials):
+        u, v = sorted(random.sample(range(size), 2))
+        m = hld_index.path_min(positions[u], positions[v])
+        if m.elem() != min(elems[u:v+1]):
+            raise Exception("HeavyLightIndex not correctly implemented")
+
+    print("HeavyLightIndex implemented correctly!")
+
+
+def check_heavy_light_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+    trials = 10000
+
+    print("\nHeavyLightIndex")
+    print("{:10}   {:10}   {:10}".format("size", "build", "queries"))
+    for size in sizes:
+        T = generate_random_tree(size)
+
+        tic = time.time()
+        hld_index = hld.HeavyLightIndex(T)
+        toc = time.time()
+        build = toc - tic
+
+        us = [random.randint(0, size - 1) for _ in range(trials)]
+        vs = [random.randint(0, size - 1) for _ in range(trials)]
+        tic = time.time()
+        hld_index.path_min_many(us, vs)
+        toc = time.time()
+        print("{:<10}   {:<10.6}   {:<10.6}".format(size, build, toc-tic))
+
+
+
+def check_subtree_index_correctness():
+    sizes = [10, 100, 1000, 10000]
+    trials = 200
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        index = subtree_index.SubtreeIndex(T)
+        R = random_position_generator(T)
+
+        for trial in range(trials):
+            u = R.generate_random_position()
+            v = R.generate_random_position()
+
+            subtree = []
+            frontier = [u]
+            while frontier:
+                p = frontier.pop()
+                subtree.append(p)
+                frontier.extend(T.children(p))
+            x = random.randint(0, MAX_VAL)
+
+            if (index.subtree_min(u).elem() != min(p.elem() for p in subtree) or
+                index.subtree_size(u) != len(subtree) or
+                index.is_ancestor(u, v) != (v in subtree) or
+                index.count_less(u, x) != len([p for p in subtree if p.elem() < x])):
+                raise Exception("SubtreeIndex not correctly implemented")
+
+    print("SubtreeIndex implemented correctly!")
+
+
+def check_subtree_index_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+
+    print("\nSubtreeIndex")
+    print("{:10}   {:10}".format("size", "time"))
+    for size in sizes:
+        T = generate_random_tree(size)
+
+        tic = time.time()
+        index = subtree_index.SubtreeIndex(T)
+        toc = time.time()
+        print("{:<10}   {:<10.6}".format(size, toc-tic))
+
+
+
 def check_la_correctness(LA):
     sizes = [10, 100, 1000, 10000]
     trials = 200
@@ -202,6 +411,1450 @@ def check_la_complexity(LA):
         toc = time.time()
         print("{:<10}   {:<10.6}".format(size, toc-tic))
 
+def check_path_index_correctness():
+    sizes = [10, 100, 1000, 10000]
+    trials = 200
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        index = path_index.TreePathIndex(T)
+        R = random_position_generator(T)
+
+        for trial in range(trials):
+            u = R.generate_random_position()
+            v = R.generate_random_position()
+
+            # Build the path from u to v by walking up from the deeper node.
+            left, right = [u], [v]
+            while left[-1] != right[-1]:
+                if T.depth(left[-1]) < T.depth(right[-1]):
+                    right.append(T.parent(right[-1]))
+                else:
+                    left.append(T.parent(left[-1]))
+            path = left + right[-2::-1]
+
+            k = random.randint(0, len(path))
+            _kth = path[k] if k < len(path) else None
+            if (index.lca(u, v) != left[-1] or
+                index.distance(u, v) != len(path) - 1 or
+                index.path_length(u, v) != len(path) or
+                index.kth_on_path(u, v, k) != _kth or
+                index.is_ancestor(u, v) != (left[-1] == u)):
+                raise Exception("TreePathIndex not correctly implemented")
+
+            batch = index.kth_on_path_many([u.index()], [v.index()], [k])[0]
+            if batch != (_kth.index() if _kth is not None else -1):
+                raise Exception("TreePathIndex not correctly implemented")
+
+    print("TreePathIndex implemented correctly!")
+
+
+def check_weighted_path_index_correctness():
+    sizes = [10, 100, 1000, 10000]
+    trials = 200
+
+    def weight(p):
+        return (p.elem() % 100) / 10
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        index = path_index.TreePathIndex(T, weight=weight)
+        R = random_position_generator(T)
+
+        def root_path(p):
+            path = [p]
+            while not T.is_root(path[-1]):
+                path.append(T.parent(path[-1]))
+            return path
+
+        def weighted_depth(p):
+            return sum(weight(q) for q in root_path(p)[:-1])
+
+        for trial in range(trials):
+            u = R.generate_random_position()
+            v = R.generate_random_position()
+            w = index.lca(u, v)
+            _dist = weighted_depth(u) + weighted_depth(v) - 2 * weighted_depth(w)
+
+            budget = random.random() * weighted_depth(u)
+            _ancestor = next(q for q in root_path(u) if weighted_depth(q) <= budget)
+
+            if (abs(index.weighted_distance(u, v) - _dist) > 1e-6 or
+                index.weighted_ancestor(u, budget) != _ancestor):
+                raise Exception("TreePathIndex not correctly implemented")
+
+    # Weighted queries on an index built without weights must raise ValueError.
+    index = path_index.TreePathIndex(T)
+    for query in [lambda: index.weighted_depth(0), lambda: index.weighted_distance(0, 0),
+                  lambda: index.weighted_ancestor(0, 1.0), lambda: index.weighted_distance_many([0], [0]),
+                  lambda: index.weighted_ancestor_many([0], [1.0])]:
+        try:
+            query()
+        except ValueError:
+            continue
+        raise Exception("TreePathIndex not correctly implemented")
+
+    print("Weighted TreePathIndex implemented correctly!")
+
+
+def check_path_index_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+    trials = 10000
+
+    print("\nTreePathIndex")
+    print("{:10}   {:10}   {:10}".format("size", "build", "queries"))
+    for size in sizes:
+        T = generate_random_tree(size)
+
+        tic = time.time()
+        index = path_index.TreePathIndex(T)
+        toc = time.time()
+        build = toc - tic
+
+        us = [random.randint(0, size - 1) for _ in range(trials)]
+        vs = [random.randint(0, size - 1) for _ in range(trials)]
+        ks = [random.randint(0, 10) for _ in range(trials)]
+        tic = time.time()
+        index.distance_many(us, vs)
+        index.kth_on_path_many(us, vs, ks)
+        toc = time.time()
+        print("{:<10}   {:<10.6}   {:<10.6}".format(size, build, toc-tic))
+
+def check_la_batch_correctness(LA):
+    sizes = [10, 100, 1000, 10000]
+    trials = 200
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        la_index = LA(T)
+        R = random_position_generator(T)
+
+        positions = [R.generate_random_position() for _ in range(trials)]
+        ks = [random.randint(0, size - 1) for _ in range(trials)]
+        ancestors = la_index.query_many([p.index() for p in positions], ks)
+
+        for p, k, ancestor in zip(positions, ks, ancestors):
+            _ancestor = la_index(p, k)
+            if ancestor != (_ancestor.index() if _ancestor is not None else -1):
+                raise Exception("{}.query_many not correctly implemented".format(LA.__name__))
+            if la_index(p.index(), k) != (ancestor if ancestor != -1 else None):
+                raise Exception("{} not correctly implemented for node indices".format(LA.__name__))
+
+    print("{}.query_many implemented correctly!".format(LA.__name__))
+
+
+def check_la_batch_complexity(LA):
+    size = 64000
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+
+    print("\n{}.query_many".format(LA.__name__))
+    print("{:10}   {:10}   {:10}".format("queries", "single", "batch"))
+    T = generate_random_tree(size)
+    la_index = LA(T)
+    R = random_position_generator(T)
+    for trials in sizes:
+        positions = [R.generate_random_position() for _ in range(trials)]
+        nodes = [p.index() for p in positions]
+        ks = [random.randint(0, 10) for _ in range(trials)]
+
+        tic = time.time()
+        for p, k in zip(positions, ks):
+            la_index(p, k)
+        toc = time.time()
+        single = toc - tic
+
+        tic = time.time()
+        la_index.query_many(nodes, ks)
+        toc = time.time()
+        print("{:<10}   {:<10.6}   {:<10.6}".format(trials, single, toc-tic))
+
+
+
+def check_la_memory(LA):
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+
+    print("\n{}".format(LA.__name__))
+    print("{:10}   {:10}".format("size", "memory (MB)"))
+    for size in sizes:
+        T = generate_random_tree(size)
+        T.reindex()
+
+        tracemalloc.start()
+        la_index = LA(T)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print("{:<10}   {:<10.6}".format(size, current / 2**20))
+
+
+
+def check_la_online_correctness():
+    sizes = [10, 100, 1000, 10000]
+    trials = 200
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        la_index = la.LA_online(T)
+        positions = list(T.positions())
+
+        for trial in range(trials):
+            # Grow the tree by a random leaf.
+            p = random.choice(positions)
+            positions.append(la_index.add_leaf(p, random.randint(0, MAX_VAL)))
+
+            v = random.choice(positions)
+            k = random.randint(0, size - 1)
+            ancestor = la_index(v, k)
+
+            p = v
+            for i in range(k):
+                if p is not None:
+                    p = T.parent(p)
+                else:
+                    break
+
+            if ancestor != p or la_index(v.index(), k) != (p.index() if p is not None else None):
+                raise Exception("LA_online not correctly implemented")
+
+    print("LA_online implemented correctly!")
+
+
+def check_la_online_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+    inserts = 10000
+
+    print("\nLA_online")
+    print("{:10}   {:10}   {:10}".format("size", "build", "inserts"))
+    for size in sizes:
+        T = generate_random_tree(size)
+
+        tic = time.time()
+        la_index = la.LA_online(T)
+        toc = time.time()
+        build = toc - tic
+
+        positions = list(T.positions())
+        tic = time.time()
+        for i in range(inserts):
+            positions.append(la_index.add_leaf(random.choice(positions), i))
+        toc = time.time()
+        print("{:<10}   {:<10.6}   {:<10.6}".format(size, build, toc-tic))
+
+    # Growing a chain at its deepest leaf raises the height of every ancestor in the
+    # tree, so the appends take O(depth) time each, while the index part is O(1).
+    print("\nLA_online chain growth")
+    print("{:10}   {:10}".format("size", "appends"))
+    for size in [500, 1000, 2000, 4000]: # x2
+        T = Tree()
+        p = T.add_root(0)
+        la_index = la.LA_online(T)
+        tic = time.time()
+        for i in range(1, size):
+            p = la_index.add_leaf(p, i)
+        toc = time.time()
+        print("{:<10}   {:<10.6}".format(size, toc-tic))
+
+
+
+def check_micro_tree_catalogue_correctness():
+    path = os.path.join(tempfile.mkdtemp(), "catalogue.bin")
+
+    # A path of 2B nodes has a shape code of 4B - 1 bits, i.e. wider than 64 bits.
+    for block_size in [3, 5, 40]:
+        C = micro_trees.MicroTreeCatalogue(block_size)
+        if block_size < 10:
+            C.generate_all()
+        m = 2 * block_size
+        C.shape_id(((1 << m) - 1) << (m - 1))
+        C.save(path)
+
+        saved = micro_trees._catalogues.pop(block_size, None)
+        try:
+            D = micro_trees.MicroTreeCatalogue.load(path)
+            if D is not micro_trees.MicroTreeCatalogue.get(block_size) or len(D) != len(C):
+                raise Exception("Micro-tree catalogue file not correctly implemented")
+            for code, sid in C._ids.items():
+                if D.answers(D._ids[code]) != C.answers(sid):
+                    raise Exception("Micro-tree catalogue file not correctly implemented")
+        finally:
+            micro_trees._catalogues.pop(block_size, None)
+            if saved is not None:
+                micro_trees._catalogues[block_size] = saved
+
+    # Files that are not catalogues, of another version, or truncated are rejected.
+    with open(path, "rb") as f:
+        data = f.read()
+    header = len(micro_trees.MAGIC)
+    version = array("q", [micro_trees.VERSION + 1]).tobytes()
+    for bad in [b"", b"TREEFILE" + data[header:], data[:header] + version + data[header + 8:],
+                data[:-1], data + b"\0", data[:header + 20]]:
+        with open(path, "wb") as f:
+            f.write(bad)
+        try:
+            micro_trees.MicroTreeCatalogue.load(path)
+        except ValueError:
+            continue
+        raise Exception("Micro-tree catalogue file not correctly implemented")
+
+
+def check_la_bushy_complexity(LA):
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+
+    print("\n{} (bushy trees)".format(LA.__name__))
+    print("{:10}   {:10}   {:10}".format("size", "time", "time/size"))
+    for size in sizes:
+        T = generate_random_tree(size, max_children=64)
+
+        tic = time.time()
+        la_index = LA(T)
+        toc = time.time()
+        print("{:<10}   {:<10.6}   {:<10.6}".format(size, toc-tic, 1e6 * (toc-tic) / size))
+
+def check_la_update_correctness(LA):
+    sizes = [10, 100, 1000, 10000]
+    grafts = 50
+    trials = 20
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        la_index = LA(T)
+        positions = list(T.positions())
+
+        for graft in range(grafts):
+            # Graft a random subtree, sometimes a long chain, below a random node.
+            p = random.choice(positions)
+            frontier = [p]
+            for i in range(random.randint(1, 20)):
+                q = T.add_child(random.choice(frontier), random.randint(0, MAX_VAL))
+                frontier.append(q)
+                positions.append(q)
+            la_index.update_subtree(p)
+
+            for trial in range(trials):
+                v = random.choice(positions)
+                k = random.randint(0, 30)
+                ancestor = la_index(v, k)
+
+                p = v
+                for i in range(k):
+                    if p is not None:
+                        p = T.parent(p)
+                    else:
+                        break
+
+                if ancestor != p:
+                    raise Exception("{}.update_subtree not correctly implemented".format(LA.__name__))
+
+        # Force a full rebuild. The node indices held by the caller must stay valid.
+        ids = [q.index() for q in positions]
+        q = T.root()
+        for i in range(size):
+            q = T.add_child(q, random.randint(0, MAX_VAL))
+        la_index.update_subtree(T.root(), threshold=0)
+        if [q.index() for q in positions] != ids:
+            raise Exception("{}.update_subtree not correctly implemented".format(LA.__name__))
+        nodes = random.sample(range(len(positions)), trials)
+        ks = [random.randint(0, 30) for _ in nodes]
+        expected = [la_index(positions[v], k) for v, k in zip(nodes, ks)]
+        expected = [w.index() if w is not None else -1 for w in expected]
+        if la_index.query_many([ids[v] for v in nodes], ks) != expected:
+            raise Exception("{}.update_subtree not correctly implemented".format(LA.__name__))
+
+    print("{}.update_subtree implemented correctly!".format(LA.__name__))
+
+
+def check_la_update_complexity(LA):
+    sizes = [8000, 64000, 512000]#, 4096000] # x8
+    grafts = 100
+
+    print("\n{} (subtree updates)".format(LA.__name__))
+    print("{:10}   {:10}   {:10}".format("size", "build", "update"))
+    for size in sizes:
+        T = generate_random_tree(size)
+
+        tic = time.time()
+        la_index = LA(T)
+        toc = time.time()
+        build = toc - tic
+
+        positions = list(T.positions())
+        total = 0
+        for i in range(grafts):
+            p = random.choice(positions)
+            for j in range(10):
+                T.add_child(p, j)
+            tic = time.time()
+            la_index.update_subtree(p)
+            toc = time.time()
+            total += toc - tic
+        print("{:<10}   {:<10.6}   {:<10.6}".format(size, build, total / grafts))
+
+def check_la_search_correctness(LA):
+    sizes = [10, 100, 1000, 10000]
+    trials = 200
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        la_index = LA(T)
+        positions = list(T.positions())
+
+        for trial in range(trials):
+            v = random.choice(positions)
+            x = random.randint(0, MAX_VAL)
+            path = [v]
+            while T.parent(path[-1]) is not None:
+                path.append(T.parent(path[-1]))
+
+            d = random.randint(0, len(path))
+            expected = path[len(path) - 1 - d] if d < len(path) else None
+            if la_index.ancestor_at_depth(v, d) != expected:
+                raise Exception("{}.ancestor_at_depth not correctly implemented".format(LA.__name__))
+
+            expected = next((p for p in path if p.elem() <= x), None)
+            if la_index.first_ancestor_at_most(v, x) != expected:
+                raise Exception("{}.first_ancestor_at_most not correctly implemented".format(LA.__name__))
+
+            expected = next((p for p in path if p.elem() >= x), None)
+            if la_index.first_ancestor_at_least(v, x) != expected:
+                raise Exception("{}.first_ancestor_at_least not correctly implemented".format(LA.__name__))
+
+            # Membership in the elements of a prefix of the path is a monotone predicate.
+            j = random.randint(1, len(path))
+            prefix = {p.elem() for p in path[:j]}
+            expected = path[0]
+            for p in path[1:]:
+                if p.elem() not in prefix:
+                    break
+                expected = p
+            if la_index.highest_ancestor(v, lambda elem: elem in prefix) != expected:
+                raise Exception("{}.highest_ancestor not correctly implemented".format(LA.__name__))
+
+        nodes = [random.randrange(size) for _ in range(trials)]
+        xs = [random.randint(0, MAX_VAL) for _ in range(trials)]
+        expected = [la_index.first_ancestor_at_most(la_index._positions[v], x) for v, x in zip(nodes, xs)]
+        expected = [p.index() if p is not None else -1 for p in expected]
+        if la_index.first_ancestor_at_most_many(nodes, xs) != expected:
+            raise Exception("{}.first_ancestor_at_most_many not correctly implemented".format(LA.__name__))
+
+    print("{} search queries implemented correctly!".format(LA.__name__))
+
+
+def check_la_search_complexity(LA):
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+    queries = 10000
+
+    print("\n{} (search queries)".format(LA.__name__))
+    print("{:10}   {:10}   {:10}   {:10}".format("size", "table", "queries", "highest"))
+    for size in sizes:
+        T = generate_random_tree(size)
+        la_index = LA(T)
+        nodes = [random.randrange(size) for _ in range(queries)]
+        xs = [random.randint(0, MAX_VAL) for _ in range(queries)]
+
+        tic = time.time()
+        la_index.first_ancestor_at_most_many(nodes[:1], xs[:1])
+        toc = time.time()
+        table = toc - tic
+
+        tic = time.time()
+        la_index.first_ancestor_at_most_many(nodes, xs)
+        toc = time.time()
+
+        # A predicate that always holds climbs all the way to the root.
+        tic_highest = time.time()
+        la_index.highest_ancestor_many(nodes, lambda elem: True)
+        toc_highest = time.time()
+        print("{:<10}   {:<10.6}   {:<10.6}   {:<10.6}".format(size, table, toc-tic, toc_highest-tic_highest))
+
+def check_la_parallel_correctness(LA):
+    sizes = [10, 100, 1000, 10000]
+    trials = 200
+
+    # Small trees are built sequentially, disable the threshold to test the parallel build.
+    min_size, la.parallel.MIN_SIZE = la.parallel.MIN_SIZE, 0
+    for size in sizes:
+        T = generate_random_tree(size)
+        la_index = LA(T, workers=4)
+        la_serial = LA(T)
+        R = random_position_generator(T)
+
+        for trial in range(trials):
+            v = R.generate_random_position()
+            k = random.randint(0, size - 1)
+            ancestor = la_index(v, k)
+
+            p = v
+            for i in range(k):
+                if p is not None:
+                    p = T.parent(p)
+                else:
+                    break
+
+            if ancestor != p:
+                raise Exception("{} parallel build not correctly implemented".format(LA.__name__))
+
+        nodes = [random.randrange(size) for _ in range(trials)]
+        ks = [random.randint(0, size - 1) for _ in range(trials)]
+        if la_index.query_many(nodes, ks) != la_serial.query_many(nodes, ks):
+            raise Exception("{} parallel build not correctly implemented".format(LA.__name__))
+
+        # The shared arrays are copied on the first update.
+        p = R.generate_random_position()
+        for i in range(size // 10 + 1):
+            T.add_child(p, i)
+        la_index.update_subtree(p)
+        for v in T.positions():
+            w, k = v, 0
+            while w is not None:
+                if la_index(v, k) != w:
+                    raise Exception("{} update after parallel build not correctly implemented".format(LA.__name__))
+                w, k = T.parent(w), k + 1
+    la.parallel.MIN_SIZE = min_size
+
+    print("{} parallel build implemented correctly!".format(LA.__name__))
+
+
+def check_la_parallel_complexity(LA):
+    sizes = [8000, 64000]#, 512000, 4096000] # x8
+    workers = [1, 2, 4]
+
+    # Measure the parallel build itself, below the threshold it would fall back to serial.
+    # The traversal of the tree is not parallel, its share of the serial build bounds the
+    # speedup. The crossover is the smallest size for which some parallel build is faster.
+    min_size, la.parallel.MIN_SIZE = la.parallel.MIN_SIZE, 0
+    print("\n{} (parallel build, {} cores)".format(LA.__name__, os.cpu_count()))
+    print("{:10}".format("size") + "".join("   {:10}".format("workers=" + str(w)) for w in workers)
+          + "   {:10}   {:10}".format("traversal", "speedup"))
+    crossover = None
+    for size in sizes:
+        T = generate_random_tree(size)
+        times = []
+        for w in workers:
+            tic = time.time()
+            la_index = LA(T, workers=w)
+            toc = time.time()
+            times.append(toc - tic)
+
+        # Repeat the sequential traversal on the built index to measure its share.
+        tic = time.time()
+        la_index._flatten(T.root())
+        toc = time.time()
+        traversal = (toc - tic) / times[0]
+        speedup = times[0] / min(times[1:])
+        if crossover is None and speedup > 1:
+            crossover = size
+        print("{:<10}".format(size) + "".join("   {:<10.6}".format(t) for t in times)
+              + "   {:<10.6}   {:<10.6}".format(traversal, speedup))
+    print("crossover: {}".format(crossover if crossover is not None else "none up to {}".format(sizes[-1])))
+    la.parallel.MIN_SIZE = min_size
+
+def check_forest_correctness():
+    sizes = [10, 100, 1000]
+    trials = 200
+
+    for size in sizes:
+        trees = [generate_random_tree(random.randint(1, size)) for _ in range(20)]
+        la_index = la.LA_forest(trees)
+        lca_index = lca.LCA_forest(trees)
+
+        for trial in range(trials):
+            T = random.choice(trees)
+            v = random.choice(list(T.positions()))
+            k = random.randint(0, size - 1)
+
+            p = v
+            for i in range(k):
+                if p is not None:
+                    p = T.parent(p)
+                else:
+                    break
+
+            if la_index(v, k) != p:
+                raise Exception("LA_forest not correctly implemented")
+
+            S = random.choice(trees)
+            u = random.choice(list(S.positions()))
+            ancestor = lca_index(u, v)
+            if S is not T:
+                if ancestor is not None:
+                    raise Exception("LCA_forest not correctly implemented")
+                continue
+
+            ancestors = []
+            while v is not None:
+                ancestors.append(v)
+                v = T.parent(v)
+            while u not in ancestors:
+                u = T.parent(u)
+            if ancestor != u:
+                raise Exception("LCA_forest not correctly implemented")
+
+    # Forests of single-node trees have the shortest Euler tours.
+    for parents in [[-1], [-1, -1], [-1, -1, -1]]:
+        la_index = la.LA_forest.from_parent_array(parents)
+        lca_index = lca.LCA_forest.from_parent_array(parents)
+        for u in range(len(parents)):
+            if la_index(u, 0) != u or la_index(u, 1) is not None:
+                raise Exception("LA_forest not correctly implemented")
+            for v in range(len(parents)):
+                if lca_index(u, v) != (u if u == v else None):
+                    raise Exception("LCA_forest not correctly implemented")
+    T = Tree()
+    p = T.add_root(0)
+    if la.LA_forest([T])(p, 0) != p or lca.LCA_forest([T])(p, p) != p:
+        raise Exception("LCA_forest not correctly implemented")
+
+    print("LA_forest implemented correctly!")
+    print("LCA_forest implemented correctly!")
+
+
+def check_forest_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+    tree_size = 16
+
+    print("\nForest of trees with {} nodes".format(tree_size))
+    print("{:10}   {:10}   {:10}   {:10}   {:10}".format("size", "LA_sparse", "LA_forest", "LCA_Index", "LCA_forest"))
+    for size in sizes:
+        trees = [generate_random_tree(tree_size) for _ in range(size // tree_size)]
+
+        times, memory = [], []
+        for build in [lambda: [la.LA_sparse(T) for T in trees], lambda: la.LA_forest(trees),
+                      lambda: [lca.LCA_Index(T) for T in trees], lambda: lca.LCA_forest(trees)]:
+            tic = time.time()
+            build()
+            toc = time.time()
+            times.append(toc - tic)
+
+            tracemalloc.start()
+            index = build()
+            memory.append(tracemalloc.get_traced_memory()[0] / 2**20)
+            tracemalloc.stop()
+            del index
+        print("{:<10}".format(size) + "".join("   {:<10.6}".format(t) for t in times))
+        print("{:<10}".format("  MB") + "".join("   {:<10.4}".format(m) for m in memory))
+
+
+
+def naive_depth_height(tree, p):
+    depth, q = 0, tree.parent(p)
+    while q is not None:
+        depth, q = depth + 1, tree.parent(q)
+    height, level = 0, list(tree.children(p))
+    while level:
+        height += 1
+        level = [ch for q in level for ch in tree.children(q)]
+    return depth, height
+
+
+def check_tree_reindex_correctness():
+    sizes = [10, 100, 1000]
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        B, _ = build_cartesian_tree(generate_random_array(size))
+        for tree in [T, B]:
+            tree.reindex()
+            indices = [p.index() for p in tree.positions()]
+            if indices != list(range(len(tree))):
+                raise Exception("Tree.reindex not correctly implemented")
+
+            for p in tree.positions():
+                if (tree.depth(p), tree.height(p)) != naive_depth_height(tree, p):
+                    raise Exception("Tree.reindex not correctly implemented")
+
+    print("Tree.reindex implemented correctly!")
+
+
+def check_tree_reindex_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+
+    print("\nReindex chains and random trees")
+    print("{:10}   {:10}   {:10}".format("size", "chain", "random"))
+    for size in sizes:
+        chain = Tree()
+        p = chain.add_root(0)
+        for i in range(1, size):
+            p = chain.add_child(p, i)
+        T = generate_random_tree(size)
+
+        times = []
+        for tree in [chain, T]:
+            tic = time.time()
+            tree.reindex()
+            toc = time.time()
+            times.append(toc - tic)
+        print("{:<10}".format(size) + "".join("   {:<10.6}".format(t) for t in times))
+
+
+def check_tree_update_correctness():
+    sizes = [10, 100, 1000]
+    operations = 200
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        B, _ = build_cartesian_tree(generate_random_array(size))
+        for tree in [T, B]:
+            tree.reindex()
+            nodes = list(tree.positions())
+            for op in range(operations):
+                p = random.choice(nodes)
+                if random.random() < 0.5:
+                    q = tree.insert(p, random.randint(0, MAX_VAL))
+                elif tree.num_children(p) < 2 or tree is T:
+                    q = tree.add_child(p, random.randint(0, MAX_VAL))
+                else:
+                    continue
+                nodes.append(q)
+
+                # Query a few nodes between the updates.
+                for v in random.sample(nodes, 3) + [q, tree.root()]:
+                    if (tree.depth(v), tree.height(v)) != naive_depth_height(tree, v):
+                        raise Exception("Tree updates not correctly implemented")
+
+            if len(list(tree.positions())) != len(tree):
+                raise Exception("Tree updates not correctly implemented")
+
+    print("Tree updates implemented correctly!")
+
+
+def check_tree_update_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+    operations = 1000
+
+    print("\nInterleaved updates and depth queries")
+    print("{:10}   {:10}   {:10}".format("size", "add_child", "insert"))
+    for size in sizes:
+        T = generate_random_tree(size)
+        T.reindex()
+        nodes = list(T.positions())
+
+        times = []
+        for update in [T.add_child, T.insert]:
+            tic = time.time()
+            for op in range(operations):
+                q = update(random.choice(nodes), op)
+                T.depth(q)
+                T.height(T.root())
+            toc = time.time()
+            times.append((toc - tic) / operations)
+        print("{:<10}".format(size) + "".join("   {:<10.6}".format(t) for t in times))
+
+
+def check_position_cache_correctness():
+    sizes = [10, 100, 1000]
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        C = generate_compact_copy(T)
+        L = DoublyLinkedList()
+        for i in range(size):
+            L.add_last(i)
+        B, _ = build_cartesian_tree(generate_random_array(size))
+        for container in [T, C, L, B]:
+            for enable in [False, True]:
+                container.cache_positions(enable)
+                positions = list(container.positions())
+                again = list(container.positions())
+                if len(set(positions) | set(again)) != len(container):
+                    raise Exception("Position hashing not correctly implemented")
+                if any(p != q or hash(p) != hash(q) or (p is q) != enable for p, q in zip(positions, again)):
+                    raise Exception("Position caching not correctly implemented")
+
+            # Disabling the cache releases the cached positions of every container.
+            p = next(container.positions())
+            container.cache_positions(False)
+            container.cache_positions(True)
+            if next(container.positions()) is p:
+                raise Exception("Position caching not correctly implemented")
+        T.cache_positions(False)
+
+        # The builds cache positions only while they run, and keep a cache enabled by the caller.
+        for build in [la.LA_sparse, lca.LCA_Index]:
+            build(T)
+            if T.root() is T.root():
+                raise Exception("Position caching not correctly implemented")
+        T.cache_positions(True)
+        p = T.root()
+        for build in [la.LA_sparse, lca.LCA_Index]:
+            build(T)
+            if T.root() is not p:
+                raise Exception("Position caching not correctly implemented")
+        T.cache_positions(False)
+
+        index = {p: p.index() for p in T.positions()}
+        for p in T.positions():
+            q = T.parent(p)
+            if q is not None and index[q] != q.index():
+                raise Exception("Position hashing not correctly implemented")
+
+    print("Position hashing and caching implemented correctly!")
+
+
+def check_position_cache_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+
+    print("\nBuild with and without cached positions")
+    print("{:10}   {:10}   {:10}   {:10}   {:10}".format("size", "LA_sparse", "LA cached", "LCA_Index", "LCA cached"))
+    for size in sizes:
+        T = generate_random_tree(size)
+        T.reindex()
+
+        times, memory = [], []
+        for build in [la.LA_sparse, lca.LCA_Index]:
+            for enable in [False, True]:
+                T.cache_positions(enable)
+                if enable:
+                    list(T.positions())     # create the cached positions before measuring
+                tic = time.time()
+                build(T)
+                toc = time.time()
+                times.append(toc - tic)
+
+                tracemalloc.start()
+                index = build(T)
+                memory.append(tracemalloc.get_traced_memory()[0] / 2**20)
+                tracemalloc.stop()
+                del index
+        T.cache_positions(False)
+        print("{:<10}".format(size) + "".join("   {:<10.6}".format(t) for t in times))
+        print("{:<10}".format("  MB") + "".join("   {:<10.4}".format(m) for m in memory))
+
+
+def check_tree_constructors_correctness():
+    sizes = [10, 100, 1000]
+
+    for size in sizes:
+        # Build the same random tree node by node and in bulk.
+        parents = [-1] + [random.randint(0, v - 1) for v in range(1, size)]
+        elems = generate_random_array(size)
+        T = Tree()
+        nodes = [T.add_root(elems[0])]
+        for v in range(1, size):
+            nodes.append(T.add_child(nodes[parents[v]], elems[v]))
+        T.reindex()
+
+        edges = [(v, parents[v]) if random.random() < 0.5 else (parents[v], v) for v in range(1, size)]
+        random.shuffle(edges)
+        bits = []
+        stack = [(T.root(), False)]
+        while stack:
+            p, done = stack.pop()
+            bits.append(0 if done else 1)
+            if not done:
+                stack.append((p, True))
+                stack.extend((ch, False) for ch in reversed(list(T.children(p))))
+
+        built = [Tree.from_parent_array(parents, elems), Tree.from_edges(edges, 0, elems),
+                 Tree.from_parentheses(bits), Tree.from_parentheses("".join("()"[1 - b] for b in bits))]
+        for S in built:
+            if len(S) != len(T):
+                raise Exception("Tree constructors not correctly implemented")
+            depths, heights = [S.depth(q) for q in S.positions()], [S.height(q) for q in S.positions()]
+            S.reindex()
+            if depths != [S.depth(q) for q in S.positions()] or heights != [S.height(q) for q in S.positions()]:
+                raise Exception("Tree constructors not correctly implemented")
+            if sorted(depths) != sorted(T.depth(p) for p in T.positions()):
+                raise Exception("Tree constructors not correctly implemented")
+        for S in built[:1]:
+            if [q.elem() for q in S.positions()] != [p.elem() for p in T.positions()]:
+                raise Exception("Tree constructors not correctly implemented")
+
+    # Parent arrays with out-of-range parents, several roots or cycles are rejected.
+    for parents in [[-1, 0, -2], [-1, -3], [-1, 2], [0, -1, 5], [-1, -1], [], [1, 0]]:
+        try:
+            Tree.from_parent_array(parents)
+        except ValueError:
+            continue
+        raise Exception("Tree constructors not correctly implemented")
+    S = Tree.from_parent_array([1, -1, 1])
+    if S.root().elem() != 1 or [S.depth(q) for q in S.positions()] != [0, 1, 1]:
+        raise Exception("Tree constructors not correctly implemented")
+
+    print("Tree constructors implemented correctly!")
+
+
+def check_tree_constructors_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+
+    print("\nBuild trees node by node and in bulk")
+    print("{:10}   {:10}   {:10}   {:10}   {:10}".format("size", "add_child", "parents", "edges", "parentheses"))
+    for size in sizes:
+        parents = [-1] + [random.randint(max(0, v - 8), v - 1) for v in range(1, size)]
+        edges = [(parents[v], v) for v in range(1, size)]
+        bits = [1] * size + [0] * size
+
+        def build_by_nodes():
+            T = Tree()
+            nodes = [T.add_root(0)]
+            for v in range(1, size):
+                nodes.append(T.add_child(nodes[parents[v]], v))
+            T.reindex()
+
+        times = []
+        for build in [build_by_nodes, lambda: Tree.from_parent_array(parents),
+                      lambda: Tree.from_edges(edges), lambda: Tree.from_parentheses(bits)]:
+            tic = time.time()
+            build()
+            toc = time.time()
+            times.append(toc - tic)
+        print("{:<10}".format(size) + "".join("   {:<10.6}".format(t) for t in times))
+
+
+def check_tree_file_correctness():
+    sizes = [10, 100, 1000]
+    trials = 200
+    path = os.path.join(tempfile.mkdtemp(), "tree.bin")
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        T.save(path)
+        for mmap in [True, False]:
+            C = Tree.load(path, mmap=mmap)
+            if len(C) != len(T):
+                raise Exception("Tree file not correctly implemented")
+            for p, q in zip(T.positions(), C.positions()):
+                if (p.elem() != q.elem() or T.depth(p) != C.depth(q) or T.height(p) != C.height(q)
+                        or T.num_children(p) != C.num_children(q)):
+                    raise Exception("Tree file not correctly implemented")
+
+            # Query the loaded tree, then modify it and update the index. The arrays of
+            # the loaded tree are read-only, so the indexes must not write into them.
+            nodes = list(C.positions())
+            la_index = la.LA_sparse(C)
+            la_index.update_subtree(C.root())
+            lca_index = lca.LCA_Index(C)
+            for trial in range(trials):
+                v = random.choice(nodes)
+                k = random.randint(0, size - 1)
+                p = v
+                for i in range(k):
+                    if p is not None:
+                        p = C.parent(p)
+                if la_index(v, k) != p:
+                    raise Exception("LA on a loaded tree not correctly implemented")
+                if lca_index(v, v) != v:
+                    raise Exception("LCA on a loaded tree not correctly implemented")
+
+            p = random.choice(nodes)
+            C.add_child(p, 0)
+            la_index.update_subtree(p)
+            for v in C.positions():
+                w, k = v, 0
+                while w is not None:
+                    if la_index(v, k) != w:
+                        raise Exception("LA update on a loaded tree not correctly implemented")
+                    w, k = C.parent(w), k + 1
+
+            # Save the modified tree and load it again.
+            C.save(path, elems=False)
+            D = Tree.load(path)
+            if [C.depth(q) for q in C.positions()] != [D.depth(q) for q in D.positions()]:
+                raise Exception("Tree file not correctly implemented")
+            if any(q.elem() is not None for q in D.positions()):
+                raise Exception("Tree file not correctly implemented")
+            T.save(path)
+
+    print("Tree file implemented correctly!")
+
+
+def check_tree_file_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+    path = os.path.join(tempfile.mkdtemp(), "tree.bin")
+
+    print("\nSave and load trees")
+    print("{:10}   {:10}   {:10}   {:10}   {:10}".format("size", "rebuild", "save", "load mmap", "load read"))
+    for size in sizes:
+        T = generate_random_tree(size)
+        parents = [-1] * size
+        for p in T.positions():
+            if not T.is_root(p):
+                parents[p.index()] = T.parent(p).index()
+        elems = [p.elem() for p in sorted(T.positions(), key=lambda p: p.index())]
+
+        times, memory = [], []
+        for build in [lambda: Tree.from_parent_array(parents, elems), lambda: T.save(path),
+                      lambda: Tree.load(path, mmap=True), lambda: Tree.load(path, mmap=False)]:
+            tic = time.time()
+            build()
+            toc = time.time()
+            times.append(toc - tic)
+
+            tracemalloc.start()
+            tree = build()
+            memory.append(tracemalloc.get_traced_memory()[0] / 2**20)
+            tracemalloc.stop()
+            del tree
+        print("{:<10}".format(size) + "".join("   {:<10.6}".format(t) for t in times))
+        print("{:<10}".format("  MB") + "".join("   {:<10.4}".format(m) for m in memory))
+
+
+def check_traversal_correctness():
+    sizes = [10, 100, 1000]
+
+    def recursive_traversals(tree, p, pre, post, euler, depth, d=0):
+        pre.append(p.index())
+        euler.append(p.index())
+        depth[p.index()] = d
+        for ch in tree.children(p):
+            recursive_traversals(tree, ch, pre, post, euler, depth, d + 1)
+            euler.append(p.index())
+        post.append(p.index())
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        T.reindex()
+        C = generate_compact_copy(T)
+        for tree in [T, C]:
+            for p in random.sample(list(tree.positions()), 5) + [None]:
+                pre, post, euler, depth = [], [], [], {}
+                recursive_traversals(tree, p if p is not None else tree.root(), pre, post, euler, depth)
+                levels = sorted(pre, key=lambda v: depth[v])
+                expected = [pre, post, euler, levels]
+
+                generated = [traversal.preorder, traversal.postorder, traversal.euler_tour, traversal.level_order]
+                bulk = [traversal.preorder_indices, traversal.postorder_indices,
+                        traversal.euler_tour_indices, traversal.level_order_indices]
+                for order, gen, indices in zip(expected, generated, bulk):
+                    if [q.index() for q in gen(tree, p)] != order or list(indices(tree, p)) != order:
+                        raise Exception("Traversals not correctly implemented")
+
+    # Traverse a chain deeper than the recursion limit.
+    size = 10000
+    chain = CompactTree()
+    p = chain.add_root(0)
+    for i in range(1, size):
+        p = chain.add_child(p, i)
+    if list(traversal.postorder_indices(chain)) != list(range(size - 1, -1, -1)):
+        raise Exception("Traversals not correctly implemented")
+    if sum(1 for _ in traversal.euler_tour(chain)) != 2 * size - 1:
+        raise Exception("Traversals not correctly implemented")
+
+    print("Traversals implemented correctly!")
+
+
+def check_traversal_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+
+    print("\nTraversals of trees and compact trees")
+    print("{:10}   {:10}   {:10}   {:10}   {:10}".format("size", "preorder", "indices", "compact", "compact euler"))
+    for size in sizes:
+        T = generate_random_tree(size)
+        T.reindex()
+        C = generate_compact_copy(T)
+
+        times = []
+        for traverse in [lambda: sum(1 for _ in traversal.preorder(T)), lambda: traversal.preorder_indices(T),
+                         lambda: traversal.preorder_indices(C), lambda: traversal.euler_tour_indices(C)]:
+            tic = time.time()
+            traverse()
+            toc = time.time()
+            times.append(toc - tic)
+        print("{:<10}".format(size) + "".join("   {:<10.6}".format(t) for t in times))
+
+
+def check_stack_queue_correctness():
+    operations = 10000
+
+    for capacity, typecode in [(0, None), (16, None), (1, "l"), (1000, "l")]:
+        S, Q = Stack(capacity, typecode), Queue(capacity, typecode)
+        stack, queue = [], deque()
+        for op in range(operations):
+            if random.random() < 0.55:
+                elem = random.randint(0, MAX_VAL)
+                S.push(elem)
+                Q.enqueue(elem)
+                stack.append(elem)
+                queue.append(elem)
+            elif stack:
+                if S.top() != stack[-1] or S.pop() != stack.pop():
+                    raise Exception("Stack not correctly implemented")
+                if Q.first() != queue[0] or Q.dequeue() != queue.popleft():
+                    raise Exception("Queue not correctly implemented")
+            if len(S) != len(stack) or S.is_empty() != (not stack):
+                raise Exception("Stack not correctly implemented")
+            if len(Q) != len(queue) or Q.is_empty() != (not queue):
+                raise Exception("Queue not correctly implemented")
+
+    print("Stack implemented correctly!")
+    print("Queue implemented correctly!")
+
+
+def check_stack_queue_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+
+    print("\nStack and queue operations against a linked list")
+    print("{:10}   {:10}   {:10}   {:10}   {:10}   {:10}".format("size", "list stack", "Stack", "typed Stack",
+                                                                "list queue", "Queue"))
+    for size in sizes:
+        def linked_list_stack():
+            L = DoublyLinkedList()
+            for i in range(size):
+                L.add_last(i)
+            while not L.is_empty():
+                L.delete(L.last())
+
+        def stack(S):
+            for i in range(size):
+                S.push(i)
+            while not S.is_empty():
+                S.pop()
+
+        def linked_list_queue():
+            L = DoublyLinkedList()
+            for i in range(size):
+                L.add_last(i)
+            while not L.is_empty():
+                L.delete(L.first())
+
+        def queue(Q):
+            for i in range(size):
+                Q.enqueue(i)
+            while not Q.is_empty():
+                Q.dequeue()
+
+        times = []
+        for run in [linked_list_stack, lambda: stack(Stack()), lambda: stack(Stack(size, "l")),
+                    linked_list_queue, lambda: queue(Queue())]:
+            tic = time.time()
+            run()
+            toc = time.time()
+            times.append(toc - tic)
+        print("{:<10}".format(size) + "".join("   {:<10.6}".format(t) for t in times))
+
+    # The stack backed by a linked list, as it was before the array-backed Stack.
+    class LinkedListStack:
+        def __init__(self, capacity=0):
+            self._container = DoublyLinkedList()
+        def is_empty(self):
+            return self._container.is_empty()
+        def top(self):
+            return self._container.last().elem()
+        def push(self, elem):
+            self._container.add_last(elem)
+        def pop(self):
+            return self._container.delete(self._container.last())
+
+    print("\nCall sites of the stack, linked list vs array backing")
+    print("{:10}   {:10}   {:10}   {:10}   {:10}".format("size", "Cart list", "Cart array",
+                                                         "RMQ list", "RMQ array"))
+    for size in sizes:
+        arr = generate_random_array(size)
+        times = []
+        for build in [lambda: build_cartesian_tree(arr), lambda: rmq.RMQ_Fischer_Heun(arr)]:
+            for backing in [LinkedListStack, Stack]:
+                traversal.Stack, rmq.Stack = backing, backing
+                try:
+                    tic = time.time()
+                    build()
+                    toc = time.time()
+                finally:
+                    traversal.Stack, rmq.Stack = Stack, Stack
+                times.append(toc - tic)
+        print("{:<10}".format(size) + "".join("   {:<10.6}".format(t) for t in times))
+
+
+def check_linked_list_correctness():
+    operations = 5000
+
+    L = DoublyLinkedList()
+    reference, positions = [], []
+    for op in range(operations):
+        r = random.random()
+        elem = random.choice([None, 0, random.randint(0, MAX_VAL)])
+        if r < 0.3 or not reference:
+            if random.random() < 0.5:
+                positions.append(L.add_last(elem))
+                reference.append(elem)
+            else:
+                positions.insert(0, L.add_first(elem))
+                reference.insert(0, elem)
+        elif r < 0.5:
+            i = random.randrange(len(reference))
+            if random.random() < 0.5:
+                positions.insert(i, L.add_before(elem, positions[i]))
+                reference.insert(i, elem)
+            else:
+                positions.insert(i + 1, L.add_after(elem, positions[i]))
+                reference.insert(i + 1, elem)
+        elif r < 0.75:
+            i = random.randrange(len(reference))
+            p = positions.pop(i)
+            if L.delete(p) != reference.pop(i):
+                raise Exception("DoublyLinkedList not correctly implemented")
+            try:
+                L.after(p)
+                raise Exception("DoublyLinkedList not correctly implemented")
+            except ValueError:
+                pass
+        elif r < 0.9:
+            i = random.randrange(len(reference))
+            j = random.randrange(i, len(reference))
+            rest = positions[:i] + positions[j + 1:]
+            k = random.randrange(len(rest) + 1)
+            L.splice(rest[k - 1] if k > 0 else None, positions[i], positions[j])
+            moved, elems = positions[i:j + 1], reference[i:j + 1]
+            reference = reference[:i] + reference[j + 1:]
+            reference[k:k] = elems
+            positions = rest[:k] + moved + rest[k:]
+        elif r < 0.99:
+            elems = [random.randint(0, MAX_VAL) for _ in range(random.randint(0, 5))]
+            L.extend(elems)
+            reference.extend(elems)
+            positions.extend(list(L.positions())[len(positions):])
+        else:
+            L.clear()
+            reference, positions = [], []
+
+        if len(L) != len(reference) or list(L) != reference:
+            raise Exception("DoublyLinkedList not correctly implemented")
+        if [p.elem() for p in L.positions(reverse=True)] != reference[::-1]:
+            raise Exception("DoublyLinkedList not correctly implemented")
+        if list(L.positions()) != positions:
+            raise Exception("DoublyLinkedList not correctly implemented")
+
+    print("DoublyLinkedList implemented correctly!")
+
+
+def check_linked_list_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+    window = 1000
+
+    print("\nLinked list churn with {} live elements".format(window))
+    print("{:10}   {:10}   {:10}   {:10}".format("size", "churn", "MB", "extend"))
+    for size in sizes:
+        L = DoublyLinkedList()
+        L.extend(range(window))
+
+        tracemalloc.start()
+        tic = time.time()
+        for i in range(size):
+            L.add_last(i)
+            L.delete(L.first())
+        toc = time.time()
+        memory = tracemalloc.get_traced_memory()[0] / 2**20
+        tracemalloc.stop()
+
+        L.clear()
+        tic_extend = time.time()
+        L.extend(range(size))
+        toc_extend = time.time()
+        print("{:<10}   {:<10.6}   {:<10.4}   {:<10.6}".format(size, toc - tic, memory, toc_extend - tic_extend))
+
+
+def generate_compact_copy(T):
+    C = CompactTree()
+    stack = [(T.root(), None)]
+    while stack:
+        p, q = stack.pop()
+        q = C.add_root(p.elem()) if q is None else C.add_child(q, p.elem())
+        stack.extend((ch, q) for ch in reversed(list(T.children(p))))
+    return C
+
+
+def check_compact_tree_correctness():
+    sizes = [10, 100, 1000]
+    trials = 200
+
+    for size in sizes:
+        T = generate_random_tree(size)
+        C = generate_compact_copy(T)
+        T.reindex()
+        if len(C) != len(T):
+            raise Exception("CompactTree not correctly implemented")
+        for p, q in zip(T.positions(), C.positions()):
+            if (p.elem() != q.elem() or T.depth(p) != C.depth(q) or T.height(p) != C.height(q)
+                    or T.num_children(p) != C.num_children(q) or T.is_leaf(p) != C.is_leaf(q)):
+                raise Exception("CompactTree not correctly implemented")
+
+        nodes = list(C.positions())
+        la_indexes = [la.LA_sparse(C), la.LA_macro_micro(C)]
+        lca_index = lca.LCA_Index(C)
+        for trial in range(trials):
+            v = random.choice(nodes)
+            k = random.randint(0, size - 1)
+            p = v
+            for i in range(k):
+                if p is not None:
+                    p = C.parent(p)
+            for la_index in la_indexes:
+                if la_index(v, k) != p:
+                    raise Exception("LA on CompactTree not correctly implemented")
+
+            u = random.choice(nodes)
+            ancestor = lca_index(u, v)
+            ancestors = []
+            w = v
+            while w is not None:
+                ancestors.append(w)
+                w = C.parent(w)
+            while u not in ancestors:
+                u = C.parent(u)
+            if ancestor != u:
+                raise Exception("LCA on CompactTree not correctly implemented")
+
+        # Grow the compact tree under a random node and update the indexes.
+        p = random.choice(nodes)
+        for _ in range(size // 10 + 1):
+            q = random.choice([p] + list(C.children(p)))
+            C.add_child(q, random.randint(0, MAX_VAL))
+        for la_index in la_indexes:
+            la_index.update_subtree(p)
+        for v in C.positions():
+            w, k = v, 0
+            while w is not None:
+                for la_index in la_indexes:
+                    if la_index(v, k) != w:
+                        raise Exception("LA update on CompactTree not correctly implemented")
+                w, k = C.parent(w), k + 1
+
+    print("CompactTree implemented correctly!")
+
+
+def check_compact_tree_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+
+    print("\nTree vs CompactTree")
+    print("{:10}   {:10}   {:10}   {:10}   {:10}".format("size", "Tree", "Compact", "Tree+LA", "Compact+LA"))
+    for size in sizes:
+        def build(tree_type):
+            tree = tree_type()
+            nodes = [tree.add_root(0)]
+            for v in range(1, size):
+                nodes.append(tree.add_child(nodes[random.randint(0, v - 1)], v))
+            return tree
+
+        times, memory = [], []
+        for tree_type in [Tree, CompactTree]:
+            tic = time.time()
+            build(tree_type)
+            toc = time.time()
+            times.append(toc - tic)
+            tracemalloc.start()
+            tree = build(tree_type)
+            memory.append(tracemalloc.get_traced_memory()[0] / 2**20)
+            tracemalloc.stop()
+            del tree
+        for tree_type in [Tree, CompactTree]:
+            tree = build(tree_type)
+            tic = time.time()
+            la.LA_sparse(tree)
+            toc = time.time()
+            times.append(toc - tic)
+            tracemalloc.start()
+            index = la.LA_sparse(tree)
+            memory.append(tracemalloc.get_traced_memory()[0] / 2**20)
+            tracemalloc.stop()
+            del index
+        print("{:<10}".format(size) + "".join("   {:<10.6}".format(t) for t in times))
+        print("{:<10}".format("  MB") + "".join("   {:<10.4}".format(m) for m in memory))
+
+
+def generate_repetitive_tree(size, num_parts=8, part_size=16):
+    # Every node expands into one of a few random parts. The part attached at a leaf of
+    # a part is fixed by the rule table, so the same subtrees recur throughout the tree.
+    parts = [[-1] + [random.randint(0, v - 1) for v in range(1, part_size)] for _ in range(num_parts)]
+    labels = [[random.randint(0, 3) for _ in range(part_size)] for _ in range(num_parts)]
+    rules = [[random.randrange(num_parts) for _ in range(part_size)] for _ in range(num_parts)]
+
+    parents, elems = [-1], [labels[0][0]]
+    frontier = deque([(0, 0)])
+    while frontier and len(parents) + part_size - 1 <= size:
+        u, k = frontier.popleft()
+        nodes = [u]
+        for v in range(1, part_size):
+            nodes.append(len(parents))
+            parents.append(nodes[parts[k][v]])
+            elems.append(labels[k][v])
+        is_leaf = [True] * part_size
+        for v in range(1, part_size):
+            is_leaf[parts[k][v]] = False
+        frontier.extend((nodes[v], rules[k][v]) for v in range(1, part_size) if is_leaf[v])
+    return Tree.from_parent_array(parents, elems)
+
+
+def check_tree_dag_correctness():
+    sizes = [10, 100, 1000]
+    trials = 200
+
+    for size in sizes:
+        for T in [generate_random_tree(size), generate_repetitive_tree(size * 10)]:
+            T.reindex()
+            D = TreeDAG(T)
+            if len(D) != len(T) or D.num_shapes() > len(T):
+                raise Exception("TreeDAG not correctly implemented")
+
+            # Compare the expanded tree with the original tree in preorder.
+            index = {}
+            nodes = []
+            for i, (p, q) in enumerate(zip(T.positions(), D.positions())):
+                index[p] = i
+                nodes.append(q)
+                if (q.index() != i or p.elem() != q.elem() or T.depth(p) != D.depth(q)
+                        or T.height(p) != D.height(q) or T.num_children(p) != D.num_children(q)
+                        or T.is_leaf(p) != D.is_leaf(q) or T.is_root(p) != D.is_root(q)):
+                    raise Exception("TreeDAG not correctly implemented")
+                parent = T.parent(p)
+                if (parent is None) != (D.parent(q) is None) or (parent is not None and index[parent] != D.parent(q).index()):
+                    raise Exception("TreeDAG not correctly implemented")
+
+            # Identical subtrees must have equal shapes and vice versa.
+            def serialize(p):
+                return (p.elem(), tuple(serialize(ch) for ch in T.children(p)))
+            positions = list(T.positions())
+            shapes = {}
+            for trial in range(trials):
+                p = random.choice(positions)
+                q = D.position(index[p])
+                if q != nodes[index[p]] or D.subtree_size(q) != sum(1 for _ in traversal.preorder(T, p)):
+                    raise Exception("TreeDAG not correctly implemented")
+                if shapes.setdefault(D.shape(q), serialize(p)) != serialize(p):
+                    raise Exception("TreeDAG shapes not correctly implemented")
+            if len(set(shapes.values())) != len(shapes):
+                raise Exception("TreeDAG shapes not correctly implemented")
+
+            # Level ancestor queries on positions reached by navigation and by index.
+            for trial in range(trials):
+                i = random.randrange(len(T))
+                q = random.choice([nodes[i], D.position(i)])
+                k = random.randint(0, D.depth(q) + 1)
+                p = positions[i]
+                for _ in range(k):
+                    if p is not None:
+                        p = T.parent(p)
+                ancestor = D.level_ancestor(q, k)
+                if (p is None) != (ancestor is None) or (p is not None and ancestor.index() != index[p]):
+                    raise Exception("LA on TreeDAG not correctly implemented")
+
+    print("TreeDAG implemented correctly!")
+
+
+def check_tree_dag_complexity():
+    sizes = [1000, 8000, 64000]#, 512000, 4096000] # x8
+    queries = 10000
+
+    print("\nTree vs TreeDAG on repetitive trees")
+    print("{:10}   {:10}   {:10}   {:10}   {:10}   {:10}".format("size", "shapes", "Tree MB", "DAG MB", "build", "LA"))
+    for size in sizes:
+        tracemalloc.start()
+        T = generate_repetitive_tree(size)
+        tree_memory = tracemalloc.get_traced_memory()[0] / 2**20
+        tracemalloc.stop()
+
+        tic = time.time()
+        TreeDAG(T)
+        toc = time.time()
+        tracemalloc.start()
+        D = TreeDAG(T)
+        dag_memory = tracemalloc.get_traced_memory()[0] / 2**20
+        tracemalloc.stop()
+        del T
+
+        nodes = [D.position(random.randrange(len(D))) for _ in range(queries)]
+        tic_la = time.time()
+        for q in nodes:
+            D.level_ancestor(q, random.randint(0, D.depth(q)))
+        toc_la = time.time()
+        print("{:<10}   {:<10}   {:<10.4}   {:<10.4}   {:<10.6}   {:<10.6}".format(len(D),
+            D.num_shapes(), tree_memory, dag_memory, toc - tic, toc_la - tic_la))
 
 
 if __name__ == "__main__":
@@ -219,13 +1872,79 @@ if __name__ == "__main__":
     print()
     check_lca_correctness(lca.LCA_Index)
     check_lca_complexity(lca.LCA_Index)
+    check_link_cut_correctness()
+    check_link_cut_complexity()
+    check_heavy_light_correctness()
+    check_heavy_light_complexity()
+    check_subtree_index_correctness()
+    check_subtree_index_complexity()
 
 
     print()
-    la_solutions = [la.LA_macro_micro, la.LA_table, la.LA_sparse, la.LA_macro_micro]
+    la_solutions = [la.LA_macro_micro, la.LA_table, la.LA_sparse, la.LA_macro_micro, la.LA_euler, la.LA_online]
     for la_strategy in la_solutions:
         check_la_correctness(la_strategy)
 
     for la_strategy in la_solutions:
         check_la_complexity(la_strategy)
 
+    for la_strategy in [la.LA_sparse, la.LA_macro_micro, la.LA_euler]:
+        check_la_memory(la_strategy)
+
+    for la_strategy in [la.LA_sparse, la.LA_macro_micro, la.LA_euler]:
+        check_la_bushy_complexity(la_strategy)
+
+    for la_strategy in [la.LA_sparse, la.LA_macro_micro, la.LA_euler, la.LA_online]:
+        check_la_batch_correctness(la_strategy)
+        check_la_batch_complexity(la_strategy)
+
+    for la_strategy in [la.LA_sparse, la.LA_macro_micro]:
+        check_la_update_correctness(la_strategy)
+        check_la_update_complexity(la_strategy)
+        check_la_search_correctness(la_strategy)
+        check_la_search_complexity(la_strategy)
+        check_la_parallel_correctness(la_strategy)
+        check_la_parallel_complexity(la_strategy)
+
+    check_la_online_correctness()
+    check_la_online_complexity()
+    check_micro_tree_catalogue_correctness()
+
+    check_forest_correctness()
+    check_forest_complexity()
+
+    check_compact_tree_correctness()
+    check_compact_tree_complexity()
+
+    check_position_cache_correctness()
+    check_position_cache_complexity()
+
+    check_tree_reindex_correctness()
+    check_tree_reindex_complexity()
+
+    check_tree_update_correctness()
+    check_tree_update_complexity()
+
+    check_tree_constructors_correctness()
+    check_tree_constructors_complexity()
+
+    check_tree_file_correctness()
+    check_tree_file_complexity()
+
+    check_traversal_correctness()
+    check_traversal_complexity()
+
+    check_stack_queue_correctness()
+    check_stack_queue_complexity()
+
+    check_linked_list_correctness()
+    check_linked_list_complexity()
+
+    check_tree_dag_correctness()
+    check_tree_dag_complexity()
+
+    print()
+    check_path_index_correctness()
+    check_weighted_path_index_correctness()
+    check_path_index_complexity()
+
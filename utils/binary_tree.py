@@ -88,8 +88,8 @@ class BinaryTree(Tree):
         node._left = left_ch
         self._size += 1
 
-        # Invalidate depths and heights after modifying the tree.
-        self._depths, self._heights = None, None
+        # Update the depths and the heights after modifying the tree.
+        self._add_leaf_depth_height(left_ch)
         return self._make_position(left_ch)
 
     def add_right(self, p, elem):
@@ -108,8 +108,8 @@ class BinaryTree(Tree):
         node._right = right_ch
         self._size += 1
 
-        # Invalidate depths and heights after modifying the tree.
-        self._depths, self._heights = None, None
+        # Update the depths and the heights after modifying the tree.
+        self._add_leaf_depth_height(right_ch)
         return self._make_position(right_ch)
 
     def add_child(self, p, elem):
@@ -131,8 +131,8 @@ class BinaryTree(Tree):
     def insert(self, p, elem, left=True):
         """ Overwrite the `insert` method.
         Insert a new node at Position p. Attach the subtree rooted at the existing node
-        as a child of the new node. Note that the depths and the heights of the nodes
-        must be recomputed after executing the method `insert`.
+        as a child of the new node. The depths of the nodes in the subtree are shifted
+        lazily, see the tree module.
         @param p (Position): Position representing the node in the tree.
         @param elem: Element to be stored at the new node.
         @param left (bool): If True attach the subtree as the left child of the node.
@@ -158,8 +158,30 @@ class BinaryTree(Tree):
                 parent._right = new_node
         node._parent = new_node
 
-        # Invalidate depths and heights after modifying the tree.
-        self._depths, self._heights = None, None
+        # Update the depths and the heights after modifying the tree.
+        self._insert_depth_height(new_node, node)
         return self._make_position(new_node)
 
+    #---- private methods - should not be invoked by the user ----#
+    def _child_nodes(self, node):
+        """ Overwrite the _child_nodes method. """
+        return [ch for ch in (node._left, node._right) if ch is not None]
+
+    @staticmethod
+    def _link_child_nodes(nodes, parents):
+        """ Overwrite the _link_child_nodes method. The child with the smaller index becomes
+        the left child and the other child becomes the right child.
+        Raise ValueError if a node has more than two children.
+        """
+        for v, u in enumerate(parents):
+            if u != -1:
+                child, parent = nodes[v], nodes[u]
+                child._parent = parent
+                if parent._left is None:
+                    parent._left = child
+                elif parent._right is None:
+                    parent._right = child
+                else:
+                    raise ValueError("The node already has two children!")
+
 #
\ No newline at end of file
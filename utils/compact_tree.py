@@ -0,0 +1,301 @@
+""" The compact tree supports the same accessor and mutator methods as the tree data
+structure, except for `insert`. Instead of allocating a node object with a list of
+children for every node, the tree is stored as a structure of arrays indexed by the
+node indices:
+    parent[v]: The index of the parent of v, or -1 for the root.
+    first_child[v], next_sibling[v]: The children of v form a linked list.
+    depth[v], height[v]: The depth and the height of v.
+The elements are stored in a separate list.
+
+Nodes are indexed in the order of insertion, so every node has a larger index than
+its parent. The depths are computed when the nodes are added. Adding a child to a
+leaf raises the heights of its ancestors walking up the tree, and the walk stops at the
+first ancestor whose height does not change.
+
+Positions are created on demand from the node indices. In addition to the tree ADT
+the compact tree supports the following accessor methods:
+    T.position(i): Return the Position of the node with index i.
+    T.parent_array(), T.depth_array(), T.height_array(): Return the underlying arrays.
+    T.child_arrays(): Return the arrays first_child and next_sibling.
+    T.save(path, elems): Write the tree to a binary file, see the module tree_file.
+
+A compact tree loaded from a file is backed by the mapped contents of the file. Its
+arrays are copied into regular arrays before the tree is modified for the first time.
+"""
+
+from array import array
+from collections.abc import Sequence
+
+
+from .positional_container import PositionalContainer
+
+
+class CompactTree(PositionalContainer):
+    #----------------- nested Position class ------------------#
+    class Position(PositionalContainer.Position):
+        """ The node of a Position in a compact tree is the index of the node. """
+        __slots__ = ()
+        def elem(self):
+            """ Return the elem of the node at this Position. """
+            elems = self._container._elems
+            return elems[self._node] if elems is not None else None
+
+        def index(self):
+            """ Return the index of the node at this Position. """
+            return self._node
+
+        def __eq__(self, other):
+            """ Return True if other is a Position representing the same location. """
+            return (type(other) is type(self) and other._container is self._container
+                    and other._node == self._node)
+
+        def __hash__(self):
+            """ Return a hash consistent with equality. """
+            return hash((id(self._container), self._node))
+
+    #---------------- tree initializer ----------------#
+    def __init__(self):
+        """ Initialize an empty tree. """
+        self._size = 0
+        self._parent = array("l")
+        self._first_child = array("l")
+        self._last_child = array("l")
+        self._next_sibling = array("l")
+        self._depth = array("l")
+        self._height = array("l")
+        self._elems = []
+        self._position_cache = []
+        self._mapped = False        # True if the arrays are backed by a mapped file
+
+    #---------------- public accessors ----------------#
+    def root(self):
+        """ Return Position representing the root of the tree. """
+        return self._make_position(0 if self._size > 0 else -1)
+
+    def parent(self, p):
+        """ Return Position representing the parent of the node at Position p. """
+        v = self._validate(p)
+        return self._make_position(self._parent[v])
+
+    def num_children(self, p):
+        """ Return the number of children of the node at Position p. """
+        return sum(1 for _ in self.children(p))
+
+    def children(self, p):
+        """ Generate an iteration of Position representing the children of p. """
+        ch = self._first_child[self._validate(p)]
+        while ch != -1:
+            yield self._make_position(ch)
+            ch = self._next_sibling[ch]
+
+    def depth(self, p):
+        """ Return the depth of the node at Position p. """
+        return self._depth[self._validate(p)]
+
+    def height(self, p):
+        """ Return the height of the node at Position p. """
+        return self.height_array()[self._validate(p)]
+
+    def is_root(self, p):
+        """ Return True if Position p represents the root of the tree. """
+        return self._validate(p) == 0
+
+    def is_leaf(self, p):
+        """ Return True if Position p dos not have any children. """
+        return self._first_child[self._validate(p)] == -1
+
+    def positions(self):
+        """ Generate an iteration of all positions of the tree in preorder.
+        The traversal uses an explicit stack.
+        """
+        if self._size == 0:
+            return
+        stack = [0]
+        while stack:
+            v = stack.pop()
+            yield self._make_position(v)
+
+            children = []
+            ch = self._first_child[v]
+            while ch != -1:
+                children.append(ch)
+                ch = self._next_sibling[ch]
+            stack.extend(reversed(children))
+
+    def position(self, i):
+        """ Return the Position of the node with index i.
+        Raise IndexError if there is no such node.
+        """
+        if not 0 <= i < self._size:
+            raise IndexError("node index out of range")
+        return self._make_position(i)
+
+    def parent_array(self):
+        """ Return the array of parent indices. The array must not be modified. """
+        return self._parent
+
+    def depth_array(self):
+        """ Return the array of depths. The array must not be modified. """
+        return self._depth
+
+    def height_array(self):
+        """ Return the array of heights. The array must not be modified. """
+        return self._height
+
+    def child_arrays(self):
+        """ Return the arrays first_child and next_sibling. The arrays must not be modified. """
+        return self._first_child, self._next_sibling
+
+    def save(self, path, elems=True):
+        """ Write the tree to a binary file.
+        @param path (str): Path to the output file.
+        @param elems (bool): If True store the elements. Only numbers can be stored.
+        """
+        from .tree_file import save
+        save(self, path, elems)
+
+    #---------------- public mutators ----------------#
+    def add_root(self, elem):
+        """ Place a node with the given element at the root of an empty tree.
+        Raise ValueError if the tree is not empty.
+        """
+        if self._size > 0:
+            raise ValueError("Root exists")
+        if self._mapped:
+            self._materialize()
+        return self._make_position(self._add_node(elem, -1))
+
+    def add_child(self, p, elem):
+        """ Create a new child with the given element for node at Position p.
+        @param p (Position): Position representing the node in the tree.
+        @param elem: Element to be stored at the child.
+        @return child (Position): Return Position representing the new child.
+        """
+        u = self._validate(p)
+        if self._mapped:
+            self._materialize()
+        v = self._add_node(elem, u)
+        if self._last_child[u] == -1:       # the parent was a leaf
+            self._first_child[u] = v
+            self._raise_heights(u, 1)
+        else:
+            self._next_sibling[self._last_child[u]] = v
+        self._last_child[u] = v
+        return self._make_position(v)
+
+    def replace(self, p, elem):
+        """ Replace the element at the node at Position p with the new elem. """
+        v = self._validate(p)
+        if self._mapped:
+            self._materialize()
+        old = self._elems[v]
+        self._elems[v] = elem
+        return old
+
+    def reindex(self):
+        """ The nodes are indexed in the order of insertion and the indices never change,
+        and the depths and the heights are always up to date. Nothing to be done.
+        """
+        pass
+
+    #---- private methods - should not be invoked by the user ----#
+    @classmethod
+    def _from_arrays(cls, parent, first_child, last_child, next_sibling, depth, height, elems):
+        """ Create a compact tree backed by the given arrays, e.g. views of a mapped file.
+        The arrays are not copied. If elems is None, every node stores None.
+        """
+        tree = cls()
+        tree._size = len(parent)
+        tree._parent = parent
+        tree._first_child = first_child
+        tree._last_child = last_child
+        tree._next_sibling = next_sibling
+        tree._depth = depth
+        tree._height = height
+        tree._elems = elems
+        tree._mapped = True
+        return tree
+
+    def _materialize(self):
+        """ Copy the arrays backed by a mapped file into regular arrays, so that the tree
+        can be modified.
+        """
+        self._parent = array("l", self._parent)
+        self._first_child = array("l", self._first_child)
+        self._last_child = array("l", self._last_child)
+        self._next_sibling = array("l", self._next_sibling)
+        self._depth = array("l", self._depth)
+        self._height = array("l", self._height)
+        self._elems = list(self._elems) if self._elems is not None else [None] * self._size
+        self._mapped = False
+
+    def _add_node(self, elem, parent):
+        """ Append a node to the arrays and return its index. """
+        v = self._size
+        self._parent.append(parent)
+        self._first_child.append(-1)
+        self._last_child.append(-1)
+        self._next_sibling.append(-1)
+        self._depth.append(self._depth[parent] + 1 if parent != -1 else 0)
+        self._height.append(0)
+        self._elems.append(elem)
+        self._size += 1
+        return v
+
+    def _raise_heights(self, u, height):
+        """ Walk up from node u and raise the heights of the ancestors. The walk stops at
+        the first ancestor whose height does not change.
+        """
+        parent, heights = self._parent, self._height
+        while u != -1 and heights[u] < height:
+            heights[u] = height
+            u = parent[u]
+            height += 1
+
+    def _clear_position_cache(self):
+        """ Release all cached positions. The cache is a list indexed by the nodes. """
+        self._position_cache = []
+
+    def _make_position(self, v):
+        """ Return Position instance for given node index (or None if v is -1).
+        If caching is enabled, the positions are stored in a list indexed by the nodes.
+        """
+        if v == -1:
+            return None
+        if not self._cache_positions:
+            return self.Position(self, v)
+        cache = self._position_cache
+        if len(cache) < self._size:
+            cache.extend([None] * (self._size - len(cache)))
+        p = cache[v]
+        if p is None:
+            p = cache[v] = self.Position(self, v)
+        return p
+
+    def _validate(self, p):
+        """ Return the index of the node, if Position is valid. """
+        if not isinstance(p, self.Position):
+            raise TypeError("p must be proper Position type")
+        if p._container is not self:
+            raise ValueError("p does not belong to this container")
+        return p._node
+
+
+class PositionTable(Sequence):
+    """ A read-only sequence mapping the node indices of a compact tree to positions.
+    Positions are created on demand, so no per-node objects are kept.
+    """
+    def __init__(self, tree):
+        self._tree = tree
+
+    def __len__(self):
+        return len(self._tree)
+
+    def __getitem__(self, i):
+        return self._tree.position(i)
+
+    def __setitem__(self, i, p):
+        """ Positions are derived from the indices. Storing a position is a no-op. """
+        pass
+
+#
@@ -0,0 +1,94 @@
+""" A forest is a collection of disjoint rooted trees. Indexing structures for forests
+number the nodes of all trees consecutively and keep a single flat parent array, in
+which every root has parent -1. A forest can be given either as a list of Tree objects
+or directly as a parent array.
+
+The module provides the following functions:
+    flatten_trees(trees): Number the nodes of a list of trees and build the parent array.
+    children(parents): Build compact lists of the children of all nodes.
+    preorder(parents): Traverse the forest listing every node before its children.
+"""
+
+from array import array
+
+
+def flatten_trees(trees):
+    """ Number the nodes of the trees consecutively, tree by tree. The nodes of every tree
+    keep their own indices, shifted by the number of nodes in the preceding trees.
+    @param trees (List[Tree]): A list of non-empty tree objects.
+    @return parents (array): parents[v] is the number of the parent of node v, or -1.
+    @return positions (List[Position]): positions[v] is the position of node v.
+    @return bases (Dict[int, int]): Maps id(tree) to the number of the first node of the tree.
+    """
+    parents = array("l")
+    positions = []
+    bases = {}
+    for tree in trees:
+        tree.reindex()
+        base = len(positions)
+        bases[id(tree)] = base
+        parents.extend(array("l", [-1]) * len(tree))
+        positions.extend([None] * len(tree))
+
+        stack = [tree.root()]
+        while stack:
+            p = stack.pop()
+            v = base + p.index()
+            positions[v] = p
+            for ch in tree.children(p):
+                parents[base + ch.index()] = v
+                stack.append(ch)
+    return parents, positions, bases
+
+
+def children(parents):
+    """ Build the lists of children of all nodes in compact form.
+    @param parents (List[int]): A parent array.
+    @return start (array): The children of v are kids[start[v]:start[v+1]].
+    @return kids (array): The concatenated lists of children, in increasing order.
+    """
+    n = len(parents)
+    start = array("l", [0]) * (n + 1)
+    for u in parents:
+        if u != -1:
+            start[u + 1] += 1
+    for v in range(n):
+        start[v + 1] += start[v]
+
+    kids = array("l", [0]) * start[n]
+    fill = array("l", start)
+    for v, u in enumerate(parents):
+        if u != -1:
+            kids[fill[u]] = v
+            fill[u] += 1
+    return start, kids
+
+
+def preorder(parents):
+    """ Traverse the forest in preorder using an explicit stack. The trees are visited in the
+    order of their roots. Raise ValueError if the parent array does not describe a forest.
+    @param parents (List[int]): A parent array.
+    @return order (List[int]): The nodes of the forest. Every node is listed before its children.
+    """
+    n = len(parents)
+    for u in parents:
+        if not -1 <= u < n:
+            raise ValueError("invalid parent {}".format(u))
+    start, kids = children(parents)
+
+    order = []
+    for root in range(n):
+        if parents[root] != -1:
+            continue
+        stack = [root]
+        while stack:
+            v = stack.pop()
+            order.append(v)
+            stack.extend(reversed(kids[start[v]:start[v + 1]]))
+
+    # Nodes on a cycle are not reachable from any root.
+    if len(order) != n:
+        raise ValueError("the parent array contains a cycle")
+    return order
+
+#
@@ -15,47 +15,78 @@ addition to the mutator methods supported by the positional container ADT:
     L.add_first(elem): Add a node storing elem as the first element of the list.
     L.add_last(elem): Add a node storing elem as the last element of the list.
     L.delete(p): Remove and return the element at Position p.
+    L.extend(elems): Add the elements of an iterable at the end of the list.
+    L.splice(p, first, last): Move the nodes from Position first to Position last just
+                              after Position p in O(1) time.
+    L.clear(): Remove all elements from the list.
+
+The nodes are stored in a slab: the links between the nodes are kept in the int arrays
+prev and next, and the elements in a separate list, all indexed by the slot of the node.
+Slot 0 is a sentinel node preceding the first and following the last node of the list.
+The slots of deleted nodes are chained in a free list through the next array and are
+reused by later insertions, so a list with heavy churn runs in constant memory.
+
+Every slot records the generation in which it was allocated, and every position stores
+the generation of its node. Thus positions of deleted nodes are detected even if their
+slot was reused.
 """
 
+from array import array
+
+
 from .positional_container import PositionalContainer
 
 
 class DoublyLinkedList(PositionalContainer):
-    #--------------- nested Node class ----------------#
-    class _Node:
-        """ Lightweight non-public class for storing a node. """
-        __slots__ = "_elem", "_index", "_prev", "_next"
-        def __init__(self, elem, idx, prev=None, next=None):
-            """ Initialize a _Node instance.
-            @param elem: Element stored in the node.
-            @param idx (int): Integer used to uniquely identify a Node object.
-            @param next (Node): A reference to the next node in the list.
-            @param prev (Node): A reference to the previous node in the list.
-            """
-            self._elem = elem
-            self._index = idx
-            self._prev = prev
-            self._next = next
+    #----------------- nested Position class ------------------#
+    class Position(PositionalContainer.Position):
+        """ The node of a Position in a linked list is the slot of the node. """
+        __slots__ = "_gen",
+        def __init__(self, container, node):
+            """ Initialize a Position. Constructor should not be invoked by the user. """
+            self._container = container
+            self._node = node
+            self._gen = container._gen[node]
+
+        def elem(self):
+            """ Return the elem of the node at this Position. """
+            return self._container._elems[self._node]
+
+        def index(self):
+            """ Return the index of the node at this Position. """
+            return self._container._index[self._node]
+
+        def __eq__(self, other):
+            """ Return True if other is a Position representing the same location. """
+            return (type(other) is type(self) and other._container is self._container
+                    and other._node == self._node and other._gen == self._gen)
+
+        def __hash__(self):
+            """ Return a hash consistent with equality. """
+            return hash((id(self._container), self._node, self._gen))
 
     #---------------- list initializer ----------------#
     def __init__(self):
         """ Initialize an empty linked list. """
-        self._header = self._Node(None, None, None, None)     # sentinel header node
-        self._trailer = self._Node(None, None, None, None)    # sentinel trailer node
-
-        self._header._next = self._trailer
-        self._trailer._prev = self._header
+        self._prev = array("l", [0])    # slot 0 is the sentinel node
+        self._next = array("l", [0])
+        self._gen = array("l", [0])
+        self._index = array("l", [-1])
+        self._elems = [None]
+        self._position_cache = []
+        self._free = 0                  # the first slot of the free list, or 0 if empty
+        self._next_gen = 1
         self._size = 0
         self._curr_idx = 0
 
     #---------------- public accessors ----------------#
     def first(self):
         """ Return the Position of the first element of the list or None if the list is empty. """
-        return self._make_position(self._header._next)
+        return self._make_position(self._next[0])
 
     def last(self):
         """ Return the Position of the last element of the list or None if the list is empty. """
-        return self._make_position(self._trailer._prev)
+        return self._make_position(self._prev[0])
 
     def before(self, p):
         """ Return the Position just before Position p. Return None if p is the first element.
@@ -63,7 +94,7 @@ class DoublyLinkedList(PositionalContainer):
         @return prev (Position): Position representing the previous node in the linked list.
         """
         node = self._validate(p)
-        return self._make_position(node._prev)
+        return self._make_position(self._prev[node])
 
     def after(self, p):
         """ Return the Position just after Position p. Return None if p is the last element.
@@ -71,18 +102,27 @@ class DoublyLinkedList(PositionalContainer):
         @return next (Position): Position representing the next node in the linked list.
         """
         node = self._validate(p)
-        return self._make_position(node._next)
+        return self._make_position(self._next[node])
 
     def positions(self, reverse=False):
         """ Generate a forward iteration of the Positions of the List.
         If reverse is True, generate a backward iteration starting from last.
+        The iteration stops at the sentinel node, so elements of any value are generated.
         @param reverse (bool): If True generate a backward iteration. Default is False.
         @yield cursor (Position): Position representing the node in the list.
         """
-        cursor = self.first() if not reverse else self.last()
-        while cursor.elem() is not None:
-            yield cursor
-            cursor = self.after(cursor) if not reverse else self.before(cursor)
+        links = self._prev if reverse else self._next
+        node = links[0]
+        while node != 0:
+            yield self._make_position(node)
+            node = links[node]
+
+    def __iter__(self):
+        """ Generate a forward iteration of the elements of the list. """
+        node = self._next[0]
+        while node != 0:
+            yield self._elems[node]
+            node = self._next[node]
 
     #---------------- public mutators ----------------#
     def add_before(self, elem, p):
@@ -92,12 +132,7 @@ class DoublyLinkedList(PositionalContainer):
         @return new_node (Position): Return Position representing the new node.
         """
         node = self._validate(p)
-        new_node = self._Node(elem, idx=self._curr_idx, prev=node._prev, next=node)
-        self._curr_idx += 1
-        node._prev._next = new_node
-        node._prev = new_node
-        self._size += 1
-        return self._make_position(new_node)
+        return self._make_position(self._insert_between(elem, self._prev[node], node))
 
     def add_after(self, elem, p):
         """ Add a node storing elem just after Position p.
@@ -106,30 +141,183 @@ class DoublyLinkedList(PositionalContainer):
         @return new_node (Position): Return Position representing the new node.
         """
         node = self._validate(p)
-        new_node = self._Node(elem, idx=self._curr_idx, prev=node, next=node._next)
-        self._curr_idx += 1
-        node._next._prev = new_node
-        node._next = new_node
-        self._size += 1
-        return self._make_position(new_node)
+        return self._make_position(self._insert_between(elem, node, self._next[node]))
 
     def add_first(self, elem):
         """ Add a node with storing elem as the first element of the list. """
-        return self.add_before(elem, self.first())
+        return self._make_position(self._insert_between(elem, 0, self._next[0]))
 
     def add_last(self, elem):
         """ Add a node with storing elem as the last element of the list. """
-        return self.add_after(elem, self.last())
+        return self._make_position(self._insert_between(elem, self._prev[0], 0))
 
     def delete(self, p):
-        """ Remove and return the element at Position p.
+        """ Remove and return the element at Position p. The slot of the node is added to
+        the free list.
         @param p (Position): Position representing the node in the linked list.
         @return elem: Element stored at the node.
         """
         node = self._validate(p)
-        node._prev._next = node._next
-        node._next._prev = node._prev
+        prevs, nexts = self._prev, self._next
+        prev, next = prevs[node], nexts[node]
+        nexts[prev] = next
+        prevs[next] = prev
         self._size -= 1
-        return node._elem
 
-#
\ No newline at end of file
+        elem = self._elems[node]
+        self._elems[node] = None        # release the reference to the element
+        self._gen[node] = 0             # invalidate the positions of the node
+        nexts[node] = self._free
+        self._free = node
+        return elem
+
+    def extend(self, elems):
+        """ Add the elements of an iterable at the end of the list. If the free list is empty
+        the new nodes occupy consecutive slots, and all arrays are extended in bulk.
+        @param elems (Iterable): The elements to be added.
+        """
+        if self._free != 0:
+            for elem in elems:
+                self._insert_between(elem, self._prev[0], 0)
+            return
+        elems = list(elems)
+        k = len(elems)
+        if k == 0:
+            return
+        start = len(self._elems)
+        last = self._prev[0]
+        self._prev.extend(range(start - 1, start + k - 1))
+        self._prev[start] = last
+        self._next.extend(range(start + 1, start + k + 1))
+        self._next[start + k - 1] = 0
+        self._gen.extend(range(self._next_gen, self._next_gen + k))
+        self._index.extend(range(self._curr_idx, self._curr_idx + k))
+        self._elems.extend(elems)
+        self._next[last] = start
+        self._prev[0] = start + k - 1
+        self._next_gen += k
+        self._curr_idx += k
+        self._size += k
+
+    def splice(self, p, first, last):
+        """ Move the nodes from Position first to Position last (inclusive) just after
+        Position p. The positions of the moved nodes remain valid. If p is None the nodes
+        are moved to the front of the list.
+        The node at Position last must not come before the node at Position first, and p
+        must not be one of the moved nodes. Checking these preconditions would take time
+        linear in the length of the range, so only the endpoints of the range are checked.
+        Raise ValueError if p is first or last.
+        @param p (Position): Position representing the node after which the nodes are moved.
+        @param first (Position): Position representing the first moved node.
+        @param last (Position): Position representing the last moved node.
+        """
+        target = self._validate(p) if p is not None else 0
+        a, b = self._validate(first), self._validate(last)
+        if target == a or target == b:
+            raise ValueError("p must not be one of the moved nodes")
+        if target == self._prev[a]:         # the nodes are already in place
+            return
+
+        # Unlink the range and link it after the target.
+        prev, next = self._prev[a], self._next[b]
+        self._next[prev] = next
+        self._prev[next] = prev
+        after = self._next[target]
+        self._next[target] = a
+        self._prev[a] = target
+        self._next[b] = after
+        self._prev[after] = b
+
+    def clear(self):
+        """ Remove all elements from the list and release the slab. All positions of the
+        list become invalid.
+        """
+        del self._prev[1:]
+        del self._next[1:]
+        del self._gen[1:]
+        del self._index[1:]
+        del self._elems[1:]
+        self._position_cache = []
+        self._prev[0] = self._next[0] = 0
+        self._free = 0
+        self._size = 0
+
+    def replace(self, p, elem):
+        """ Replace the element at the node at Position p with the new elem. """
+        node = self._validate(p)
+        old = self._elems[node]
+        self._elems[node] = elem
+        return old
+
+    def reindex(self):
+        """ Assign consecutive indices to the nodes in the order of the list. """
+        curr_idx = 0
+        node = self._next[0]
+        while node != 0:
+            self._index[node] = curr_idx
+            curr_idx += 1
+            node = self._next[node]
+        self._curr_idx = curr_idx
+        return curr_idx
+
+    #---- private methods - should not be invoked by the user ----#
+    def _insert_between(self, elem, prev, next):
+        """ Store elem in a free slot and link it between the nodes prev and next.
+        Return the slot of the new node.
+        """
+        prevs, nexts = self._prev, self._next
+        node = self._free
+        if node != 0:
+            self._free = nexts[node]
+            self._elems[node] = elem
+            self._index[node] = self._curr_idx
+            self._gen[node] = self._next_gen
+            prevs[node] = prev
+            nexts[node] = next
+        else:
+            node = len(self._elems)
+            self._elems.append(elem)
+            self._index.append(self._curr_idx)
+            self._gen.append(self._next_gen)
+            prevs.append(prev)
+            nexts.append(next)
+        self._curr_idx += 1
+        self._next_gen += 1
+        nexts[prev] = node
+        prevs[next] = node
+        self._size += 1
+        return node
+
+    def _clear_position_cache(self):
+        """ Release all cached positions. The cache is a list indexed by the slots. """
+        self._position_cache = []
+
+    def _make_position(self, node):
+        """ Return Position instance for given slot (or None for the sentinel).
+        If caching is enabled, the positions are stored in a list indexed by the slots. A
+        cached position is replaced once its slot is reused.
+        """
+        if node == 0:
+            return None
+        if not self._cache_positions:
+            return self.Position(self, node)
+        cache = self._position_cache
+        if len(cache) < len(self._elems):
+            cache.extend([None] * (len(self._elems) - len(cache)))
+        p = cache[node]
+        if p is None or p._gen != self._gen[node]:
+            p = cache[node] = self.Position(self, node)
+        return p
+
+    def _validate(self, p):
+        """ Return the slot of the node, if Position is valid. """
+        if not isinstance(p, self.Position):
+            raise TypeError("p must be proper Position type")
+        if p._container is not self:
+            raise ValueError("p does not belong to this container")
+        node = p._node
+        if node >= len(self._gen) or self._gen[node] != p._gen:
+            raise ValueError("p is no longer valid")
+        return node
+
+#
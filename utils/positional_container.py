@@ -3,6 +3,8 @@ of *position* as an abstraction for a node of a container.
 The position object supports the methods:
     p.elem(): Return the element stored at the node at Position p.
     p.index(): Return the index of the node at Position p.
+Positions are hashable, two positions representing the same location are equal and
+have equal hashes. Thus positions can be used as dictionary keys and set members.
 
 The PositionalContainer ADT supports the following accessor methods:
     C.positions(): Generate an iteration of all positions of the container C.
@@ -13,8 +15,20 @@ The PositionalContainer ADT supports the following accessor methods:
 The PositionalContainer ADT also supports the following mutator method:
     C.replace(p, elem): Replace the element at the node at Position p with the new elem.
     C.reindex(): Traverse the container and assign a unique index to each node.
+    C.cache_positions(enable): Return the same Position object for a node every time.
+
+By default every accessor creates a new Position object. If caching is enabled, the
+Position of a node is created once and stored in a dictionary keyed by the node, so that
+repeated calls of the accessors do not allocate new objects. The dictionary exists only
+while caching is enabled, so the nodes themselves carry no extra field for it.
+
+A NodeTable maps the node indices of a container to positions. It stores only references
+to the nodes and creates the positions on demand, so an index structure can translate
+node indices back to positions without keeping a Position object for every node.
 """
 
+from collections.abc import Sequence
+
 
 class PositionalContainer:
     #---------------- nested Node class ----------------------#
@@ -31,6 +45,7 @@ class PositionalContainer:
 
     #----------------- nested Position class ------------------#
     class Position:
+        __slots__ = "_container", "_node"
         def __init__(self, container, node):
             """ Initialize a Position. Constructor should not be invoked
             by the user.
@@ -56,6 +71,10 @@ class PositionalContainer:
             """
             return type(other) is type(self) and other._node is self._node
 
+        def __hash__(self):
+            """ Return a hash consistent with equality: positions of the same node are equal. """
+            return hash(self._node)
+
         def __ne__(self, other):
             """ Return True if other Position does not represent the same location.
             @param other (Position): Position representing a node in the container.
@@ -63,6 +82,10 @@ class PositionalContainer:
             """
             return not (self == other)
 
+    # Positions are not cached unless enabled by cache_positions().
+    _cache_positions = False
+    _node_positions = None      # node -> cached Position, only while caching is enabled
+
     #------------- container initializer --------------#
     def __init__(self):
         """ Initialize an empty container. """
@@ -98,6 +121,19 @@ class PositionalContainer:
         node._elem = elem
         return old
 
+    def cache_positions(self, enable=True):
+        """ Enable or disable caching of one Position per node. While caching is enabled,
+        the accessors return the same Position object for a node on every call.
+        Disabling the cache releases all cached positions. Enabling it again keeps them.
+        @param enable (bool): If True enable caching, otherwise disable it.
+        @return enabled (bool): True if caching was enabled before the call.
+        """
+        enabled = self._cache_positions
+        if enable != enabled:
+            self._cache_positions = enable
+            self._clear_position_cache()
+        return enabled
+
     def reindex(self):
         """ Traverse the container and assign a unique index to each node. """
         curr_idx = 0
@@ -107,9 +143,22 @@ class PositionalContainer:
         return curr_idx
 
     #---- private methods - should not be invoked by the user ----#
+    def _clear_position_cache(self):
+        """ Release all cached positions, and create an empty cache if caching is enabled. """
+        self._node_positions = {} if self._cache_positions else None
+
     def _make_position(self, node):
-        """ Return Position instance for given node (or None if no node). """
-        return self.Position(self, node) if node is not None else None
+        """ Return Position instance for given node (or None if no node).
+        If caching is enabled, return the Position cached for the node.
+        """
+        if node is None:
+            return None
+        if not self._cache_positions:
+            return self.Position(self, node)
+        p = self._node_positions.get(node)
+        if p is None:
+            p = self._node_positions[node] = self.Position(self, node)
+        return p
 
     def _validate(self, p):
         """ Return associated node, if Position is valid. """
@@ -119,4 +168,32 @@ class PositionalContainer:
             raise ValueError("p does not belong to this container")
         return p._node
 
+
+
+class NodeTable(Sequence):
+    """ A sequence mapping node indices to the positions of the nodes of a container.
+    Only the nodes are stored, and positions are created on demand.
+    """
+    def __init__(self, container, size=0):
+        """ Initialize a table with *size* empty entries.
+        @param container (PositionalContainer): The container to which the nodes belong.
+        @param size (int): The initial number of entries.
+        """
+        self._container = container
+        self._nodes = [None] * size
+
+    def __len__(self):
+        return len(self._nodes)
+
+    def __getitem__(self, i):
+        return self._container._make_position(self._nodes[i])
+
+    def __setitem__(self, i, p):
+        """ Store the node at Position p at index i. """
+        self._nodes[i] = p._node if p is not None else None
+
+    def extend(self, positions):
+        """ Append the nodes at the given positions. An entry None stays empty. """
+        self._nodes.extend(p._node if p is not None else None for p in positions)
+
 #
\ No newline at end of file
@@ -1,44 +1,90 @@
 """ A queue is a collection of objects that are inserted and removed
 according to the first-in, first-out (FIFO) principle.
 The queue data structure supports the following accessor methods:
-    Q.front(): Return the element at the front of the queue Q.
+    Q.first(): Return the element at the front of the queue Q.
     Q.is_empty(): Return True if the queue Q is empty.
     len(Q): Return the total number of elements in the queue Q.
 
 The queue data structure supports the following mutator methods:
     Q.enqueue(elem): Add an element to the back of the queue Q.
     Q.dequeue(): Remove and return the first element from the queue Q.
+
+The elements are stored in a circular buffer. The buffer is a list, or an array of
+the given typecode for elements of a primitive type, e.g. "l" for ints. The buffer can
+be preallocated for the expected number of elements. When the buffer is full its
+capacity is doubled, and the elements are moved to the start of the new buffer.
 """
 
-from .linked_list import DoublyLinkedList
+from array import array
 
 
 class Queue:
     #--------------- queue initializer ----------------#
-    def __init__(self):
-        """ Initialize an empty queue. """
-        self._container = DoublyLinkedList()
+    def __init__(self, capacity=16, typecode=None):
+        """ Initialize an empty queue.
+        @param capacity (int): The number of elements for which the buffer is preallocated.
+        @param typecode (str): If given, the elements are stored in an array of this typecode.
+        """
+        self._typecode = typecode
+        self._data = self._allocate(max(capacity, 1))
+        self._front = 0
+        self._size = 0
 
     #---------------- public accessors ----------------#
     def first(self):
-        """ Return the element at the front of the queue. """
-        return self._container.first().elem()
+        """ Return the element at the front of the queue, or None if the queue is empty. """
+        if self._size == 0:
+            return None
+        return self._data[self._front]
 
     def is_empty(self):
         """ Return True if the queue is empty. """
-        return self._container.is_empty()
+        return self._size == 0
 
     def __len__(self):
         """ Return the total number of elements in the queue. """
-        return len(self._container)
+        return self._size
 
     #---------------- public mutators ----------------#
     def enqueue(self, elem):
         """ Add an element to the back of the queue. """
-        self._container.add_last(elem)
+        if self._size == len(self._data):
+            self._resize(2 * len(self._data))
+        back = self._front + self._size
+        if back >= len(self._data):
+            back -= len(self._data)
+        self._data[back] = elem
+        self._size += 1
 
     def dequeue(self):
-        """ Remove and return the first element from the queue. """
-        return self._container.delete(self._container.first())
+        """ Remove and return the first element from the queue.
+        Raise IndexError if the queue is empty.
+        """
+        if self._size == 0:
+            raise IndexError("dequeue from empty queue")
+        elem = self._data[self._front]
+        if self._typecode is None:
+            self._data[self._front] = None      # release the reference to the element
+        self._front += 1
+        if self._front == len(self._data):
+            self._front = 0
+        self._size -= 1
+        return elem
+
+    #---- private methods - should not be invoked by the user ----#
+    def _allocate(self, capacity):
+        """ Return a new buffer for the given number of elements. """
+        if self._typecode is None:
+            return [None] * capacity
+        return array(self._typecode, [0]) * capacity
+
+    def _resize(self, capacity):
+        """ Move the elements to the start of a new buffer with the given capacity. """
+        data = self._allocate(capacity)
+        end = min(self._front + self._size, len(self._data))
+        data[:end - self._front] = self._data[self._front:end]
+        data[end - self._front:self._size] = self._data[:self._size - (end - self._front)]
+        self._data = data
+        self._front = 0
 
-#
\ No newline at end of file
+#
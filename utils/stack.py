@@ -8,37 +8,61 @@ The stack data structure supports the following accessor methods:
 The stack data structure supports the following mutator methods:
     S.push(elem): Add an element to the top of the stack S.
     S.pop(): Remove and return the top element from the stack S.
+
+The elements are stored in a contiguous buffer. The buffer is a list, or an array of
+the given typecode for elements of a primitive type, e.g. "l" for ints. The buffer can
+be preallocated for the expected number of elements. It grows on demand and never
+shrinks, so a stack that was filled once does not allocate again.
 """
 
-from .linked_list import DoublyLinkedList
+from array import array
 
 
 class Stack:
     #--------------- stack initializer ----------------#
-    def __init__(self):
-        """ Initialize an empty stack. """
-        self._container = DoublyLinkedList()
+    def __init__(self, capacity=0, typecode=None):
+        """ Initialize an empty stack.
+        @param capacity (int): The number of elements for which the buffer is preallocated.
+        @param typecode (str): If given, the elements are stored in an array of this typecode.
+        """
+        self._typed = typecode is not None
+        self._data = array(typecode, [0]) * capacity if self._typed else [None] * capacity
+        self._size = 0
 
     #---------------- public accessors ----------------#
     def top(self):
-        """ Return the element at the top of the stack. """
-        return self._container.last().elem()
+        """ Return the element at the top of the stack, or None if the stack is empty. """
+        if self._size == 0:
+            return None
+        return self._data[self._size - 1]
 
     def is_empty(self):
         """ Return True if the stack is empty. """
-        return self._container.is_empty()
+        return self._size == 0
 
     def __len__(self):
         """ Return the total number of elements in the stack. """
-        return len(self._container)
+        return self._size
 
     #---------------- public mutators ----------------#
     def push(self, elem):
         """ Add an element to the top of the stack. """
-        self._container.add_last(elem)
+        if self._size == len(self._data):
+            self._data.append(elem)
+        else:
+            self._data[self._size] = elem
+        self._size += 1
 
     def pop(self):
-        """ Remove and return the top element from the stack. """
-        return self._container.delete(self._container.last())
+        """ Remove and return the top element from the stack.
+        Raise IndexError if the stack is empty.
+        """
+        if self._size == 0:
+            raise IndexError("pop from empty stack")
+        self._size -= 1
+        elem = self._data[self._size]
+        if not self._typed:
+            self._data[self._size] = None       # release the reference to the element
+        return elem
 
-#
\ No newline at end of file
+#
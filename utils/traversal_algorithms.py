@@ -1,46 +1,232 @@
+""" Traversal algorithms for tree objects. All traversals use an explicit stack or queue,
+so visiting a node costs O(1) regardless of its depth and deep trees do not exhaust
+the recursion limit. Every traversal can start at any node and visit only its subtree.
+    preorder(tree, p): Generate the positions of the subtree of p in preorder.
+    postorder(tree, p): Generate the positions of the subtree of p in postorder.
+    euler_tour(tree, p): Generate the Euler tour of the subtree of p. Every node is
+                         visited when the traversal enters it and after every child.
+    level_order(tree, p): Generate the positions of the subtree of p level by level.
+
+Every traversal also has a bulk variant returning the indices of the visited nodes as an
+array of ints in one call, e.g. preorder_indices(tree, p). For compact trees the bulk
+variants walk the child arrays directly and do not create any positions. The bulk
+variants of other trees require the indices of the nodes to be computed.
+"""
+
+from array import array
+from collections import deque
+
+
 from .binary_tree import BinaryTree
+from .compact_tree import CompactTree
 from .stack import Stack
-from .queue import Queue
 
 
-def breadth_first_traversal(tree):
-    """ Breath-first traversal of a tree object.
+def preorder(tree, p=None):
+    """ Preorder traversal of a tree object. The stack stores the iterators over the
+    remaining children of the nodes on the path from p, so no lists are allocated.
     @param tree (Tree): A Tree object.
+    @param p (Position): Position of the root of the traversed subtree. Default is the root.
     @yield node (Position): Position representing a node in the tree.
     """
-    if tree.is_empty():
-        return None
+    p = tree.root() if p is None else p
+    if p is None:
+        return
+    yield p
+    stack = [tree.children(p)]
+    while stack:
+        ch = next(stack[-1], None)
+        if ch is None:
+            stack.pop()
+        else:
+            yield ch
+            stack.append(tree.children(ch))
 
-    frontier = Queue()
-    frontier.enqueue(tree.root())
-    while not frontier.is_empty():
-        node = frontier.dequeue()
-        yield node
 
-        for child in tree.children(node):
-            frontier.enqueue(child)
+def postorder(tree, p=None):
+    """ Postorder traversal of a tree object. The stack stores the nodes on the path from p
+    together with the iterators over their remaining children.
+    @param tree (Tree): A Tree object.
+    @param p (Position): Position of the root of the traversed subtree. Default is the root.
+    @yield node (Position): Position representing a node in the tree.
+    """
+    p = tree.root() if p is None else p
+    if p is None:
+        return
+    stack = [(p, tree.children(p))]
+    while stack:
+        ch = next(stack[-1][1], None)
+        if ch is None:
+            yield stack.pop()[0]
+        else:
+            stack.append((ch, tree.children(ch)))
 
 
-def depth_first_traversal(tree):
-    """ Depth-first traversal of a tree object.
+def euler_tour(tree, p=None):
+    """ Euler tour of a tree object. A node with c children is visited c+1 times, so the
+    tour of a subtree with n nodes has 2n-1 visits.
+    @param tree (Tree): A Tree object.
+    @param p (Position): Position of the root of the traversed subtree. Default is the root.
+    @yield node (Position): Position representing a node in the tree.
+    """
+    p = tree.root() if p is None else p
+    if p is None:
+        return
+    yield p
+    stack = [(p, tree.children(p))]
+    while stack:
+        ch = next(stack[-1][1], None)
+        if ch is None:
+            stack.pop()
+            if stack:
+                yield stack[-1][0]
+        else:
+            yield ch
+            stack.append((ch, tree.children(ch)))
+
+
+def level_order(tree, p=None):
+    """ Level-order traversal of a tree object.
     @param tree (Tree): A Tree object.
+    @param p (Position): Position of the root of the traversed subtree. Default is the root.
     @yield node (Position): Position representing a node in the tree.
     """
-    if tree.is_empty():
-        return None
+    p = tree.root() if p is None else p
+    if p is None:
+        return
+    frontier = deque([p])
+    while frontier:
+        p = frontier.popleft()
+        yield p
+        frontier.extend(tree.children(p))
+
+
+def preorder_indices(tree, p=None):
+    """ Return the indices of the nodes of the subtree of p in preorder.
+    A compact tree is walked along the child and sibling links without a stack: after
+    a node without children the walk climbs up to the first ancestor with a next sibling.
+    @param tree (Tree): A Tree object.
+    @param p (Position): Position of the root of the traversed subtree. Default is the root.
+    @return order (array): The indices of the nodes.
+    """
+    if not isinstance(tree, CompactTree):
+        return array("l", [q.index() for q in preorder(tree, p)])
+    order = array("l")
+    r = _root_index(tree, p)
+    if r == -1:
+        return order
+    first_child, next_sibling = tree.child_arrays()
+    parent = tree.parent_array()
+    v = r
+    while True:
+        order.append(v)
+        if first_child[v] != -1:
+            v = first_child[v]
+            continue
+        while v != r and next_sibling[v] == -1:
+            v = parent[v]
+        if v == r:
+            return order
+        v = next_sibling[v]
+
+
+def postorder_indices(tree, p=None):
+    """ Return the indices of the nodes of the subtree of p in postorder.
+    A compact tree is walked along the child and sibling links without a stack.
+    @param tree (Tree): A Tree object.
+    @param p (Position): Position of the root of the traversed subtree. Default is the root.
+    @return order (array): The indices of the nodes.
+    """
+    if not isinstance(tree, CompactTree):
+        return array("l", [q.index() for q in postorder(tree, p)])
+    order = array("l")
+    r = _root_index(tree, p)
+    if r == -1:
+        return order
+    first_child, next_sibling = tree.child_arrays()
+    parent = tree.parent_array()
+    v = r
+    while True:
+        while first_child[v] != -1:                 # descend to the first leaf
+            v = first_child[v]
+        order.append(v)
+        while v != r and next_sibling[v] == -1:     # all children of the parent are done
+            v = parent[v]
+            order.append(v)
+        if v == r:
+            return order
+        v = next_sibling[v]
+
+
+def euler_tour_indices(tree, p=None):
+    """ Return the indices of the nodes visited by the Euler tour of the subtree of p.
+    A compact tree is walked along the child and sibling links without a stack.
+    @param tree (Tree): A Tree object.
+    @param p (Position): Position of the root of the traversed subtree. Default is the root.
+    @return visits (array): The indices of the visited nodes.
+    """
+    if not isinstance(tree, CompactTree):
+        return array("l", [q.index() for q in euler_tour(tree, p)])
+    visits = array("l")
+    r = _root_index(tree, p)
+    if r == -1:
+        return visits
+    first_child, next_sibling = tree.child_arrays()
+    parent = tree.parent_array()
+    v = r
+    while True:
+        visits.append(v)
+        if first_child[v] != -1:
+            v = first_child[v]
+            continue
+        while v != r and next_sibling[v] == -1:
+            v = parent[v]
+            visits.append(v)
+        if v == r:
+            return visits
+        visits.append(parent[v])
+        v = next_sibling[v]
+
+
+def level_order_indices(tree, p=None):
+    """ Return the indices of the nodes of the subtree of p level by level.
+    The returned array itself serves as the queue of the traversal.
+    @param tree (Tree): A Tree object.
+    @param p (Position): Position of the root of the traversed subtree. Default is the root.
+    @return order (array): The indices of the nodes.
+    """
+    if not isinstance(tree, CompactTree):
+        return array("l", [q.index() for q in level_order(tree, p)])
+    order = array("l")
+    r = _root_index(tree, p)
+    if r == -1:
+        return order
+    first_child, next_sibling = tree.child_arrays()
+    order.append(r)
+    i = 0
+    while i < len(order):
+        ch = first_child[order[i]]
+        while ch != -1:
+            order.append(ch)
+            ch = next_sibling[ch]
+        i += 1
+    return order
+
 
-    def dfs(node):
-        """ Recursive procedure for visiting the nodes of a tree object. """
-        # Yield the node.
-        yield node
+def breadth_first_traversal(tree):
+    """ Breath-first traversal of a tree object.
+    @param tree (Tree): A Tree object.
+    @yield node (Position): Position representing a node in the tree.
+    """
+    return level_order(tree)
 
-        # Recursively call the procedure for every child.
-        for child in tree.children(node):
-            for node in dfs(child):
-                yield node
 
-    for node in dfs(tree.root()):
-        yield node
+def depth_first_traversal(tree):
+    """ Depth-first traversal of a tree object.
+    @param tree (Tree): A Tree object.
+    @yield node (Position): Position representing a node in the tree.
+    """
+    return preorder(tree)
 
 
 def build_cartesian_tree(arr):
@@ -56,7 +242,7 @@ def build_cartesian_tree(arr):
     T = BinaryTree()
 
     # Maintaining a stack of the nodes in the right spine.
-    S = Stack()
+    S = Stack(capacity=len(arr))
     last_pop = None
 
     # Iterate through the array and insert the new nodes. Store the position of the Node.
@@ -80,4 +266,12 @@ def build_cartesian_tree(arr):
 
     return T, pos_index
 
+
+#---- private functions - should not be invoked by the user ----#
+def _root_index(tree, p):
+    """ Return the index of the root of the traversed subtree, or -1 if the tree is empty. """
+    if p is not None:
+        return p.index()
+    return 0 if len(tree) > 0 else -1
+
 #
\ No newline at end of file
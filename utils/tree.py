@@ -18,8 +18,30 @@ to the mutator methods supported by the positional container ADT:
     T.add_child(p, elem): Create a new child with the given element for node at Position p.
     T.insert(p, elem): Insert a new node at Position p. Attach the subtree rooted at the
                        existing node as a child of the new node.
+    T.save(path, elems): Write the tree to a binary file, see the module tree_file.
+
+A tree can also be built in bulk by one of the classmethods:
+    Tree.from_parent_array(parents, elems): Build the tree described by a parent array.
+    Tree.from_edges(edges, root, elems): Build the tree described by a list of edges.
+    Tree.from_parentheses(bits): Build the tree described by a balanced parentheses sequence.
+    Tree.load(path, mmap): Load a tree written by save as a compact tree.
+The bulk constructors create all nodes in a single linear pass without calling the
+mutator methods, and compute the depths and the heights during construction.
+
+The depths and the heights of the nodes are computed by `reindex`. Once computed they
+are maintained by the mutator methods. A new leaf gets the depth of its parent plus one.
+Inserting a node above Position p shifts the depths of the whole subtree of p by one.
+The subtree is recorded as a dirty region and the shifts of all dirty regions are
+applied together on the next depth query.
+After adding a leaf or inserting a node the heights of the ancestors are raised walking
+up the tree, and the walk stops at the first ancestor whose height does not change.
 """
 
+import operator
+from array import array
+
+
+from . import forest, tree_file
 from .positional_container import PositionalContainer
 
 
@@ -50,6 +72,123 @@ class Tree(PositionalContainer):
         self._size = 0
         self._curr_idx = 0
         self._depths, self._heights = None, None
+        self._dirty = {}        # subtree root node -> pending shift of the depths
+
+    @classmethod
+    def from_parent_array(cls, parents, elems=None):
+        """ Build the tree described by a parent array. Node v of the parent array becomes
+        the node with index v, and the children of every node are ordered by their indices.
+        Raise ValueError if the parent array does not describe a tree.
+        @param parents (List[int]): parents[v] is the parent of node v, or -1 if v is the root.
+        @param elems (List): elems[v] is the element stored at node v. If None, node v stores v.
+        @return tree (Tree): A tree object with computed depths and heights.
+        """
+        n = len(parents)
+        if n > 0 and (min(parents) < -1 or max(parents) >= n):
+            u = next(u for u in parents if not -1 <= u < n)
+            raise ValueError("invalid parent {}".format(u))
+        if sum(1 for u in parents if u == -1) != 1:
+            raise ValueError("the parent array must contain exactly one root")
+
+        # If the root is the first node and every parent comes before its children, the
+        # nodes are already in a valid order, and the traversal of the tree is skipped.
+        if parents[0] == -1 and all(map(operator.lt, parents, range(n))):
+            order = range(len(parents))
+        else:
+            order = forest.preorder(parents)
+        return cls._from_parents(parents, order, elems)
+
+    @classmethod
+    def from_edges(cls, edges, root=0, elems=None):
+        """ Build the tree described by a list of undirected edges between the nodes
+        0, 1, ..., n-1, where n is the number of edges plus one. The edges are oriented
+        away from the root by a depth-first traversal using an explicit stack.
+        Raise ValueError if the edges do not describe a tree.
+        @param edges (List[Tuple[int, int]]): A list of edges (u, v).
+        @param root (int): The node at the root of the tree.
+        @param elems (List): elems[v] is the element stored at node v. If None, node v stores v.
+        @return tree (Tree): A tree object with computed depths and heights.
+        """
+        n = len(edges) + 1
+        if not 0 <= root < n:
+            raise ValueError("invalid root {}".format(root))
+
+        # Build compact adjacency lists.
+        start = array("l", [0]) * (n + 1)
+        for u, v in edges:
+            if not (0 <= u < n and 0 <= v < n):
+                raise ValueError("invalid edge ({}, {})".format(u, v))
+            start[u + 1] += 1
+            start[v + 1] += 1
+        for v in range(n):
+            start[v + 1] += start[v]
+        adjacent = array("l", [0]) * start[n]
+        fill = array("l", start)
+        for u, v in edges:
+            adjacent[fill[u]] = v
+            fill[u] += 1
+            adjacent[fill[v]] = u
+            fill[v] += 1
+
+        parents = array("l", [-2]) * n
+        parents[root] = -1
+        order = []
+        stack = [root]
+        while stack:
+            u = stack.pop()
+            order.append(u)
+            for i in range(start[u + 1] - 1, start[u] - 1, -1):
+                v = adjacent[i]
+                if v != parents[u]:
+                    if parents[v] != -2:
+                        raise ValueError("the edges contain a cycle")
+                    parents[v] = u
+                    stack.append(v)
+
+        # A graph with n-1 edges and no cycles is connected, unless an edge is repeated.
+        if len(order) != n:
+            raise ValueError("the edges do not connect all nodes")
+        return cls._from_parents(parents, order, elems)
+
+    @classmethod
+    def from_parentheses(cls, bits):
+        """ Build the tree described by a balanced parentheses sequence. Every node is
+        encoded by an opening parenthesis, followed by the encodings of its children and a
+        closing parenthesis. The nodes are indexed in preorder and node v stores v.
+        Raise ValueError if the sequence does not describe a tree.
+        @param bits (Iterable): A string of "(" and ")", or a sequence of 1s (opening) and
+                                0s (closing).
+        @return tree (Tree): A tree object with computed depths and heights.
+        """
+        parents = array("l")
+        stack = []
+        closed = False
+        for b in bits:
+            if b == "(" or b == 1:
+                if closed:
+                    raise ValueError("the sequence describes more than one tree")
+                parents.append(stack[-1] if stack else -1)
+                stack.append(len(parents) - 1)
+            elif b == ")" or b == 0:
+                if not stack:
+                    raise ValueError("unbalanced parentheses")
+                stack.pop()
+                closed = not stack
+            else:
+                raise ValueError("invalid symbol {!r}".format(b))
+        if stack or not parents:
+            raise ValueError("unbalanced parentheses")
+        return cls._from_parents(parents, range(len(parents)), None)
+
+    @staticmethod
+    def load(path, mmap=True):
+        """ Load a tree from a file written by save. The tree is returned as a compact tree
+        backed by the mapped file, so no node objects are created.
+        @param path (str): Path to the input file.
+        @param mmap (bool): If True map the file into memory, otherwise read it.
+        @return tree (CompactTree): A compact tree with the same structure and elements.
+        """
+        return tree_file.load(path, mmap)
 
     #---------------- public accessors ----------------#
     def root(self):
@@ -89,6 +228,8 @@ class Tree(PositionalContainer):
         """
         if self._depths is None:
             return None
+        if self._dirty:
+            self._shift_dirty_regions()
         return self._depths[p.index()]
 
     def height(self, p):
@@ -110,15 +251,24 @@ class Tree(PositionalContainer):
         return self.num_children(p) == 0
 
     def positions(self):
-        """ Generate an iteration of all positions of the tree.
+        """ Generate an iteration of all positions of the tree in preorder.
+        The traversal uses an explicit stack, so deep trees do not exhaust the recursion limit.
         @yield p (Position): Position representing the node in the tree.
         """
-        def expand(p):
-            yield p
-            for ch in self.children(p):
-                for _c in expand(ch):
-                    yield _c
-        return expand(self.root())
+        if self._root is None:
+            return
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            yield self._make_position(node)
+            stack.extend(reversed(self._child_nodes(node)))
+
+    def save(self, path, elems=True):
+        """ Write the tree to a binary file. The tree is reindexed before it is written.
+        @param path (str): Path to the output file.
+        @param elems (bool): If True store the elements. Only numbers can be stored.
+        """
+        tree_file.save(self, path, elems)
 
     #---------------- public mutators ----------------#
     def add_root(self, elem):
@@ -133,6 +283,7 @@ class Tree(PositionalContainer):
         self._size = 1
         self._curr_idx = 1
         self._depths, self._heights = None, None
+        self._dirty = {}
         return self._make_position(self._root)
 
     def add_child(self, p, elem):
@@ -147,14 +298,14 @@ class Tree(PositionalContainer):
         node._children.append(child)
         self._size += 1
 
-        # Invalidate depths and heights after modifying the tree.
-        self._depths, self._heights = None, None
+        # Update the depths and the heights after modifying the tree.
+        self._add_leaf_depth_height(child)
         return self._make_position(child)
 
     def insert(self, p, elem):
         """ Insert a new node at Position p. Attach the subtree rooted at the existing
-        node as a child of the new node. Note that the depths and the heights of the nodes
-        must be recomputed after executing the method `insert`.
+        node as a child of the new node. The depths of the nodes in the subtree are
+        shifted lazily, see the module docstring.
         @param p (Position): Position representing the node in the tree.
         @param elem: Element to be stored at the new node.
         @return new_p (Position): Return Position representing the new node.
@@ -162,42 +313,159 @@ class Tree(PositionalContainer):
         node = self._validate(p)
         new_node = self._Node(elem, idx=self._curr_idx, parent=node._parent)
         self._curr_idx += 1
+        if node._parent is None:
+            self._root = new_node
+        else:
+            siblings = node._parent._children
+            siblings[siblings.index(node)] = new_node
         node._parent = new_node
         new_node._children.append(node)
         self._size += 1
 
-        # Invalidate depths and heights after modifying the tree.
-        self._depths, self._heights = None, None
+        # Update the depths and the heights after modifying the tree.
+        self._insert_depth_height(new_node, node)
         return self._make_position(new_node)
 
     def reindex(self):
-        """ Traverse the tree and assign a unique index to each node. Compute the depths
-        and the heights of all nodes and store them in dictionaries.
+        """ Traverse the tree in preorder and assign a unique index to each node. Compute
+        the depths and the heights of all nodes and store them in arrays indexed by the
+        node indices. The depths are computed during the traversal, and the heights are
+        computed in reverse preorder, since every node comes after its parent.
         """
-        super().reindex()
-        self._depths, self._heights = None, None
-        for p in self.positions():
-            self._compute_depth(p)
-            self._compute_height(p)
+        n = self._size
+        parents = array("l", [-1]) * n
+        depths = array("l", [0]) * n
+        heights = array("l", [0]) * n
+        self._depths, self._heights = depths, heights
+        self._curr_idx = n
+        self._dirty = {}
+        if self._root is None:
+            return
+
+        # Every node below the root is indexed after its parent, so the index of the parent
+        # is read from the parent node and the stack stores only the nodes.
+        child_nodes = self._child_nodes
+        self._root._index = 0
+        stack = list(reversed(child_nodes(self._root)))
+        pop, push, extend = stack.pop, stack.append, stack.extend
+        v = 1
+        while stack:
+            node = pop()
+            node._index = v
+            u = node._parent._index
+            parents[v] = u
+            depths[v] = depths[u] + 1
+            children = child_nodes(node)
+            if len(children) == 1:          # a single child is pushed without an iterator
+                push(children[0])
+            elif children:
+                extend(reversed(children))
+            v += 1
+
+        # The heights of the nodes are final when they are reached in reverse preorder.
+        for u, h in zip(reversed(parents[1:]), reversed(heights)):
+            if heights[u] <= h:
+                heights[u] = h + 1
 
     #---- private methods - should not be invoked by the user ----#
-    def _compute_depth(self, p):
-        if self._depths is None:
-            self._depths = {self.root().index() : 0}
-        if p.index() not in self._depths:
-            depth = 1 + self._compute_depth(self.parent(p))
-            self._depths[p.index()] = depth
-        return self._depths[p.index()]
+    # Return the list of the children nodes of the node. The getter is implemented in C,
+    # so the traversals do not make a Python call for every node.
+    _child_nodes = staticmethod(operator.attrgetter("_children"))
 
-    def _compute_height(self, p):
-        if self._heights is None:
-            self._heights = {}
-        if p.index() not in self._heights:
-            if self.is_leaf(p):
-                height = 0
+    @classmethod
+    def _from_parents(cls, parents, order, elems):
+        """ Create the nodes of a tree described by a parent array and link them.
+        @param parents (List[int]): A valid parent array with a single root.
+        @param order (List[int]): The nodes of the tree. Every node is listed before its children.
+        @param elems (List): elems[v] is the element stored at node v. If None, node v stores v.
+        @return tree (Tree): A tree object with computed depths and heights.
+        """
+        n = len(parents)
+        if elems is None:
+            elems = range(n)
+        elif len(elems) != n:
+            raise ValueError("the number of elements must match the number of nodes")
+        Node = cls._Node
+        nodes = [Node(elem, v) for v, elem in enumerate(elems)]
+        cls._link_child_nodes(nodes, parents)
+
+        # Compute the depths in the given order and the heights in reverse order.
+        depths = array("l", [0]) * n
+        heights = array("l", [0]) * n
+        root = None
+        for v in order:
+            u = parents[v]
+            if u == -1:
+                root = nodes[v]
             else:
-                height = 1 + max(self._compute_height(ch) for ch in self.children(p))
-            self._heights[p.index()] = height
-        return self._heights[p.index()]
+                depths[v] = depths[u] + 1
+        for v in reversed(order):
+            u = parents[v]
+            if u != -1 and heights[u] <= heights[v]:
+                heights[u] = heights[v] + 1
+
+        tree = cls()
+        tree._root = root
+        tree._size = n
+        tree._curr_idx = n
+        tree._depths, tree._heights = depths, heights
+        return tree
+
+    @staticmethod
+    def _link_child_nodes(nodes, parents):
+        """ Link every node to its parent. The children of every node are ordered by their indices. """
+        for v, u in enumerate(parents):
+            if u != -1:
+                child, parent = nodes[v], nodes[u]
+                child._parent = parent
+                parent._children.append(child)
+
+    def _add_leaf_depth_height(self, leaf):
+        """ Compute the depth of a new leaf and raise the heights of its ancestors.
+        Nothing is maintained if the depths and the heights are not computed.
+        """
+        if self._depths is None:
+            return
+        self._depths.append(self._depths[leaf._parent._index] + 1)
+        self._heights.append(0)
+        self._raise_heights(leaf._parent, 1)
+
+    def _insert_depth_height(self, new_node, node):
+        """ The new node takes the place of the node in the tree and the subtree of the
+        node moves one level down. The shift of the subtree is recorded as a dirty region.
+        The depths stored inside dirty regions do not include the pending shifts.
+        """
+        if self._depths is None:
+            return
+        shift = self._dirty.get(node, 0)
+        self._depths.append(self._depths[node._index] + shift)
+        self._heights.append(self._heights[node._index] + 1)
+        self._dirty[node] = shift + 1
+        self._raise_heights(new_node._parent, self._heights[new_node._index] + 1)
+
+    def _raise_heights(self, node, height):
+        """ Walk up from the node and raise the heights of the ancestors. The walk stops
+        at the first ancestor whose height does not change, so it only visits the nodes
+        whose heights are raised.
+        """
+        heights = self._heights
+        while node is not None and heights[node._index] < height:
+            heights[node._index] = height
+            node = node._parent
+            height += 1
+
+    def _shift_dirty_regions(self):
+        """ Add the pending shifts to the depths of the nodes in all dirty regions.
+        The shifts are additive, so the regions can be processed in any order.
+        """
+        depths = self._depths
+        child_nodes = self._child_nodes
+        for root, shift in self._dirty.items():
+            stack = [root]
+            while stack:
+                node = stack.pop()
+                depths[node._index] += shift
+                stack.extend(child_nodes(node))
+        self._dirty = {}
 
 #
\ No newline at end of file
@@ -0,0 +1,250 @@
+""" A tree DAG is a compressed representation of a labelled tree in which identical
+subtrees are stored only once. Two subtrees are identical if their roots store equal
+elements and their children are identical, in the same order. The subtrees are interned
+bottom-up in the style of the AHU algorithm: every distinct subtree is assigned a
+canonical *shape id*, given by the element at its root and the sequence of the shape ids
+of its children. The shape ids are stored in a dictionary, so every subtree is interned
+in time proportional to the number of its children. A tree built from many copies of
+the same parts is thus compressed to a DAG whose size is the number of distinct parts.
+
+For every shape the DAG stores the element at its root, the list of its children, its
+height and its size, i.e. the number of nodes of the subtree. The nodes of the expanded
+tree are numbered in preorder. The children of a node with preorder number v and shape x
+have preorder numbers v + offset, where the offsets depend only on x and are computed
+from the sizes of the children.
+
+The nodes of the expanded tree are not stored. A position in the DAG represents a node
+together with the path leading to it from the root: it stores the position of the parent
+and a jump pointer to a higher ancestor. The jump pointers follow the skew-binary scheme,
+so the ancestor at any depth is reached in O(log n) steps.
+
+The tree DAG supports the accessor methods of the tree ADT:
+    D.root(), D.parent(p), D.num_children(p), D.children(p), D.depth(p), D.height(p),
+    D.is_root(p), D.is_leaf(p), D.positions(), len(D)
+In addition the tree DAG supports the following accessor methods:
+    D.position(i): Return the Position of the node with preorder number i.
+    D.level_ancestor(p, k): Return the Position of the level k ancestor of p.
+    D.shape(p): Return the shape id of the subtree of p.
+    D.subtree_size(p): Return the number of nodes in the subtree of p.
+    D.num_shapes(): Return the number of distinct subtrees.
+"""
+
+from array import array
+from bisect import bisect_right
+
+
+class TreeDAG:
+    #----------------- nested Position class ------------------#
+    class Position:
+        __slots__ = "_dag", "_shape", "_index", "_depth", "_parent", "_jump"
+        def __init__(self, dag, shape, index, parent):
+            """ Initialize a Position. Constructor should not be invoked by the user.
+            @param dag (TreeDAG): The DAG to which the node belongs.
+            @param shape (int): The shape id of the subtree of the node.
+            @param index (int): The preorder number of the node in the expanded tree.
+            @param parent (Position): The position of the parent, or None for the root.
+            """
+            self._dag = dag
+            self._shape = shape
+            self._index = index
+            self._parent = parent
+            if parent is None:
+                self._depth = 0
+                self._jump = self
+            else:
+                self._depth = parent._depth + 1
+                # Skew-binary jump pointers: jump over two equal jumps of the parent.
+                j = parent._jump
+                if parent._depth - j._depth == j._depth - j._jump._depth:
+                    self._jump = j._jump
+                else:
+                    self._jump = parent
+
+        def elem(self):
+            """ Return the elem of the node at this Position. """
+            return self._dag._elems[self._shape]
+
+        def index(self):
+            """ Return the preorder number of the node at this Position. """
+            return self._index
+
+        def __eq__(self, other):
+            """ Return True if other is a Position representing the same node. """
+            return type(other) is type(self) and other._dag is self._dag and other._index == self._index
+
+        def __ne__(self, other):
+            """ Return True if other Position does not represent the same node. """
+            return not (self == other)
+
+        def __hash__(self):
+            """ Return a hash consistent with equality. """
+            return hash((id(self._dag), self._index))
+
+    #------------- tree DAG initializer ---------------#
+    def __init__(self, tree):
+        """ Compress the tree object into a DAG.
+        The elements stored at the nodes must be hashable.
+        @param tree (Tree): A non-empty tree object.
+        """
+        self._ids = {}                  # (elem, shape ids of the children) -> shape id
+        self._elems = []
+        self._start = array("l", [0])   # the children of x are _kids[_start[x]:_start[x+1]]
+        self._kids = array("l")
+        self._offsets = array("l")      # preorder offset of every child from its parent
+        self._sizes = array("l")
+        self._heights = array("l")
+        self._root = self._compress(tree)
+
+    #---------------- public accessors ----------------#
+    def root(self):
+        """ Return Position representing the root of the tree. """
+        return self.Position(self, self._root, 0, None)
+
+    def parent(self, p):
+        """ Return Position representing the parent of the node at Position p. """
+        return self._validate(p)._parent
+
+    def num_children(self, p):
+        """ Return the number of children of the node at Position p. """
+        x = self._validate(p)._shape
+        return self._start[x + 1] - self._start[x]
+
+    def children(self, p):
+        """ Generate an iteration of Position representing the children of p. """
+        p = self._validate(p)
+        x = p._shape
+        for i in range(self._start[x], self._start[x + 1]):
+            yield self.Position(self, self._kids[i], p._index + self._offsets[i], p)
+
+    def depth(self, p):
+        """ Return the depth of the node at Position p. """
+        return self._validate(p)._depth
+
+    def height(self, p):
+        """ Return the height of the node at Position p. """
+        return self._heights[self._validate(p)._shape]
+
+    def is_root(self, p):
+        """ Return True if Position p represents the root of the tree. """
+        return self._validate(p)._parent is None
+
+    def is_leaf(self, p):
+        """ Return True if Position p does not have any children. """
+        return self.num_children(p) == 0
+
+    def positions(self):
+        """ Generate an iteration of all positions of the expanded tree in preorder.
+        The stack stores the iterators over the remaining children of the current path.
+        """
+        p = self.root()
+        yield p
+        stack = [self.children(p)]
+        while stack:
+            ch = next(stack[-1], None)
+            if ch is None:
+                stack.pop()
+            else:
+                yield ch
+                stack.append(self.children(ch))
+
+    def __len__(self):
+        """ Return the number of nodes of the expanded tree. """
+        return self._sizes[self._root]
+
+    def position(self, i):
+        """ Return the Position of the node with preorder number i. Starting from the root,
+        descend into the child whose range of preorder numbers contains i. The child is
+        found by binary search over the offsets of the children.
+        Raise IndexError if there is no such node.
+        """
+        if not 0 <= i < len(self):
+            raise IndexError("node index out of range")
+        p = self.root()
+        while p._index != i:
+            x = p._shape
+            k = bisect_right(self._offsets, i - p._index, self._start[x], self._start[x + 1]) - 1
+            p = self.Position(self, self._kids[k], p._index + self._offsets[k], p)
+        return p
+
+    def level_ancestor(self, p, k):
+        """ Return the level k ancestor of the node at Position p. Follow the jump pointer
+        whenever it does not overshoot the target depth, otherwise follow the parent.
+        @param p (Position): Position representing a node in the tree.
+        @param k (int): An integer giving the level of the ancestor.
+        @return ancestor (Position): Position of the ancestor, or None if k > depth(p).
+        """
+        p = self._validate(p)
+        target = p._depth - k
+        if target < 0:
+            return None
+        while p._depth > target:
+            p = p._jump if p._jump._depth >= target else p._parent
+        return p
+
+    def shape(self, p):
+        """ Return the shape id of the subtree of the node at Position p. Two nodes have
+        the same shape id if and only if their subtrees are identical.
+        """
+        return self._validate(p)._shape
+
+    def subtree_size(self, p):
+        """ Return the number of nodes in the subtree of the node at Position p. """
+        return self._sizes[self._validate(p)._shape]
+
+    def num_shapes(self):
+        """ Return the number of distinct subtrees, i.e. the number of nodes of the DAG. """
+        return len(self._elems)
+
+    #---- private methods - should not be invoked by the user ----#
+    def _compress(self, tree):
+        """ Traverse the tree in postorder using an explicit stack and intern every subtree
+        after its children. Every stack entry stores a node, the iterator over its remaining
+        children and the shape ids of its visited children.
+        @return root (int): The shape id of the tree.
+        """
+        p = tree.root()
+        stack = [(p, tree.children(p), [])]
+        while stack:
+            p, children, ids = stack[-1]
+            ch = next(children, None)
+            if ch is not None:
+                stack.append((ch, tree.children(ch), []))
+                continue
+            stack.pop()
+            x = self._intern(p.elem(), ids)
+            if stack:
+                stack[-1][2].append(x)
+        return x
+
+    def _intern(self, elem, ids):
+        """ Return the shape id of the subtree with the given element at the root and
+        children with the given shape ids. Add the shape if it was not seen before.
+        """
+        key = (elem, tuple(ids))
+        x = self._ids.get(key)
+        if x is not None:
+            return x
+
+        x = len(self._elems)
+        self._ids[key] = x
+        self._elems.append(elem)
+        self._kids.extend(ids)
+        self._start.append(len(self._kids))
+        size, height = 1, 0
+        for c in ids:
+            self._offsets.append(size)
+            size += self._sizes[c]
+            height = max(height, self._heights[c] + 1)
+        self._sizes.append(size)
+        self._heights.append(height)
+        return x
+
+    def _validate(self, p):
+        """ Return the Position, if it is valid. """
+        if not isinstance(p, self.Position):
+            raise TypeError("p must be proper Position type")
+        if p._dag is not self:
+            raise ValueError("p does not belong to this DAG")
+        return p
+
+#
@@ -0,0 +1,124 @@
+""" A compact binary file format for trees. The nodes are numbered so that every node has
+a larger number than its parent, e.g. in preorder. The file stores flat arrays of 64-bit
+integers in native byte order:
+    header: The magic bytes, followed by the version, the number of nodes n and the
+            kind of the elements (0: not stored, 1: integers, 2: floats).
+    parent[n]: The number of the parent of every node, or -1 for the root.
+    first_child[n], last_child[n], next_sibling[n]: The children of every node as a
+            linked list, or -1.
+    depth[n], height[n]: The depth and the height of every node.
+    elems[n]: The elements of the nodes, if they are stored.
+
+The layout matches the arrays of the compact tree, so a file is loaded by mapping it
+into memory and casting the mapped bytes to arrays, without creating any per-node
+objects. The file is mapped read-only, so it is never modified and all processes
+loading the same file share its pages. The arrays are read-only views, and a loaded
+tree copies them into regular arrays before it is modified for the first time.
+
+The module provides the following functions:
+    save(tree, path, elems): Write a tree to a file.
+    load(path, mmap): Load a tree from a file and return it as a compact tree.
+"""
+
+import mmap as mmap_module
+from array import array
+
+
+from .compact_tree import CompactTree
+
+
+MAGIC = b"TREEFILE"
+VERSION = 1
+NO_ELEMS, INT_ELEMS, FLOAT_ELEMS = 0, 1, 2
+
+
+def save(tree, path, elems=True):
+    """ Write the tree to a file. The tree is reindexed before it is written.
+    Raise ValueError if the elements should be stored but some of them are not numbers.
+    @param tree (Tree): A non-empty tree object.
+    @param path (str): Path to the output file.
+    @param elems (bool): If True store the elements of the nodes. Only integer and float
+                         elements can be stored.
+    """
+    tree.reindex()
+    n = len(tree)
+    parent = array("q", [-1]) * n
+    first_child = array("q", [-1]) * n
+    last_child = array("q", [-1]) * n
+    next_sibling = array("q", [-1]) * n
+    depth = array("q", [0]) * n
+    height = array("q", [0]) * n
+    values = [None] * n
+
+    for p in tree.positions():
+        v = p.index()
+        depth[v] = tree.depth(p)
+        height[v] = tree.height(p)
+        values[v] = p.elem()
+        prev = -1
+        for ch in tree.children(p):
+            c = ch.index()
+            parent[c] = v
+            if prev == -1:
+                first_child[v] = c
+            else:
+                next_sibling[prev] = c
+            prev = c
+        last_child[v] = prev
+
+    arrays = [parent, first_child, last_child, next_sibling, depth, height]
+    kind = NO_ELEMS
+    if elems:
+        if all(type(x) is int for x in values):
+            kind = INT_ELEMS
+            try:
+                arrays.append(array("q", values))
+            except OverflowError:
+                raise ValueError("integer elements must fit in 64 bits")
+        elif all(type(x) in (int, float) for x in values):
+            kind = FLOAT_ELEMS
+            arrays.append(array("d", values))
+        else:
+            raise ValueError("only numeric elements can be stored, use elems=False")
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        array("q", [VERSION, n, kind]).tofile(f)
+        for arr in arrays:
+            arr.tofile(f)
+
+
+def load(path, mmap=True):
+    """ Load a tree from a file written by save().
+    Raise ValueError if the file is not a tree file of a supported version.
+    @param path (str): Path to the input file.
+    @param mmap (bool): If True map the file into memory, otherwise read it.
+    @return tree (CompactTree): A compact tree backed by the contents of the file.
+    """
+    with open(path, "rb") as f:
+        if mmap:
+            buffer = mmap_module.mmap(f.fileno(), 0, access=mmap_module.ACCESS_READ)
+        else:
+            buffer = f.read()
+    view = memoryview(buffer)
+
+    header = len(MAGIC) + 3 * 8
+    if len(view) < header or view[:len(MAGIC)] != MAGIC:
+        raise ValueError("not a tree file")
+    version, n, kind = view[len(MAGIC):header].cast("q")
+    if version != VERSION:
+        raise ValueError("unsupported tree file version {}".format(version))
+    num_arrays = 6 if kind == NO_ELEMS else 7
+    if len(view) != header + num_arrays * 8 * n:
+        raise ValueError("truncated tree file")
+
+    arrays = []
+    for i in range(num_arrays):
+        start = header + i * 8 * n
+        code = "d" if i == 6 and kind == FLOAT_ELEMS else "q"
+        arrays.append(view[start:start + 8 * n].cast(code))
+    if kind == NO_ELEMS:
+        arrays.append(None)
+    return CompactTree._from_arrays(*arrays)
+
+#